@@ -0,0 +1,170 @@
+"""
+Offline batch scoring of a churn CSV with a local copy of the model.
+
+Streams the input (e.g. data/telecom_churn_v2.csv) in chunks, derives
+AvgCallDuration / CostPerUsage the same way the Predict page does, scores
+chunks across a process pool (the model is loaded once per worker, via
+inference-script.py's init()), and writes the input rows plus a
+predictedOutcome column to CSV or Parquet, in input order.
+
+    python batch_score.py data/telecom_churn_v2.csv predictions.parquet \\
+        --model-path model/random_forest_best.pkl --workers 4
+
+--model-path can also be a flat_forest.py export directory; workers then
+memory-map one shared copy of the trees instead of each unpickling its own.
+If --model-path is omitted, AZUREML_MODEL_DIR is used like in Azure.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, add_engineered_features, feature_matrix
+from local_model import load_inference_script
+
+
+BATCH_CHUNK_ROWS = 50_000
+
+# set in each worker process by _init_worker
+_inference = None
+
+
+def _init_worker(model_path):
+    global _inference
+    _inference = load_inference_script()
+    _inference.init(model_path)
+
+
+def _score_chunk(chunk: pd.DataFrame) -> np.ndarray:
+    """
+    Runs in a worker: feature matrix in model order -> predictions.
+    Goes through the endpoint's decode_features, so rows with missing or
+    infinite values are rejected (not scored) exactly like a request would be.
+    """
+    payload = {"columns": FEATURE_COLUMNS, "data": feature_matrix(chunk)}
+    try:
+        features = _inference.decode_features(payload)
+    except ValueError as e:
+        raise ValueError(f"{e}; in the chunk starting at input row {chunk.index[0]}") from None
+    return _inference.model.predict(features)
+
+
+class _OutputWriter:
+    """Appends scored chunks to a .csv or .parquet file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = path.lower().endswith((".parquet", ".pq"))
+        self._writer = None
+        self._wrote_header = False
+
+    def write(self, df: pd.DataFrame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a" if self._wrote_header else "w",
+                      header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    model_path: str = None,
+    workers: int = None,
+    chunk_rows: int = BATCH_CHUNK_ROWS,
+    progress=None,
+) -> dict:
+    """
+    Score input_path into output_path. At most 2 * workers chunks are in
+    memory at once. Returns {"rows", "chunks", "seconds", "rows_per_sec"}.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    writer = _OutputWriter(output_path)
+    rows = 0
+    chunks = 0
+    started = time.perf_counter()
+
+    def drain_one(pending):
+        nonlocal rows, chunks
+        chunk, future = pending.popleft()
+        out = add_engineered_features(chunk.copy())
+        out["predictedOutcome"] = future.result()
+        writer.write(out)
+        rows += len(out)
+        chunks += 1
+        if progress is not None:
+            progress(rows, time.perf_counter() - started)
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(model_path,),
+        ) as pool:
+            pending = deque()
+            for chunk in pd.read_csv(input_path, chunksize=chunk_rows):
+                pending.append((chunk, pool.submit(_score_chunk, chunk)))
+                if len(pending) >= 2 * workers:
+                    drain_one(pending)
+            while pending:
+                drain_one(pending)
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "chunks": chunks,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a churn CSV locally with the random forest.")
+    parser.add_argument("input", help="CSV with the telecom_churn_v2.csv columns")
+    parser.add_argument("output", help="output file (.csv or .parquet)")
+    parser.add_argument("--model-path", default=None,
+                        help="random_forest_best.pkl or a flat_forest export directory "
+                             "(default: the model under $AZUREML_MODEL_DIR)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-rows", type=int, default=BATCH_CHUNK_ROWS, help="rows per chunk")
+    args = parser.parse_args(argv)
+
+    def progress(rows, seconds):
+        print(f"\r{rows:,} rows scored ({rows / seconds:,.0f} rows/s)", end="", file=sys.stderr)
+
+    stats = score_file(
+        args.input,
+        args.output,
+        model_path=args.model_path,
+        workers=args.workers,
+        chunk_rows=args.chunk_rows,
+        progress=progress,
+    )
+    print(file=sys.stderr)
+    print(
+        f"Scored {stats['rows']:,} rows in {stats['chunks']} chunks, "
+        f"{stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/s) -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
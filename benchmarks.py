@@ -0,0 +1,897 @@
+"""
+Micro-benchmarks for the scoring path.
+
+Run with:
+    python benchmarks.py                       # every benchmark
+    python benchmarks.py --suite scoring --json bench/new.json --compare bench/base.json
+
+The scoring suite (run() at batch sizes 1-100k, request JSON encode /
+decode, azure_model_rest_api_call against the local mock endpoint, and
+the History CSV write path) reports p50 / p95 / p99 latency, rows/sec and
+peak traced memory. --json saves the results with the git commit, and
+--compare prints the p50 change against a saved run, so regressions can
+be compared between commits.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy
+
+from features import avg_call_duration, cost_per_usage
+from local_model import load_inference_script
+from mock_endpoint import MockScoringServer
+
+
+def make_rows(n_rows: int, seed: int = 0):
+    """Random customer rows shaped like the Predict page request body."""
+    rng = numpy.random.default_rng(seed)
+    rows = []
+    for _ in range(n_rows):
+        day_mins = float(rng.uniform(0, 350))
+        day_calls = int(rng.integers(0, 165))
+        roam_mins = float(rng.uniform(0, 20))
+        monthly_charge = float(rng.uniform(14, 112))
+        rows.append({
+            "AccountWeeks": int(rng.integers(1, 243)),
+            "ContractRenewal": int(rng.integers(0, 2)),
+            "DataPlan": int(rng.integers(0, 2)),
+            "DataUsage": float(rng.uniform(0, 5.4)),
+            "CustServCalls": int(rng.integers(0, 10)),
+            "DayMins": day_mins,
+            "DayCalls": day_calls,
+            "MonthlyCharge": monthly_charge,
+            "OverageFee": float(rng.uniform(0, 18.2)),
+            "RoamMins": roam_mins,
+            "AvgCallDuration": avg_call_duration(day_mins, day_calls),
+            "CostPerUsage": cost_per_usage(monthly_charge, day_mins, roam_mins),
+        })
+    return rows
+
+
+def legacy_decode(data):
+    """The original per-row loop from run(), kept here as the baseline."""
+    input_features = []
+    for item in data:
+        single_user_input = [
+            int(item['AccountWeeks']),
+            int(item['ContractRenewal']),
+            int(item['DataPlan']),
+            float(item['DataUsage']),
+            int(item['CustServCalls']),
+            float(item['DayMins']),
+            int(item['DayCalls']),
+            float(item['MonthlyCharge']),
+            float(item['OverageFee']),
+            float(item['RoamMins']),
+            float(item['AvgCallDuration']),
+            float(item['CostPerUsage'])
+        ]
+        input_features.append(single_user_input)
+    return numpy.array(input_features)
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    """Best wall time (seconds) over a few repeats."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_decode(batch_sizes=(1, 100, 10_000, 50_000)):
+    """
+    Compare the legacy row-dict loop against the vectorized decoders
+    (row-dict and column-oriented payloads), including json.loads.
+    """
+    inference = load_inference_script()
+    results = []
+
+    for n_rows in batch_sizes:
+        rows = make_rows(n_rows)
+        columns = inference.FEATURE_COLUMNS
+        row_body = json.dumps({"data": rows})
+        col_body = json.dumps({
+            "columns": columns,
+            "data": [[r[c] for c in columns] for r in rows],
+        })
+
+        expected = legacy_decode(rows)
+        assert numpy.array_equal(expected, inference.decode_features(json.loads(row_body)))
+        assert numpy.array_equal(expected, inference.decode_features(json.loads(col_body)))
+
+        timings = {
+            "legacy_rows": best_of(lambda: legacy_decode(json.loads(row_body)["data"])),
+            "vectorized_rows": best_of(lambda: inference.decode_features(json.loads(row_body))),
+            "vectorized_columns": best_of(lambda: inference.decode_features(json.loads(col_body))),
+        }
+        for name, seconds in timings.items():
+            results.append({
+                "benchmark": "decode",
+                "variant": name,
+                "rows": n_rows,
+                "seconds": seconds,
+                "rows_per_sec": n_rows / seconds if seconds else float("inf"),
+            })
+    return results
+
+
+def bench_score_batch(n_rows: int = 20_000, worker_counts=(1, 4, 8), latency: float = 0.01):
+    """
+    score_batch against the local mock endpoint, with a bit of simulated
+    network latency per request so the worker pool has something to hide.
+    """
+    import pandas as pd
+    from model_call import score_batch
+
+    df = pd.DataFrame(make_rows(n_rows))
+    results = []
+    with MockScoringServer(latency=latency) as server:
+        for workers in worker_counts:
+            out = score_batch(
+                df,
+                max_rows=1000,
+                max_workers=workers,
+                model_url=server.url,
+                api_key=server.api_key,
+            )
+            results.append({
+                "benchmark": "score_batch",
+                "variant": f"workers={workers}",
+                "rows": out["rows"],
+                "seconds": out["seconds"],
+                "rows_per_sec": out["rows_per_sec"],
+            })
+    return results
+
+
+def _percentile(samples, pct: float) -> float:
+    return float(numpy.percentile(numpy.asarray(samples), pct))
+
+
+def bench_connection_reuse(n_calls: int = 200):
+    """
+    Per-call latency of a single-row prediction against the local mock
+    endpoint: a fresh connection every call (the old bare requests.post)
+    vs. the shared keep-alive session in model_call.
+    """
+    import requests
+    import model_call
+
+    body = json.dumps({"data": make_rows(1)})
+    results = []
+    with MockScoringServer() as server:
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {server.api_key}",
+        }
+
+        def cold():
+            with requests.Session() as s:
+                s.post(server.url, headers=headers, data=body, timeout=30).json()
+
+        def warm():
+            model_call._post_body(body, server.url, server.api_key)
+
+        model_call.reset_session()
+        warm()  # open the pooled connection once up front
+
+        for name, fn in (("cold_connection", cold), ("warm_pooled", warm)):
+            samples = []
+            for _ in range(n_calls):
+                start = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - start)
+            results.append({
+                "benchmark": "http_call",
+                "variant": name,
+                "rows": 1,
+                "seconds": _percentile(samples, 50),
+                "p95_seconds": _percentile(samples, 95),
+                "rows_per_sec": n_calls / sum(samples),
+            })
+    return results
+
+
+def bench_coalescing(n_requests: int = 2000, concurrency: int = 64, latency: float = 0.005):
+    """
+    Many concurrent single-row callers: one HTTP request per row vs. the
+    micro-batching CoalescingScorer.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import model_call
+    from micro_batch import ThreadedCoalescingScorer
+
+    rows = make_rows(n_requests)
+    results = []
+    with MockScoringServer(latency=latency) as server:
+        model_call.reset_session(pool_size=concurrency)
+
+        def direct(row):
+            return model_call._post_body(json.dumps({"data": [row]}), server.url, server.api_key)
+
+        coalescer = ThreadedCoalescingScorer(model_url=server.url, api_key=server.api_key)
+
+        def coalesced(row):
+            return coalescer.score({"data": [row]})
+
+        for name, fn in (("per_row_requests", direct), ("coalesced", coalesced)):
+            server.request_count = 0
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(fn, rows))
+            seconds = time.perf_counter() - start
+            results.append({
+                "benchmark": "concurrent_single_row",
+                "variant": f"{name} ({server.request_count} http)",
+                "rows": n_requests,
+                "seconds": seconds,
+                "rows_per_sec": n_requests / seconds,
+            })
+        coalescer.close()
+        model_call.reset_session()
+    return results
+
+
+def bench_dataset_load(path: str = "./data/telecom_churn_v2.csv", repeat: int = 20):
+    """
+    Dashboard data load: the old untyped pd.read_csv + ChurnLabel map on
+    every rerun vs. data_loader (typed read, Parquet sidecar, warm cache).
+    Reports wall time and the DataFrame's deep memory footprint.
+    """
+    import pandas as pd
+    import data_loader
+
+    def legacy():
+        df = pd.read_csv(path)
+        df["ChurnLabel"] = df["Churn"].map({0: "Stayed", 1: "Churned"})
+        return df
+
+    def typed_csv():
+        return data_loader.read_churn_csv(path)
+
+    def sidecar_cold():
+        data_loader.clear_cache()
+        return data_loader.load_churn_dataset(path)
+
+    def cached():
+        return data_loader.load_churn_dataset(path)
+
+    sidecar_cold()  # make sure the sidecar exists (if pyarrow is installed)
+    has_sidecar = os.path.exists(data_loader._sidecar_path(path))
+
+    results = []
+    for name, fn in (
+        ("legacy_read_csv", legacy),
+        ("typed_read_csv", typed_csv),
+        ("parquet_sidecar" if has_sidecar else "cold_no_sidecar", sidecar_cold),
+        ("warm_cache", cached),
+    ):
+        df = fn()
+        seconds = best_of(fn, repeat)
+        results.append({
+            "benchmark": "dataset_load",
+            "variant": name,
+            "rows": len(df),
+            "seconds": seconds,
+            "rows_per_sec": len(df) / seconds if seconds else float("inf"),
+            "memory_bytes": int(df.memory_usage(deep=True).sum()),
+        })
+    return results
+
+
+def bench_features(n_rows: int = 10_000_000, scalar_rows: int = 1_000_000):
+    """
+    Feature engineering throughput: the scalar API in a Python loop vs. the
+    vectorized API on n_rows, checking they agree bit-for-bit.
+    """
+    import features
+
+    rng = numpy.random.default_rng(0)
+    day_mins = rng.uniform(0, 350, n_rows)
+    day_calls = rng.integers(0, 165, n_rows)
+    monthly_charge = rng.uniform(14, 112, n_rows)
+    roam_mins = rng.uniform(0, 20, n_rows)
+
+    def vectorized():
+        return (
+            features.avg_call_duration_array(day_mins, day_calls),
+            features.cost_per_usage_array(monthly_charge, day_mins, roam_mins),
+        )
+
+    dm, dc, mc, rm = (a[:scalar_rows].tolist() for a in (day_mins, day_calls, monthly_charge, roam_mins))
+
+    def scalar():
+        return (
+            [features.avg_call_duration(m, c) for m, c in zip(dm, dc)],
+            [features.cost_per_usage(ch, m, r) for ch, m, r in zip(mc, dm, rm)],
+        )
+
+    vec_acd, vec_cpu = vectorized()
+    sc_acd, sc_cpu = scalar()
+    assert numpy.array_equal(vec_acd[:scalar_rows], numpy.array(sc_acd))
+    assert numpy.array_equal(vec_cpu[:scalar_rows], numpy.array(sc_cpu))
+
+    results = []
+    for name, fn, rows in (("scalar_loop", scalar, scalar_rows), ("vectorized", vectorized, n_rows)):
+        seconds = best_of(fn, repeat=3)
+        results.append({
+            "benchmark": "features",
+            "variant": name,
+            "rows": rows,
+            "seconds": seconds,
+            "rows_per_sec": rows / seconds,
+        })
+    return results
+
+
+_COLD_START_WORKER = """
+import sys, time
+started = time.perf_counter()
+from local_model import load_inference_script
+inference = load_inference_script()
+inference.init(sys.argv[1])
+rows = inference.numpy.random.default_rng(0).random((1000, 12))
+inference.model.predict_proba(rows)  # fault in every tree's nodes
+print(time.perf_counter() - started, flush=True)
+sys.stdin.read()
+"""
+
+
+def _smaps_rollup(pid: int) -> dict:
+    """Rss / Pss / Private_* in bytes from /proc (Linux only, else {})."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.read().splitlines()[1:]
+    except OSError:
+        return {}
+    fields = {}
+    for line in lines:
+        name, value = line.split(":", 1)
+        fields[name] = int(value.split()[0]) * 1024
+    return fields
+
+
+def bench_cold_start(model_path: str, flat_dir: str = None, workers: int = 4):
+    """
+    Endpoint / batch worker start-up: `workers` fresh interpreters each run
+    init() and one predict, and are kept alive together so shared pages
+    show up. Compares the pickle, the pickle with joblib mmap_mode="r" and
+    (if flat_dir is given, e.g. from flat_forest.export_forest) the
+    memory-mapped flat forest. Reports mean init time, and mean RSS / PSS /
+    private bytes per worker.
+    """
+    import subprocess
+    import sys
+
+    variants = [("pickle", model_path, {}), ("pickle_joblib_mmap", model_path, {"model_joblib_mmap": "1"})]
+    if flat_dir is not None:
+        variants.append(("flat_mmap", flat_dir, {}))
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for name, path, env in variants:
+        procs = [
+            subprocess.Popen(
+                [sys.executable, "-c", _COLD_START_WORKER, path],
+                cwd=here,
+                env={**os.environ, **env},
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            for _ in range(workers)
+        ]
+        try:
+            seconds = [float(p.stdout.readline()) for p in procs]
+            memory = [_smaps_rollup(p.pid) for p in procs]
+        finally:
+            for p in procs:
+                p.communicate("")
+        result = {
+            "benchmark": "cold_start",
+            "variant": name,
+            "rows": workers,
+            "seconds": sum(seconds) / workers,
+        }
+        if all(memory):
+            result["rss_bytes"] = sum(m["Rss"] for m in memory) // workers
+            result["pss_bytes"] = sum(m["Pss"] for m in memory) // workers
+            result["memory_bytes"] = sum(m["Private_Clean"] + m["Private_Dirty"] for m in memory) // workers
+        results.append(result)
+    return results
+
+
+def bench_fast_path(model_path: str, batch_sizes=(1, 8, 64, 256, 1024), repeat: int = 20):
+    """
+    run() latency with the pickle's sklearn predict vs. the flat fast path
+    (flat_forest.FlatForest), after checking both give identical outputs.
+    """
+    inference = load_inference_script()
+    inference.init(model_path)
+    fast_max_rows = inference.FAST_PATH_MAX_ROWS
+
+    results = []
+    try:
+        for n_rows in batch_sizes:
+            body = json.dumps({"data": make_rows(n_rows, seed=n_rows), "returnProbabilities": True})
+            outputs = {}
+            timings = {}
+            for name, max_rows in (("sklearn", 0), ("flat_fast_path", n_rows)):
+                inference.FAST_PATH_MAX_ROWS = max_rows
+                outputs[name] = inference.run(body)
+                timings[name] = best_of(lambda: inference.run(body), repeat)
+            assert outputs["sklearn"] == outputs["flat_fast_path"]
+
+            for name, seconds in timings.items():
+                results.append({
+                    "benchmark": "fast_path",
+                    "variant": name,
+                    "rows": n_rows,
+                    "seconds": seconds,
+                    "rows_per_sec": n_rows / seconds,
+                })
+    finally:
+        inference.FAST_PATH_MAX_ROWS = fast_max_rows
+    return results
+
+
+def bench_backends(model_path: str, n_calls: int = 200):
+    """
+    Single-row Predict-page calls through scoring_backend: RemoteBackend
+    against the mock endpoint on localhost (the best case for the network
+    hop) vs. LocalBackend in-process, same model in both.
+    """
+    from scoring_backend import LocalBackend, RemoteBackend
+
+    rows = make_rows(n_calls)
+    results = []
+    with MockScoringServer(model_path=model_path) as server:
+        backends = {
+            "remote_localhost": RemoteBackend(server.url, server.api_key),
+            "local_in_process": LocalBackend(model_path),
+        }
+        outputs = {}
+        for name, backend in backends.items():
+            backend.score({"data": [rows[0]]})  # warm up (connection, caches)
+            latencies = []
+            outputs[name] = []
+            for row in rows:
+                start = time.perf_counter()
+                outputs[name].append(backend.score({"data": [row]}))
+                latencies.append(time.perf_counter() - start)
+            results.append({
+                "benchmark": "backends",
+                "variant": name,
+                "rows": n_calls,
+                "seconds": _percentile(latencies, 50),
+                "p95_seconds": _percentile(latencies, 95),
+                "rows_per_sec": n_calls / sum(latencies),
+            })
+        assert outputs["remote_localhost"] == outputs["local_in_process"]
+    return results
+
+
+# ---- scoring suite: latency distribution + peak memory ----
+SUITE_BATCH_SIZES = (1, 10, 100, 1_000, 10_000, 100_000)
+
+
+def _repeat_for(n_rows: int, budget_rows: int = 200_000, low: int = 5, high: int = 200) -> int:
+    """More samples for small batches, so p99 means something, fewer for big ones."""
+    return max(low, min(high, budget_rows // max(n_rows, 1)))
+
+
+def measure(fn, rows: int, repeat: int = None, warmup: int = 1) -> dict:
+    """
+    Time fn() repeat times (after warmup calls) and trace one more call
+    for peak memory. Returns p50 / p95 / p99 seconds, rows/sec over all
+    timed calls and peak_memory_bytes (Python + numpy allocations seen by
+    tracemalloc, in every thread).
+    """
+    repeat = repeat or _repeat_for(rows)
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "rows": rows,
+        "repeat": repeat,
+        "seconds": _percentile(samples, 50),
+        "p50_seconds": _percentile(samples, 50),
+        "p95_seconds": _percentile(samples, 95),
+        "p99_seconds": _percentile(samples, 99),
+        "rows_per_sec": rows * repeat / sum(samples),
+        "peak_memory_bytes": peak,
+    }
+
+
+def _suite_inference(model_path: str = None):
+    """inference-script module on model_path, or on the mock's RuleModel without one."""
+    from mock_endpoint import RuleModel
+
+    inference = load_inference_script()
+    if model_path:
+        inference.init(model_path)
+    else:
+        inference.model = RuleModel(inference.FEATURE_COLUMNS)
+    return inference
+
+
+def bench_run(model_path: str = None, batch_sizes=SUITE_BATCH_SIZES):
+    """
+    run() end to end (json.loads, decode, predict, response dict) per
+    batch size. Without a model path the mock's RuleModel stands in, so
+    the numbers are mostly decode / response overhead.
+    """
+    inference = _suite_inference(model_path)
+    model_name = os.path.basename(model_path.rstrip("/")) if model_path else "rule_model"
+
+    results = []
+    for n_rows in batch_sizes:
+        body = json.dumps({"data": make_rows(n_rows, seed=n_rows)})
+        results.append({
+            "benchmark": "run",
+            "variant": model_name,
+            **measure(lambda: inference.run(body), n_rows),
+        })
+    return results
+
+
+def bench_json(batch_sizes=SUITE_BATCH_SIZES):
+    """json.dumps of the request body (client side) and json.loads (in run())."""
+    results = []
+    for n_rows in batch_sizes:
+        body_dict = {"data": make_rows(n_rows, seed=n_rows)}
+        body = json.dumps(body_dict)
+        for name, fn in (
+            ("encode_request", lambda: json.dumps(body_dict)),
+            ("decode_request", lambda: json.loads(body)),
+        ):
+            results.append({"benchmark": "json", "variant": name, **measure(fn, n_rows)})
+    return results
+
+
+def bench_rest_call(model_path: str = None, batch_sizes=(1, 100, 1_000, 10_000)):
+    """
+    azure_model_rest_api_call (pooled session, .env config) against the
+    local mock endpoint: serialization + HTTP + server-side run() +
+    response parsing. Peak memory includes the server thread.
+    """
+    from model_call import azure_model_rest_api_call, reset_session
+
+    saved = {k: os.environ.get(k) for k in ("model_url", "model_api_key")}
+    results = []
+    with MockScoringServer(model_path=model_path) as server:
+        os.environ["model_url"] = server.url
+        os.environ["model_api_key"] = server.api_key
+        reset_session()
+        try:
+            for n_rows in batch_sizes:
+                body_dict = {"data": make_rows(n_rows, seed=n_rows)}
+                results.append({
+                    "benchmark": "rest_call",
+                    "variant": "mock_localhost",
+                    **measure(lambda: azure_model_rest_api_call(body_dict), n_rows),
+                })
+        finally:
+            reset_session()
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+    return results
+
+
+def bench_echo_gzip(model_path: str = None, batch_sizes=(100, 1_000, 10_000)):
+    """
+    One JSON POST to the mock endpoint with and without the inputFeatures
+    echo ("echoInput": false) and with and without gzip on both bodies.
+    payload_bytes is what crossed the wire (request + response).
+    """
+    import gzip
+
+    import requests
+
+    import wire_format as wf
+
+    results = []
+    session = requests.Session()
+    with MockScoringServer(model_path=model_path) as server:
+        for n_rows in batch_sizes:
+            rows = make_rows(n_rows, seed=n_rows)
+            for echo in (True, False):
+                body = wf.dumps_json({"data": rows, "echoInput": echo})
+                for use_gzip in (False, True):
+                    headers = {
+                        "Content-Type": wf.JSON_CONTENT_TYPE,
+                        "Authorization": f"Bearer {server.api_key}",
+                        "Accept-Encoding": "gzip" if use_gzip else "identity",
+                    }
+                    sent = body
+                    if use_gzip:
+                        headers["Content-Encoding"] = "gzip"
+                        sent = gzip.compress(body, compresslevel=wf.GZIP_LEVEL)
+
+                    def call():
+                        resp = session.post(server.url, data=sent, headers=headers, timeout=60)
+                        resp.raise_for_status()
+                        return resp
+
+                    resp = call()
+                    assert len(wf.loads_json(resp.content)["predictedOutcomes"]) == n_rows
+                    wire = len(sent) + int(resp.headers["Content-Length"])
+                    results.append({
+                        "benchmark": "echo_gzip",
+                        "variant": f"{'echo' if echo else 'no_echo'}_{'gzip' if use_gzip else 'identity'}",
+                        "payload_bytes": wire,
+                        **measure(lambda: wf.loads_json(call().content), n_rows),
+                    })
+    session.close()
+    return results
+
+
+def _history_entries(n_rows: int) -> list:
+    return [
+        {"timestamp": "2024-01-01 00:00", "prediction_raw": 0, "prediction_label": "Stay", **row}
+        for row in make_rows(n_rows)
+    ]
+
+
+def bench_history_write(batch_sizes=(1, 256)):
+    """
+    The History CSV write path: history_log.append_rows with and without
+    fsync (what the writer thread does per batch), and HistoryWriter.append
+    (what the Predict page waits on).
+    """
+    from history_log import HistoryWriter, append_rows
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "prediction_history.csv")
+        for n_rows in batch_sizes:
+            entries = _history_entries(n_rows)
+            for name, fsync in (("append_rows_fsync", True), ("append_rows_no_fsync", False)):
+                results.append({
+                    "benchmark": "history_write",
+                    "variant": name,
+                    **measure(lambda: append_rows(path, entries, fsync=fsync), n_rows),
+                })
+
+        writer = HistoryWriter(path=path)
+        entry = _history_entries(1)[0]
+        try:
+            results.append({
+                "benchmark": "history_write",
+                "variant": "writer_enqueue",
+                **measure(lambda: writer.append(entry), 1, repeat=1000),
+            })
+        finally:
+            writer.close()
+    return results
+
+
+def bench_wire_format(batch_sizes=(1, 100, 10_000, 100_000), repeat: int = 5):
+    """
+    Payload bytes and encode / decode time per wire format: the original
+    json.dumps / json.loads, the fast JSON path (orjson when installed),
+    and Arrow IPC. Covers the request (client encode, endpoint parse) and
+    a returnProbabilities response (endpoint encode, client decode).
+    """
+    import wire_format as wf
+
+    inference = load_inference_script()
+    results = []
+    for n_rows in batch_sizes:
+        body_dict = {"data": make_rows(n_rows, seed=n_rows), "returnProbabilities": True}
+        rng = numpy.random.default_rng(n_rows)
+        probabilities = rng.random(n_rows)
+        outcomes = (probabilities > 0.5).astype(numpy.int64)
+
+        def json_response():
+            return inference.json_response(body_dict, outcomes, probabilities, None)
+
+        formats = {
+            "json_stdlib": (
+                lambda: json.dumps(body_dict).encode("utf-8"),
+                lambda body: json.loads(body),
+                lambda: json.dumps(json_response()).encode("utf-8"),
+                lambda body: json.loads(body),
+            ),
+            "json_fast" if wf.orjson is not None else "json_compact": (
+                lambda: wf.dumps_json(body_dict),
+                wf.loads_json,
+                lambda: wf.dumps_json(json_response()),
+                wf.loads_json,
+            ),
+        }
+        if wf.arrow_available():
+            formats["arrow_ipc"] = (
+                lambda: wf.encode_arrow_request(body_dict, inference.FEATURE_COLUMNS),
+                wf.decode_arrow_request,
+                lambda: wf.encode_arrow_response(outcomes, probabilities),
+                wf.decode_arrow_response,
+            )
+
+        for name, (encode_request, parse_request, encode_response, decode_response) in formats.items():
+            request = encode_request()
+            response = encode_response()
+            assert decode_response(response)["predictedOutcomes"] == outcomes.tolist()
+            for step, fn, size in (
+                ("encode_request", encode_request, len(request)),
+                ("parse_request", lambda: parse_request(request), len(request)),
+                ("encode_response", encode_response, len(response)),
+                ("decode_response", lambda: decode_response(response), len(response)),
+            ):
+                seconds = best_of(fn, repeat)
+                results.append({
+                    "benchmark": "wire_format",
+                    "variant": f"{name}:{step}",
+                    "rows": n_rows,
+                    "seconds": seconds,
+                    "rows_per_sec": n_rows / seconds if seconds else float("inf"),
+                    "payload_bytes": size,
+                })
+    return results
+
+
+def run_scoring_suite(model_path: str = None) -> list:
+    results = []
+    for bench in (
+        lambda: bench_run(model_path),
+        bench_json,
+        bench_wire_format,
+        lambda: bench_rest_call(model_path),
+        lambda: bench_echo_gzip(model_path),
+        bench_history_write,
+    ):
+        batch = bench()
+        print_results(batch)
+        results.extend(batch)
+    return results
+
+
+def run_all(model_path: str = None) -> list:
+    results = run_scoring_suite(model_path)
+    for bench in (
+        bench_decode,
+        bench_score_batch,
+        bench_connection_reuse,
+        bench_coalescing,
+        bench_dataset_load,
+        bench_features,
+    ):
+        batch = bench()
+        print_results(batch)
+        results.extend(batch)
+    if model_path and not os.path.isdir(model_path):
+        # export the flat forest next to the pickle first:
+        #   python flat_forest.py export <dir>/random_forest_best.pkl <dir>/random_forest_flat
+        flat_dir = os.path.join(os.path.dirname(model_path), "random_forest_flat")
+        for batch in (
+            bench_fast_path(model_path),
+            bench_backends(model_path),
+            bench_cold_start(model_path, flat_dir if os.path.isdir(flat_dir) else None),
+        ):
+            print_results(batch)
+            results.extend(batch)
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results: list, path: str, model_path: str = None):
+    report = {
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "model_path": model_path,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def compare_results(results: list, baseline_path: str, threshold: float = 0.10) -> list:
+    """
+    Print the p50 change per (benchmark, variant, rows) against a saved
+    run. Returns the entries that got slower by more than threshold.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = {(r["benchmark"], r["variant"], r["rows"]): r for r in baseline["results"]}
+
+    print(f"\nvs. {baseline_path} (commit {baseline.get('commit')}):")
+    regressions = []
+    for r in results:
+        old = before.get((r["benchmark"], r["variant"], r["rows"]))
+        if old is None or not old["seconds"]:
+            continue
+        change = r["seconds"] / old["seconds"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append({**r, "baseline_seconds": old["seconds"], "change": change})
+        print(
+            f"{r['benchmark']:<13} {r['variant']:<30} rows={r['rows']:<8} "
+            f"{old['seconds'] * 1000:9.3f} -> {r['seconds'] * 1000:9.3f} ms  {change:+7.1%}{flag}"
+        )
+    return regressions
+
+
+def print_results(results):
+    for r in results:
+        print(
+            f"{r['benchmark']:<13} {r['variant']:<30} rows={r['rows']:<8} "
+            f"{r['seconds'] * 1000:9.3f} ms"
+            + (f"  p95 {r['p95_seconds'] * 1000:8.3f}  p99 {r['p99_seconds'] * 1000:8.3f} ms"
+               if "p99_seconds" in r else "")
+            + (f"  {r['rows_per_sec']:14,.0f} rows/s" if "rows_per_sec" in r else "")
+            + (f"  {r['memory_bytes'] / 1024:10,.0f} KiB" if "memory_bytes" in r else "")
+            + (f"  peak {r['peak_memory_bytes'] / 1024:10,.0f} KiB" if "peak_memory_bytes" in r else "")
+            + (f"  {r['payload_bytes']:12,} B" if "payload_bytes" in r else "")
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the churn scoring path.")
+    parser.add_argument("--suite", choices=("scoring", "all"), default="all")
+    parser.add_argument("--model-path", default=None,
+                        help="random_forest_best.pkl or a flat_forest directory "
+                             "(default: $AZUREML_MODEL_DIR/model/random_forest_best.pkl if set, "
+                             "else the mock endpoint's rule model)")
+    parser.add_argument("--json", dest="json_path", default=None, help="save results to this JSON file")
+    parser.add_argument("--compare", default=None, help="JSON from an earlier run to compare p50s against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="p50 slowdown counted as a regression (default: 0.10 = 10%%)")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="exit with status 1 if --compare finds a regression")
+    args = parser.parse_args(argv)
+
+    model_path = args.model_path
+    if model_path is None and os.environ.get("AZUREML_MODEL_DIR"):
+        model_path = os.environ["AZUREML_MODEL_DIR"] + "/model/random_forest_best.pkl"
+
+    results = run_scoring_suite(model_path) if args.suite == "scoring" else run_all(model_path)
+    if args.json_path:
+        save_results(results, args.json_path, model_path)
+        print(f"\nSaved {len(results)} results to {args.json_path}")
+    if args.compare:
+        regressions = compare_results(results, args.compare, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Bulk scoring of an uploaded churn extract (the Predict page's upload mode).
+
+The upload (CSV or Parquet with the telecom_churn_v2.csv columns) is read
+chunk by chunk, AvgCallDuration / CostPerUsage are derived for the whole
+chunk at once, and each chunk goes to the scoring backend as one
+column-oriented request. Scored chunks are appended to a temporary output
+file straight away, so memory holds one chunk plus a few counters, and
+the number of requests is ceil(rows / chunk_rows).
+
+Output files live in their own temp directory. A job's file is removed
+when the job is discarded or garbage collected (its Streamlit session
+ended), and every new job sweeps out files older than
+bulk_output_max_age_hours that a crashed process left behind.
+"""
+import os
+import tempfile
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from batch_score import _OutputWriter
+from features import ENGINEERED_COLUMNS, FEATURE_COLUMNS, add_engineered_features
+
+
+BULK_CHUNK_ROWS = int(os.getenv("bulk_chunk_rows", "1000"))
+BULK_OUTPUT_DIR = os.getenv("bulk_output_dir", os.path.join(tempfile.gettempdir(), "churn_bulk"))
+BULK_OUTPUT_MAX_AGE_SECONDS = float(os.getenv("bulk_output_max_age_hours", "6")) * 3600
+RAW_FEATURE_COLUMNS = [c for c in FEATURE_COLUMNS if c not in ENGINEERED_COLUMNS]
+
+
+def is_parquet(name: str) -> bool:
+    return name.lower().endswith((".parquet", ".pq"))
+
+
+def iter_upload_chunks(file, name: str, chunk_rows: int = BULK_CHUNK_ROWS):
+    """
+    DataFrame chunks of an uploaded CSV / Parquet file, with the fraction
+    of the file read so far: yields (chunk, fraction_done).
+    """
+    if is_parquet(name):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet uploads need pyarrow (pip install pyarrow); upload a CSV instead.")
+
+        parquet = pq.ParquetFile(file)
+        total = parquet.metadata.num_rows or 1
+        seen = 0
+        for batch in parquet.iter_batches(batch_size=chunk_rows):
+            seen += batch.num_rows
+            yield batch.to_pandas(), seen / total
+        return
+
+    file.seek(0, os.SEEK_END)
+    size = file.tell() or 1
+    file.seek(0)
+    with pd.read_csv(file, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            # the parser reads ahead, so this is approximate
+            yield chunk, min(file.tell() / size, 1.0)
+
+
+def check_columns(df: pd.DataFrame, first_row: int = 0):
+    """
+    RuntimeError unless df has every model feature and they are all
+    numbers (no blank cells, text or infinities). first_row is the data
+    row number of df's first row, for the message.
+    """
+    missing = [c for c in RAW_FEATURE_COLUMNS if c not in df.columns]
+    if missing:
+        raise RuntimeError(
+            f"Uploaded file is missing model features: {missing}\n\n"
+            "It needs the telecom_churn_v2.csv columns."
+        )
+
+    for c in [c for c in FEATURE_COLUMNS if c in df.columns]:
+        values = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float64)
+        bad = np.flatnonzero(~np.isfinite(values))
+        if len(bad):
+            i = int(bad[0])
+            cell = df[c].iloc[i]
+            found = "a blank cell" if pd.isna(cell) else repr(str(cell))
+            raise RuntimeError(
+                f"Row {first_row + i + 1:,} of the upload has {found} in column {c}, "
+                "but every model feature must be a number.\n\n"
+                "Fix or drop that row (and any like it) and upload again."
+            )
+
+
+def score_chunk(chunk: pd.DataFrame, model_call, first_row: int = 0) -> pd.DataFrame:
+    """
+    chunk plus AvgCallDuration / CostPerUsage, churnProbability and
+    predictedOutcome, from one request to model_call.
+    """
+    check_columns(chunk, first_row)
+    out = chunk.copy()
+    present = [c for c in FEATURE_COLUMNS if c in out.columns]
+    out[present] = out[present].apply(pd.to_numeric)
+    out = add_engineered_features(out)
+    body = {
+        "columns": FEATURE_COLUMNS,
+        "data": out[FEATURE_COLUMNS].to_numpy(dtype=np.float64).tolist(),
+        "returnProbabilities": True,
+        "echoInput": False,
+    }
+    result = model_call(body)
+
+    outcomes = result.get("predictedOutcomes", [])
+    if len(outcomes) != len(out):
+        raise RuntimeError(
+            f"Model returned {len(outcomes)} predictions for a chunk of {len(out)} rows."
+        )
+    out["churnProbability"] = result.get("churnProbabilities", [np.nan] * len(out))
+    out["predictedOutcome"] = outcomes
+    return out
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def sweep_outputs(output_dir: str = BULK_OUTPUT_DIR, max_age_seconds: float = BULK_OUTPUT_MAX_AGE_SECONDS) -> int:
+    """Delete scored files older than max_age_seconds; returns how many."""
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    try:
+        entries = list(os.scandir(output_dir))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass  # gone already, or still open on Windows
+    return removed
+
+
+class BulkScoreJob:
+    """One upload being scored into a temporary file; progress lives here."""
+
+    def __init__(self, name: str, output_dir: str = BULK_OUTPUT_DIR):
+        self.name = name
+        suffix = ".parquet" if is_parquet(name) else ".csv"
+        os.makedirs(output_dir, exist_ok=True)
+        sweep_outputs(output_dir)
+        fd, self.output_path = tempfile.mkstemp(prefix="churn_scored_", suffix=suffix, dir=output_dir)
+        os.close(fd)
+        # removes the file once the job is gone with its session
+        self._cleanup = weakref.finalize(self, _remove, self.output_path)
+        self.output_name = f"{os.path.splitext(os.path.basename(name))[0]}_scored{suffix}"
+        self.rows = 0
+        self.churned = 0
+        self.chunks = 0
+        self.seconds = 0.0
+        self.status = "running"  # running / done / cancelled / failed
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def run(self, file, model_call, chunk_rows: int = BULK_CHUNK_ROWS, progress=None):
+        """
+        Score every chunk of file. progress(job, fraction_done) is called
+        after each chunk. If the caller is interrupted (e.g. Streamlit
+        stopping the script for Cancel), status stays "running" and the
+        rows so far are already on disk.
+        """
+        writer = _OutputWriter(self.output_path)
+        started = time.perf_counter()
+        try:
+            for chunk, fraction in iter_upload_chunks(file, self.name, chunk_rows):
+                scored = score_chunk(chunk, model_call, self.rows)
+                writer.write(scored)
+                self.rows += len(scored)
+                self.churned += int((scored["predictedOutcome"] == 1).sum())
+                self.chunks += 1
+                self.seconds = time.perf_counter() - started
+                if progress is not None:
+                    progress(self, fraction)
+        except Exception:
+            self.status = "failed"
+            raise
+        finally:
+            writer.close()
+            self.seconds = time.perf_counter() - started
+        self.status = "done"
+        return self
+
+    @property
+    def expired(self) -> bool:
+        """True once the output file has been discarded or swept."""
+        return not os.path.exists(self.output_path)
+
+    def discard(self):
+        self._cleanup()
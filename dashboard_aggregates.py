@@ -0,0 +1,205 @@
+"""
+Materialized KPI / aggregate tables for the Dashboard views.
+
+show_kpi_overview() and show_eda_view() used to recompute churn rate,
+averages, groupby means, value_counts and the full correlation matrix
+from raw rows on every render. ChurnAggregates holds the sufficient
+statistics for all of them (counts, running means / co-moments from
+online_stats, per-group tallies), so a render only reads a handful of
+numbers.
+
+load_aggregates() computes them once per dataset version. When the CSV
+has only been appended to, just the new rows are read and folded in.
+"""
+import copy
+import csv
+import hashlib
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CHURN_DATA_PATH, CHURN_DTYPES, file_fingerprint, load_churn_dataset
+from online_stats import CovarianceAccumulator
+
+
+NUMERIC_COLUMNS = list(CHURN_DTYPES)
+LABELS = {0: "Stayed", 1: "Churned"}
+DATA_PLAN_LABELS = {0: "No Data Plan", 1: "Has Data Plan"}
+
+
+class ChurnAggregates:
+    """
+    Additive summary of churn rows. update() / merge() fold in more rows,
+    so it never needs the raw table again.
+    """
+
+    def __init__(self, columns=NUMERIC_COLUMNS):
+        self.columns = list(columns)
+        self.moments = CovarianceAccumulator(self.columns)  # means + corr()
+        self.label_counts_ = np.zeros(2, dtype=np.int64)
+        self.label_custserv = np.zeros(2)         # sum of CustServCalls per Churn value
+        self.dataplan_counts = np.zeros(2, dtype=np.int64)
+        self.dataplan_churn = np.zeros(2, dtype=np.int64)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns=NUMERIC_COLUMNS):
+        agg = cls(columns)
+        agg.update(df)
+        return agg
+
+    def update(self, df: pd.DataFrame):
+        """Fold more rows into the aggregates."""
+        if len(df) == 0:
+            return self
+        churn = df["Churn"].to_numpy().astype(np.int64)
+        plan = df["DataPlan"].to_numpy().astype(np.int64)
+
+        self.moments.update(df[self.columns].to_numpy(dtype=np.float64))
+        self.label_counts_ += np.bincount(churn, minlength=2)[:2]
+        self.label_custserv += np.bincount(churn, weights=df["CustServCalls"].to_numpy(np.float64), minlength=2)[:2]
+        self.dataplan_counts += np.bincount(plan, minlength=2)[:2]
+        self.dataplan_churn += np.bincount(plan, weights=churn, minlength=2)[:2].astype(np.int64)
+        return self
+
+    def merge(self, other: "ChurnAggregates"):
+        """Combine with aggregates computed over other rows."""
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge aggregates over different columns")
+        self.moments.merge(other.moments)
+        self.label_counts_ += other.label_counts_
+        self.label_custserv += other.label_custserv
+        self.dataplan_counts += other.dataplan_counts
+        self.dataplan_churn += other.dataplan_churn
+        return self
+
+    def copy(self) -> "ChurnAggregates":
+        """Independent copy, to update while other sessions read this one."""
+        return copy.deepcopy(self)
+
+    @property
+    def n(self) -> int:
+        return self.moments.n
+
+    # ---- KPI cards ----
+    def mean(self, column: str) -> float:
+        return self.moments.mean[self.columns.index(column)] if self.n else float("nan")
+
+    def churn_rate(self) -> float:
+        return self.mean("Churn") * 100
+
+    # ---- chart-ready tables ----
+    def label_counts(self) -> pd.DataFrame:
+        """Same as df["ChurnLabel"].value_counts(): Status / Count."""
+        counts = pd.DataFrame({
+            "Status": [LABELS[0], LABELS[1]],
+            "Count": self.label_counts_,
+        })
+        return counts.sort_values("Count", ascending=False, kind="stable").reset_index(drop=True)
+
+    def custserv_by_label(self) -> pd.DataFrame:
+        """Mean CustServCalls per ChurnLabel: ChurnLabel / AvgCustServCalls."""
+        present = self.label_counts_ > 0
+        return pd.DataFrame({
+            "ChurnLabel": [LABELS[i] for i in range(2) if present[i]],
+            "AvgCustServCalls": (self.label_custserv[present] / self.label_counts_[present]),
+        })
+
+    def churn_by_dataplan(self) -> pd.DataFrame:
+        """Churn rate by DataPlan: DataPlan / Churn / DataPlanLabel / ChurnRatePct."""
+        present = self.dataplan_counts > 0
+        rate = self.dataplan_churn[present] / self.dataplan_counts[present]
+        plans = [i for i in range(2) if present[i]]
+        return pd.DataFrame({
+            "DataPlan": plans,
+            "Churn": rate,
+            "DataPlanLabel": [DATA_PLAN_LABELS[i] for i in plans],
+            "ChurnRatePct": rate * 100,
+        })
+
+    def corr(self) -> pd.DataFrame:
+        """Pearson correlation of the numeric columns (like DataFrame.corr())."""
+        return self.moments.corr()
+
+
+_cache = {}  # abspath -> state dict
+_cache_lock = threading.Lock()
+
+# bytes hashed at the start of the file and just before the last read
+# offset, to tell an append from a rewrite (edits near the end included)
+_EDGE_BYTES = 64 * 1024
+
+
+def _prefix_hash(path: str, upto: int) -> str:
+    """Hash of the first and the last _EDGE_BYTES of the file's first upto bytes."""
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read(min(upto, _EDGE_BYTES)))
+        if upto > _EDGE_BYTES:
+            f.seek(max(_EDGE_BYTES, upto - _EDGE_BYTES))
+            digest.update(f.read(upto - f.tell()))
+    return digest.hexdigest()
+
+
+def _read_header(path: str) -> list:
+    """Column names from the CSV's header line."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+def _read_appended_rows(path: str, offset: int, header: list):
+    """Complete CSV lines written after byte offset, plus the new offset."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        tail = f.read()
+    end = tail.rfind(b"\n") + 1
+    if end == 0:
+        return pd.DataFrame(columns=NUMERIC_COLUMNS), offset
+    rows = pd.read_csv(
+        io.BytesIO(tail[:end]),
+        header=None,
+        names=header,
+        dtype={c: t for c, t in CHURN_DTYPES.items() if c in header},
+    )
+    return rows, offset + end
+
+
+def load_aggregates(path: str = CHURN_DATA_PATH) -> ChurnAggregates:
+    """
+    Aggregates for the current version of the dataset file. Full compute
+    the first time (or after a rewrite); appended rows are folded in
+    incrementally, into a copy that replaces the cached one (sessions
+    may be reading it).
+    """
+    key = os.path.abspath(path)
+    fingerprint = file_fingerprint(path)
+
+    with _cache_lock:
+        state = _cache.get(key)
+        if state is not None and state["fingerprint"] == fingerprint:
+            return state["aggregates"]
+
+        size = os.path.getsize(path)
+        if (
+            state is not None
+            and size > state["offset"]
+            and _prefix_hash(path, state["offset"]) == state["prefix_hash"]
+        ):
+            header = state["header"]
+            rows, offset = _read_appended_rows(path, state["offset"], header)
+            aggregates = state["aggregates"].copy().update(rows)
+        else:
+            header = _read_header(path)
+            df = load_churn_dataset(path)
+            aggregates = ChurnAggregates.from_frame(df)
+            offset = size
+
+        _cache[key] = {
+            "fingerprint": fingerprint,
+            "offset": offset,
+            "prefix_hash": _prefix_hash(path, offset),
+            "header": header,
+            "aggregates": aggregates,
+        }
+        return aggregates
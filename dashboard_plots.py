@@ -0,0 +1,382 @@
+"""
+Size-bounded churn scatter plots for the Dashboard.
+
+px.scatter ships every row to the browser. churn_scatter() keeps the
+payload bounded by switching mode on row count:
+
+- "raw"     up to max_points rows: every row, as before
+- "sample"  up to density_threshold rows: stratified sample of max_points
+            rows that keeps churners (up to half the budget, all of them if
+            there are fewer) and fills the rest with stayers
+- "density" above that: 2-D binning per churn class; one marker per
+            non-empty bin, sized by how many customers fall in it
+
+The returned caption says how many rows the chart represents.
+
+churn_histogram() does the same for histograms: bin counts per churn
+class are computed server-side with NumPy and cached per dataset version
+and bin spec, so Plotly only receives O(bins) bars instead of raw columns.
+Its box marginal is drawn from precomputed quartiles / whisker ends
+(box_stats), not from the raw column.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+
+SCATTER_MAX_POINTS = int(os.getenv("dashboard_scatter_max_points", "5000"))
+SCATTER_DENSITY_THRESHOLD = int(os.getenv("dashboard_scatter_density_threshold", "200000"))
+DENSITY_BINS = 60
+
+CHURN_COLORS = {
+    "Stayed": "#60a5fa",
+    "Churned": "#f87171"
+}
+
+
+def pick_mode(n_rows: int, max_points: int = SCATTER_MAX_POINTS,
+              density_threshold: int = SCATTER_DENSITY_THRESHOLD) -> str:
+    if n_rows <= max_points:
+        return "raw"
+    if n_rows <= density_threshold:
+        return "sample"
+    return "density"
+
+
+def stratified_sample(df: pd.DataFrame, max_points: int, seed: int = 0) -> pd.DataFrame:
+    """
+    At most max_points rows, keeping churners: they get up to half the
+    budget (all of them if fewer) and stayers fill the rest.
+    """
+    if len(df) <= max_points:
+        return df
+    rng = np.random.default_rng(seed)
+    churn_mask = df["Churn"].to_numpy() == 1
+    churn_idx = np.flatnonzero(churn_mask)
+    stay_idx = np.flatnonzero(~churn_mask)
+
+    n_churn = min(len(churn_idx), max_points // 2)
+    n_stay = min(len(stay_idx), max_points - n_churn)
+    # hand unused stayer budget back to churners
+    n_churn = min(len(churn_idx), max_points - n_stay)
+
+    keep = np.concatenate([
+        rng.choice(churn_idx, n_churn, replace=False),
+        rng.choice(stay_idx, n_stay, replace=False),
+    ])
+    keep.sort()
+    return df.iloc[keep]
+
+
+def density_bins(df: pd.DataFrame, x: str, y: str, bins: int = DENSITY_BINS) -> pd.DataFrame:
+    """
+    2-D histogram per ChurnLabel on shared bin edges. One row per
+    non-empty (label, bin): x / y bin centres, ChurnLabel, Count.
+    """
+    xs = df[x].to_numpy(dtype=np.float64)
+    ys = df[y].to_numpy(dtype=np.float64)
+    x_edges = np.histogram_bin_edges(xs, bins=bins)
+    y_edges = np.histogram_bin_edges(ys, bins=bins)
+    x_centres = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centres = (y_edges[:-1] + y_edges[1:]) / 2
+
+    churn = df["Churn"].to_numpy()
+    frames = []
+    for value, label in ((0, "Stayed"), (1, "Churned")):
+        mask = churn == value
+        counts, _, _ = np.histogram2d(xs[mask], ys[mask], bins=[x_edges, y_edges])
+        ix, iy = np.nonzero(counts)
+        frames.append(pd.DataFrame({
+            x: x_centres[ix],
+            y: y_centres[iy],
+            "ChurnLabel": label,
+            "Count": counts[ix, iy].astype(np.int64),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def churn_scatter(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    title: str,
+    labels: dict = None,
+    mode: str = "auto",
+    max_points: int = SCATTER_MAX_POINTS,
+    density_threshold: int = SCATTER_DENSITY_THRESHOLD,
+    total_rows: int = None,
+):
+    """
+    Churn-coloured scatter of x vs y with a bounded number of markers.
+    Pass total_rows when df is already a sample of a larger base (the
+    streaming path); it only changes the caption when it exceeds len(df).
+    Returns (fig, caption).
+    """
+    n_rows = len(df)
+    presampled = total_rows is not None and total_rows > n_rows
+    if mode == "auto":
+        mode = pick_mode(n_rows, max_points, density_threshold)
+
+    if mode == "density":
+        binned = density_bins(df, x, y)
+        fig = px.scatter(
+            binned,
+            x=x,
+            y=y,
+            color="ChurnLabel",
+            size="Count",
+            opacity=0.7,
+            title=title,
+            labels=labels,
+            color_discrete_map=CHURN_COLORS,
+            hover_data={"Count": True},
+        )
+        if presampled:
+            caption = f"Density view: {len(binned):,} bins summarizing a sample of {n_rows:,} of {total_rows:,} customers."
+        else:
+            caption = f"Density view: {len(binned):,} bins summarizing all {n_rows:,} customers."
+        return fig, caption
+
+    plotted = stratified_sample(df, max_points) if mode == "sample" else df
+    fig = px.scatter(
+        plotted,
+        x=x,
+        y=y,
+        color="ChurnLabel",
+        opacity=0.7,
+        title=title,
+        labels=labels,
+        color_discrete_map=CHURN_COLORS,
+    )
+    if presampled:
+        caption = (
+            f"Showing a per-class random sample of {len(plotted):,} of {total_rows:,} customers."
+        )
+    elif mode == "sample":
+        caption = (
+            f"Showing a stratified sample of {len(plotted):,} of {n_rows:,} customers "
+            "(churners kept preferentially)."
+        )
+    else:
+        caption = f"Showing all {n_rows:,} customers."
+    return fig, caption
+
+
+_histogram_cache = {}  # (version, column, nbins, discrete) or (version, column, "box") -> DataFrame
+_histogram_cache_lock = threading.Lock()
+HISTOGRAM_CACHE_SIZE = 64
+
+
+def histogram_counts(df: pd.DataFrame, column: str, nbins: int = 30, discrete: bool = False) -> pd.DataFrame:
+    """
+    Bin counts of df[column] per ChurnLabel on shared edges.
+    One row per (label, bin): ChurnLabel, bin_start, bin_end, bin_centre, Count.
+    discrete=True bins integer columns one value per bar (np.bincount).
+    """
+    values = df[column].to_numpy()
+    churn = df["Churn"].to_numpy()
+
+    if discrete:
+        values = values.astype(np.int64)
+        offset = values.min() if len(values) else 0
+        size = (values.max() - offset + 1) if len(values) else 0
+        starts = np.arange(size) + offset
+        ends = starts + 1
+        centres = starts.astype(np.float64)
+        per_class = [
+            np.bincount(values[churn == v] - offset, minlength=size)
+            for v in (0, 1)
+        ]
+    else:
+        values = values.astype(np.float64)
+        edges = np.histogram_bin_edges(values, bins=nbins)
+        starts, ends = edges[:-1], edges[1:]
+        centres = (starts + ends) / 2
+        per_class = [np.histogram(values[churn == v], bins=edges)[0] for v in (0, 1)]
+
+    frames = []
+    for label, counts in zip(("Stayed", "Churned"), per_class):
+        frames.append(pd.DataFrame({
+            "ChurnLabel": label,
+            "bin_start": starts,
+            "bin_end": ends,
+            "bin_centre": centres,
+            "Count": counts.astype(np.int64),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def box_stats(df: pd.DataFrame, column: str) -> pd.DataFrame:
+    """
+    Box-plot statistics of df[column] per ChurnLabel, like plotly's box:
+    q1 / median / q3 (linear quantiles) and whiskers at the furthest
+    values within 1.5 IQR of the box.
+    """
+    values = df[column].to_numpy(dtype=np.float64)
+    churn = df["Churn"].to_numpy()
+    rows = []
+    for value, label in ((0, "Stayed"), (1, "Churned")):
+        x = values[(churn == value) & np.isfinite(values)]
+        if len(x) == 0:
+            continue
+        q1, median, q3 = np.quantile(x, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        rows.append({
+            "ChurnLabel": label,
+            "q1": q1,
+            "median": median,
+            "q3": q3,
+            "lowerfence": x[x >= q1 - 1.5 * iqr].min(),
+            "upperfence": x[x <= q3 + 1.5 * iqr].max(),
+        })
+    return pd.DataFrame(rows, columns=["ChurnLabel", "q1", "median", "q3", "lowerfence", "upperfence"])
+
+
+def box_stats_from_counts(counts: pd.DataFrame) -> pd.DataFrame:
+    """
+    box_stats estimated from histogram_counts-shaped bin counts (e.g. a
+    streaming ingest): quantiles interpolated within their bin, whiskers
+    clipped to the occupied bins.
+    """
+    rows = []
+    for label in ("Stayed", "Churned"):
+        bins = counts[(counts["ChurnLabel"] == label) & (counts["Count"] > 0)]
+        if bins.empty:
+            continue
+        starts = bins["bin_start"].to_numpy(dtype=np.float64)
+        widths = bins["bin_end"].to_numpy(dtype=np.float64) - starts
+        n = bins["Count"].to_numpy(dtype=np.float64)
+        before = np.cumsum(n) - n
+
+        def quantile(q):
+            target = q * n.sum()
+            i = min(np.searchsorted(before + n, target), len(n) - 1)
+            return starts[i] + (target - before[i]) / n[i] * widths[i]
+
+        q1, median, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+        iqr = q3 - q1
+        rows.append({
+            "ChurnLabel": label,
+            "q1": q1,
+            "median": median,
+            "q3": q3,
+            "lowerfence": max(q1 - 1.5 * iqr, starts[0]),
+            "upperfence": min(q3 + 1.5 * iqr, starts[-1] + widths[-1]),
+        })
+    return pd.DataFrame(rows, columns=["ChurnLabel", "q1", "median", "q3", "lowerfence", "upperfence"])
+
+
+def _cached(key, compute):
+    """compute(), cached under key (with the dataset version first) if the version is known."""
+    if key[0] is None:
+        return compute()
+    with _histogram_cache_lock:
+        cached = _histogram_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = compute()
+    with _histogram_cache_lock:
+        if len(_histogram_cache) >= HISTOGRAM_CACHE_SIZE:
+            _histogram_cache.pop(next(iter(_histogram_cache)))
+        _histogram_cache[key] = result
+    return result
+
+
+def cached_histogram_counts(df: pd.DataFrame, column: str, nbins: int = 30,
+                            discrete: bool = False, version: str = None) -> pd.DataFrame:
+    """histogram_counts, cached per dataset version (skipped if version is None)."""
+    return _cached((version, column, nbins, discrete), lambda: histogram_counts(df, column, nbins, discrete))
+
+
+def cached_box_stats(df: pd.DataFrame, column: str, version: str = None) -> pd.DataFrame:
+    """box_stats, cached per dataset version (skipped if version is None)."""
+    return _cached((version, column, "box"), lambda: box_stats(df, column))
+
+
+def churn_histogram(
+    df: pd.DataFrame,
+    column: str,
+    title: str,
+    nbins: int = 30,
+    discrete: bool = False,
+    barmode: str = "relative",
+    opacity: float = None,
+    version: str = None,
+    counts: pd.DataFrame = None,
+    marginal: str = None,
+    box: pd.DataFrame = None,
+):
+    """
+    Histogram of column coloured by ChurnLabel, drawn from pre-binned counts.
+    barmode is px.histogram's ("relative" stacks the classes). counts can be
+    passed in directly (e.g. from a streaming ingest). marginal="box" adds
+    a box plot per class above the bars, from box (box_stats) if given,
+    else computed from df, or estimated from counts.
+    """
+    if counts is None:
+        counts = cached_histogram_counts(df, column, nbins, discrete, version)
+    width = (counts["bin_end"] - counts["bin_start"]).to_numpy()
+    if discrete and barmode == "group":
+        width = None  # let plotly split the slot between the two classes
+
+    fig = px.bar(
+        counts,
+        x="bin_centre",
+        y="Count",
+        color="ChurnLabel",
+        barmode=barmode,
+        opacity=opacity,
+        title=title,
+        labels={"bin_centre": column, "Count": "count"},
+        hover_data={"bin_start": True, "bin_end": True},
+    )
+    if width is not None:
+        for trace in fig.data:
+            trace.width = width[: len(trace.x)]
+    fig.update_layout(bargap=0 if not discrete else 0.1)
+    if marginal != "box":
+        return fig
+
+    if box is None:
+        box = cached_box_stats(df, column, version) if df is not None else box_stats_from_counts(counts)
+    # same layout as px.histogram(marginal="box"): boxes in a strip above the bars
+    with_box = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.26, 0.74], vertical_spacing=0.03)
+    colors = {trace.name: trace.marker.color for trace in fig.data}
+    for stats in box.itertuples(index=False):
+        with_box.add_trace(
+            go.Box(
+                name=stats.ChurnLabel,
+                y=[stats.ChurnLabel],
+                q1=[stats.q1],
+                median=[stats.median],
+                q3=[stats.q3],
+                lowerfence=[stats.lowerfence],
+                upperfence=[stats.upperfence],
+                orientation="h",
+                boxpoints=False,
+                marker_color=colors.get(stats.ChurnLabel),
+                legendgroup=stats.ChurnLabel,
+                showlegend=False,
+            ),
+            row=1,
+            col=1,
+        )
+    for trace in fig.data:
+        with_box.add_trace(trace, row=2, col=1)
+    with_box.update_layout(
+        title=fig.layout.title,
+        barmode=fig.layout.barmode,
+        bargap=fig.layout.bargap,
+        legend=fig.layout.legend,
+        template=fig.layout.template,
+    )
+    with_box.update_yaxes(showticklabels=False, row=1, col=1)
+    with_box.update_xaxes(title_text=column, row=2, col=1)
+    with_box.update_yaxes(title_text="count", row=2, col=1)
+    return with_box
@@ -0,0 +1,122 @@
+"""
+Typed, cached loading of the telecom churn dataset.
+
+The Dashboard used to pd.read_csv the dataset on every rerun (every
+selectbox change) and rebuild ChurnLabel each time. load_churn_dataset():
+
+- reads with explicit compact dtypes (int8 flags, float32 measures,
+  categorical ChurnLabel)
+- keeps one parsed copy per file in a process-wide cache, re-read only
+  when the file's mtime / size change
+- optionally writes a Parquet sidecar next to the CSV (needs pyarrow) so
+  a cold start skips CSV parsing
+
+The returned DataFrame is shared between sessions -- don't mutate it.
+"""
+import os
+import threading
+
+import pandas as pd
+
+
+CHURN_DATA_PATH = "./data/telecom_churn_v2.csv"
+
+CHURN_DTYPES = {
+    "Churn": "int8",
+    "AccountWeeks": "int16",
+    "ContractRenewal": "int8",
+    "DataPlan": "int8",
+    "DataUsage": "float32",
+    "CustServCalls": "int8",
+    "DayMins": "float32",
+    "DayCalls": "int16",
+    "MonthlyCharge": "float32",
+    "OverageFee": "float32",
+    "RoamMins": "float32",
+}
+
+CHURN_LABELS = pd.CategoricalDtype(["Stayed", "Churned"])
+
+_cache = {}  # abspath -> (fingerprint, DataFrame)
+_cache_lock = threading.Lock()
+
+
+def file_fingerprint(path: str) -> str:
+    """Cheap version tag for a file: mtime (ns) + size."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _sidecar_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def _read_sidecar(path: str, fingerprint: str):
+    """Parquet sidecar if it was written from this exact CSV version."""
+    sidecar = _sidecar_path(path)
+    if not os.path.exists(sidecar):
+        return None
+    try:
+        import pyarrow.parquet as pq
+        table = pq.read_table(sidecar)
+    except Exception:
+        return None
+    metadata = table.schema.metadata or {}
+    if metadata.get(b"source_fingerprint", b"").decode() != fingerprint:
+        return None
+    return table.to_pandas()
+
+
+def _write_sidecar(path: str, fingerprint: str, df: pd.DataFrame):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[b"source_fingerprint"] = fingerprint.encode()
+        pq.write_table(table.replace_schema_metadata(metadata), _sidecar_path(path))
+    except (OSError, pa.ArrowException):
+        # read-only data dir etc. -- the CSV path still works
+        pass
+
+
+def read_churn_csv(path: str, **read_csv_kwargs) -> pd.DataFrame:
+    """pd.read_csv with the compact churn dtypes plus the ChurnLabel column."""
+    df = pd.read_csv(path, dtype=CHURN_DTYPES, **read_csv_kwargs)
+    return add_churn_label(df)
+
+
+def add_churn_label(df: pd.DataFrame) -> pd.DataFrame:
+    # Churn is 0/1, we can map that to labels for plotting
+    df["ChurnLabel"] = pd.Categorical.from_codes(df["Churn"].astype("int8"), dtype=CHURN_LABELS)
+    return df
+
+
+def load_churn_dataset(path: str = CHURN_DATA_PATH, use_sidecar: bool = True) -> pd.DataFrame:
+    """
+    Cached, typed churn dataset. Re-reads only when the file changes.
+    """
+    key = os.path.abspath(path)
+    fingerprint = file_fingerprint(path)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        df = _read_sidecar(path, fingerprint) if use_sidecar else None
+        if df is None:
+            df = read_churn_csv(path)
+            if use_sidecar:
+                _write_sidecar(path, fingerprint, df)
+
+        _cache[key] = (fingerprint, df)
+        return df
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,86 @@
+"""
+Feature engineering shared by the Predict page, batch scoring and the
+inference script.
+
+The training CSVs only have the raw telecom columns; the model also takes
+two engineered features:
+
+    AvgCallDuration = DayMins / (DayCalls + EPS)
+    CostPerUsage    = MonthlyCharge / (DayMins + RoamMins + EPS)
+
+The scalar functions (for the form) and the vectorized ones (for
+DataFrames / arrays) do the same float64 operations in the same order,
+so they give bit-identical results.
+
+Ship this file next to inference-script.py when deploying to Azure.
+"""
+import numpy as np
+
+
+EPS = 1e-6
+
+# Feature order the random forest was trained on
+FEATURE_COLUMNS = [
+    "AccountWeeks",
+    "ContractRenewal",
+    "DataPlan",
+    "DataUsage",
+    "CustServCalls",
+    "DayMins",
+    "DayCalls",
+    "MonthlyCharge",
+    "OverageFee",
+    "RoamMins",
+    "AvgCallDuration",
+    "CostPerUsage",
+]
+
+ENGINEERED_COLUMNS = ["AvgCallDuration", "CostPerUsage"]
+
+
+# ---- scalar API (one customer) ----
+def avg_call_duration(day_mins: float, day_calls: float) -> float:
+    return float(day_mins) / (float(day_calls) + EPS)
+
+
+def cost_per_usage(monthly_charge: float, day_mins: float, roam_mins: float) -> float:
+    return float(monthly_charge) / (float(day_mins) + float(roam_mins) + EPS)
+
+
+def engineer_row(row: dict) -> dict:
+    """Copy of a raw row dict with AvgCallDuration / CostPerUsage filled in."""
+    row = dict(row)
+    row["AvgCallDuration"] = avg_call_duration(row["DayMins"], row["DayCalls"])
+    row["CostPerUsage"] = cost_per_usage(row["MonthlyCharge"], row["DayMins"], row["RoamMins"])
+    return row
+
+
+# ---- vectorized API (many customers) ----
+def avg_call_duration_array(day_mins, day_calls) -> np.ndarray:
+    return np.asarray(day_mins, dtype=np.float64) / (np.asarray(day_calls, dtype=np.float64) + EPS)
+
+
+def cost_per_usage_array(monthly_charge, day_mins, roam_mins) -> np.ndarray:
+    return np.asarray(monthly_charge, dtype=np.float64) / (
+        np.asarray(day_mins, dtype=np.float64) + np.asarray(roam_mins, dtype=np.float64) + EPS
+    )
+
+
+def add_engineered_features(df, overwrite: bool = False):
+    """
+    Add AvgCallDuration / CostPerUsage columns to a DataFrame in place
+    (kept as-is if already present, unless overwrite). Returns df.
+    """
+    if overwrite or "AvgCallDuration" not in df.columns:
+        df["AvgCallDuration"] = avg_call_duration_array(df["DayMins"], df["DayCalls"])
+    if overwrite or "CostPerUsage" not in df.columns:
+        df["CostPerUsage"] = cost_per_usage_array(df["MonthlyCharge"], df["DayMins"], df["RoamMins"])
+    return df
+
+
+def feature_matrix(df) -> np.ndarray:
+    """float64 (n_rows, 12) matrix in model order, deriving engineered columns if needed."""
+    missing = [c for c in ENGINEERED_COLUMNS if c not in df.columns]
+    if missing:
+        df = add_engineered_features(df.copy())
+    return df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
@@ -0,0 +1,222 @@
+"""
+Flattened, memory-mappable random forest artifact.
+
+joblib.load of random_forest_best.pkl rebuilds every tree as a Python /
+Cython object. sklearn copies the node arrays into each Tree, so even
+joblib.load(mmap_mode="r") gives every replica and worker its own copy.
+export_forest() writes the fitted forest as a handful of contiguous .npy
+arrays (all trees' nodes back to back). load_forest() opens them with
+np.load(mmap_mode="r"), so start-up is a few file opens and every process
+on the host shares the same read-only pages.
+
+FlatForest scores with the same arithmetic as sklearn: features are cast
+to float32 before comparing to the float64 thresholds, and per-tree
+probabilities are summed in estimator order and divided by the tree count.
+It skips sklearn's per-call validation and per-estimator dispatch, so
+inference-script.py also uses an in-memory FlatForest.from_estimator()
+copy of the pickle as a fast path for single rows and small batches.
+Missing values are not supported: sklearn routes NaN per node, so
+FlatForest refuses non-finite features instead of guessing a branch.
+
+    python flat_forest.py export model/random_forest_best.pkl model/random_forest_flat
+    python flat_forest.py check model/random_forest_best.pkl model/random_forest_flat \\
+        data/telecom_churn_v2.csv
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+
+FLAT_ARRAYS = ("feature", "threshold", "children", "value", "roots")
+FLAT_META = "forest.json"
+
+
+def flatten_forest(model):
+    """
+    (arrays, meta) for a fitted RandomForestClassifier: every tree's nodes
+    back to back, with global node ids.
+    """
+    trees = [est.tree_ for est in model.estimators_]
+    n_classes = int(model.n_classes_)
+
+    offsets = np.cumsum([0] + [t.node_count for t in trees])
+    feature, threshold, children, value = [], [], [], []
+    for tree, offset in zip(trees, offsets[:-1]):
+        is_leaf = tree.children_left == -1
+        feature.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        threshold.append(tree.threshold.astype(np.float64))
+        # (left, right) per node; a leaf points at itself so traversal can stop there
+        own = np.arange(tree.node_count) + offset
+        children.append(np.column_stack([
+            np.where(is_leaf, own, tree.children_left + offset),
+            np.where(is_leaf, own, tree.children_right + offset),
+        ]).astype(np.int32))
+
+        leaf_value = tree.value[:, 0, :n_classes].astype(np.float64)
+        totals = leaf_value.sum(axis=1, keepdims=True)
+        if not np.allclose(totals, 1.0):
+            # older sklearn stores raw class counts and normalizes in predict_proba
+            totals[totals == 0.0] = 1.0
+            leaf_value = leaf_value / totals
+        value.append(leaf_value)
+
+    arrays = {
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "children": np.ascontiguousarray(np.concatenate(children)),
+        "value": np.ascontiguousarray(np.concatenate(value)),
+        "roots": offsets[:-1].astype(np.int32),
+    }
+    meta = {
+        "n_estimators": len(trees),
+        "n_features": int(model.n_features_in_),
+        "classes": np.asarray(model.classes_).tolist(),
+        "max_depth": int(max(t.max_depth for t in trees)),
+    }
+    return arrays, meta
+
+
+def export_forest(model, out_dir: str):
+    """Write a fitted RandomForestClassifier as flat node arrays in out_dir."""
+    arrays, meta = flatten_forest(model)
+    os.makedirs(out_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), array)
+    with open(os.path.join(out_dir, FLAT_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+class FlatForest:
+    """
+    Random forest scored straight from flat node arrays (possibly
+    memory-mapped). Drop-in for the predict / predict_proba / classes_
+    that inference-script.py uses, without sklearn's per-call input
+    validation and per-estimator dispatch.
+    """
+
+    # rows per block in predict_proba; bounds the (trees, rows, classes) temporary
+    block_rows = 4096
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children = arrays["children"].reshape(-1)  # left = 2*node, right = 2*node + 1
+        self.value = arrays["value"]
+        self.roots = np.asarray(arrays["roots"], dtype=np.intp)
+        self.n_estimators = meta["n_estimators"]
+        self.n_features_in_ = meta["n_features"]
+        self.classes_ = np.asarray(meta["classes"])
+        self.max_depth = meta["max_depth"]
+
+    @classmethod
+    def from_estimator(cls, model) -> "FlatForest":
+        """In-memory flat copy of a fitted RandomForestClassifier."""
+        return cls(*flatten_forest(model))
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf node id per (row, tree). All rows x trees walk down together."""
+        X = np.asarray(X, dtype=np.float32)
+        if not np.isfinite(X).all():
+            raise ValueError("FlatForest only scores finite features (got NaN or infinity)")
+        n_rows, n_features = X.shape
+        flat_x = X.reshape(-1)
+        row_base = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        node = np.broadcast_to(self.roots, (n_rows, self.n_estimators)).copy()
+        for _ in range(self.max_depth):
+            go_left = flat_x.take(row_base + self.feature.take(node)) <= self.threshold.take(node)
+            node = self.children.take(2 * node + ~go_left)
+        return node
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        proba = np.empty((leaves.shape[0], self.value.shape[1]), dtype=np.float64)
+        for start in range(0, leaves.shape[0], self.block_rows):
+            block = leaves[start:start + self.block_rows]
+            # reducing over the leading (tree) axis adds tree by tree,
+            # the same summation order as sklearn
+            proba[start:start + len(block)] = np.add.reduce(self.value[block.T], axis=0)
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def load_forest(path: str, mmap: bool = True) -> FlatForest:
+    """Open an exported forest; mmap=True shares pages between processes."""
+    mode = "r" if mmap else None
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+        for name in FLAT_ARRAYS
+    }
+    with open(os.path.join(path, FLAT_META), encoding="utf-8") as f:
+        meta = json.load(f)
+    return FlatForest(arrays, meta)
+
+
+def is_flat_forest(path: str) -> bool:
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, FLAT_META))
+
+
+def assert_parity(reference, flat: FlatForest, X):
+    """
+    Raise AssertionError unless flat gives exactly the reference model's
+    predict_proba (bit for bit) and predict on X's finite rows, and
+    refuses (ValueError) X's non-finite rows rather than scoring them.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    finite = np.isfinite(X).all(axis=1)
+    for i in np.flatnonzero(~finite):
+        try:
+            flat.predict_proba(X[i:i + 1])
+        except ValueError:
+            continue
+        raise AssertionError(f"non-finite row {i} was scored instead of rejected")
+    X = X[finite]
+    expected = reference.predict_proba(X)
+    got = flat.predict_proba(X)
+    mismatched = int(np.count_nonzero((expected != got).any(axis=1)))
+    if mismatched:
+        raise AssertionError(f"predict_proba differs on {mismatched} of {len(X)} rows")
+    if not np.array_equal(reference.predict(X), flat.predict(X)):
+        raise AssertionError("predict differs")
+    if not np.array_equal(reference.classes_, flat.classes_):
+        raise AssertionError(f"classes differ: {reference.classes_} vs {flat.classes_}")
+
+
+def parity_rows(csv_path: str = None, n_random: int = 10_000, seed: int = 0) -> np.ndarray:
+    """
+    Rows to check parity on: the churn CSV's rows (if given) plus random
+    rows over the same value ranges.
+    """
+    import pandas as pd
+    from features import FEATURE_COLUMNS, feature_matrix
+
+    rng = np.random.default_rng(seed)
+    low = np.array([1, 0, 0, 0, 0, 0, 0, 14, 0, 0, 0, 0], dtype=np.float64)
+    high = np.array([243, 1, 1, 5.4, 9, 350, 165, 112, 19, 20, 10, 1], dtype=np.float64)
+    blocks = [rng.uniform(low, high, (n_random, len(FEATURE_COLUMNS)))]
+    if csv_path is not None:
+        blocks.insert(0, feature_matrix(pd.read_csv(csv_path)))
+    return np.concatenate(blocks)
+
+
+if __name__ == "__main__":
+    usage = (
+        "usage: python flat_forest.py export <model.pkl> <out_dir>\n"
+        "       python flat_forest.py check <model.pkl> <flat_dir> [churn.csv]"
+    )
+    if len(sys.argv) < 4 or sys.argv[1] not in ("export", "check"):
+        sys.exit(usage)
+    import joblib
+
+    reference = joblib.load(sys.argv[2])
+    if sys.argv[1] == "export":
+        export_forest(reference, sys.argv[3])
+        print(f"Exported {sys.argv[2]} -> {sys.argv[3]}")
+    else:
+        X = parity_rows(sys.argv[4] if len(sys.argv) > 4 else None)
+        assert_parity(reference, load_forest(sys.argv[3]), X)
+        print(f"{sys.argv[3]} matches {sys.argv[2]} on {len(X):,} rows")
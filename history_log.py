@@ -0,0 +1,277 @@
+"""
+Append-only prediction log behind prediction_history.csv.
+
+The Predict page used to rebuild a DataFrame from the whole session
+history and rewrite the CSV on every click: O(history) per write, and two
+sessions would overwrite each other's rows. Now each prediction is one
+appended CSV line:
+
+- writes are queued and done by a background thread, so the UI never
+  waits on disk
+- each batch is appended under an exclusive file lock, so several
+  sessions / processes can log at once
+- fsync is batched (at most once per fsync_interval seconds); a batch
+  written without one is fsynced by the writer thread once the interval
+  is up, even if nothing else is logged
+- a batch that fails to append is retried with exponential backoff, and
+  only dropped (and logged as an error) after max_retries attempts
+
+After each append the indexed SQLite store (history_store.py) that the
+History page reads from is caught up from the CSV; if that fails the
+writer thread retries the catch-up while idle, so the two can't drift.
+"""
+import atexit
+import csv
+import io
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+from stage_timing import span
+
+
+HISTORY_PATH = "prediction_history.csv"
+
+HISTORY_COLUMNS = [
+    "timestamp",
+    "prediction_raw",
+    "prediction_label",
+    "AccountWeeks",
+    "ContractRenewal",
+    "DataPlan",
+    "DataUsage",
+    "CustServCalls",
+    "DayMins",
+    "DayCalls",
+    "MonthlyCharge",
+    "OverageFee",
+    "RoamMins",
+    "AvgCallDuration",
+    "CostPerUsage",
+]
+
+
+class _FileLock:
+    """Exclusive advisory lock on an open file (flock / msvcrt.locking)."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            self.f.seek(0)
+            msvcrt.locking(self.f.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            self.f.seek(0)
+            msvcrt.locking(self.f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def append_rows(path: str, rows: list, columns=HISTORY_COLUMNS, fsync: bool = True):
+    """
+    Append rows (dicts) to a CSV under an exclusive lock, writing the
+    header only if the file is empty. Synchronous; used by the writer thread.
+    """
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=columns, extrasaction="ignore", lineterminator="\n")
+    for row in rows:
+        writer.writerow(row)
+
+    with open(path, "a+", newline="", encoding="utf-8") as f:
+        with _FileLock(f):
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                f.write(",".join(columns) + "\n")
+            f.write(buf.getvalue())
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+
+class HistoryWriter:
+    """
+    Background thread that drains queued log entries and appends them in
+    batches. append() is O(1) and never touches the disk.
+    """
+
+    def __init__(
+        self,
+        path: str = HISTORY_PATH,
+        max_batch: int = 256,
+        flush_interval: float = 0.2,
+        fsync_interval: float = 1.0,
+        max_retries: int = 5,
+        retry_backoff: float = 0.5,
+        store=None,
+    ):
+        self.path = path
+        self.store = store
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.last_error = None
+
+        self._queue = queue.Queue()
+        self._retry = None  # (batch, failed attempts) waiting for its backoff
+        self._last_fsync = 0.0
+        self._unsynced = False
+        self._store_behind = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def append(self, entry: dict):
+        self._queue.put(entry)
+
+    def _drain(self, first):
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch, attempts: int = 0):
+        """
+        Append batch to the CSV (then the store). On failure the batch is
+        kept for a retry after a backoff; its queue tasks stay open until it
+        is written or, after max_retries attempts, dropped.
+        """
+        now = time.monotonic()
+        fsync = now - self._last_fsync >= self.fsync_interval
+        try:
+            with span("history.write_batch"):
+                append_rows(self.path, batch, fsync=fsync)
+        except OSError as e:
+            # keep the writer alive; the page can surface last_error
+            self.last_error = e
+            attempts += 1
+            if attempts < self.max_retries:
+                self._retry = (batch, attempts)
+                return
+            self.rows_dropped += len(batch)
+            logging.error(
+                "Dropped %d prediction history rows after %d failed writes to %s: %s",
+                len(batch), attempts, self.path, e,
+            )
+        else:
+            self.rows_written += len(batch)
+            if fsync:
+                self._last_fsync = now
+            self._unsynced = not fsync
+            self.last_error = None
+            self._sync_store()
+        for _ in batch:
+            self._queue.task_done()
+
+    def _sync_store(self):
+        """Catch the store up from the CSV; on failure, retried while idle."""
+        if self.store is None:
+            return
+        try:
+            self.store.sync_from_csv(self.path)
+            self._store_behind = False
+        except (sqlite3.Error, OSError) as e:
+            self.last_error = e
+            self._store_behind = True
+
+    def _sync_if_due(self):
+        """fsync a batch that was appended without one, once fsync_interval is up."""
+        now = time.monotonic()
+        if not self._unsynced or now - self._last_fsync < self.fsync_interval:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                os.fsync(f.fileno())
+            self._last_fsync = now
+            self._unsynced = False
+        except OSError as e:
+            self.last_error = e
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._retry is not None:
+                batch, attempts = self._retry
+                # 0.5 s, 1 s, 2 s, ... between attempts
+                self._stop.wait(self.retry_backoff * 2 ** (attempts - 1))
+                self._retry = None
+                self._write(batch, attempts)
+                continue
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._sync_if_due()
+                if self._store_behind:
+                    self._sync_store()
+                continue
+            self._write(self._drain(first))
+
+    def flush(self, timeout: float = None):
+        """Block until everything queued so far is on disk (fsynced)."""
+        if timeout is None:
+            self._queue.join()
+        else:
+            self._wait(timeout)
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                os.fsync(f.fileno())
+            self._unsynced = False
+        except OSError as e:
+            self.last_error = e
+
+    def _wait(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        self.flush()
+        self._stop.set()
+        self._thread.join()
+        if self._store_behind:
+            self._sync_store()
+
+
+_shared_writer = None
+_shared_writer_lock = threading.Lock()
+
+
+def get_history_writer() -> HistoryWriter:
+    """Process-wide writer shared by every Streamlit session."""
+    global _shared_writer
+    if _shared_writer is None:
+        with _shared_writer_lock:
+            if _shared_writer is None:
+                # imported here: history_store reuses this module's columns
+                from history_store import get_history_store
+                _shared_writer = HistoryWriter(store=get_history_store())
+                atexit.register(_shared_writer.close)
+    return _shared_writer
+
+
+def append_prediction(log_entry: dict):
+    """Queue one prediction for the history log; returns immediately."""
+    get_history_writer().append(log_entry)
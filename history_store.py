@@ -0,0 +1,308 @@
+"""
+Indexed prediction history store (SQLite) backing the History page.
+
+Reading the whole history CSV on every rerun gets slower as the audit
+trail grows. Here predictions live in a SQLite table indexed on timestamp
+and prediction label, and the History page only ever asks for:
+
+- one page of rows, by keyset on (timestamp, id) over the timestamp
+  index: the page after a cursor, never an OFFSET to skip over
+- KPI and per-label counts, kept incrementally in a per-day aggregate
+  table that is updated in the same transaction as each insert
+
+so a page view costs the same whether the history holds 10 rows or 10M.
+
+The CSV stays the source of truth: the store records how many bytes of
+prediction_history.csv it has imported (a watermark) and sync_from_csv()
+imports whatever was appended past it, in one transaction with the new
+watermark. A store write that fails is simply caught up by the next sync,
+and rows appended by other processes get picked up too.
+"""
+import csv
+import io
+import logging
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+from history_log import HISTORY_COLUMNS, HISTORY_PATH, _FileLock
+
+
+HISTORY_DB_PATH = os.getenv("prediction_history_db", "prediction_history.sqlite")
+
+# prediction_label as logged by the Predict page -> prediction_raw
+LABEL_RAW = {"Churn": 1, "Stay": 0}
+
+INT_COLUMNS = {"prediction_raw", "AccountWeeks", "ContractRenewal", "DataPlan", "CustServCalls", "DayCalls"}
+TEXT_COLUMNS = {"timestamp", "prediction_label"}
+
+# bytes of CSV read per step while catching up
+SYNC_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def _sql_type(column: str) -> str:
+    if column in TEXT_COLUMNS:
+        return "TEXT"
+    if column in INT_COLUMNS:
+        return "INTEGER"
+    return "REAL"
+
+
+class HistoryStore:
+    """
+    SQLite-backed prediction log. Safe to share across threads; several
+    processes can write at once (WAL mode).
+    """
+
+    def __init__(self, path: str = HISTORY_DB_PATH, seed_csv: str = HISTORY_PATH):
+        self.path = path
+        self.csv_path = seed_csv
+        self.rows_skipped = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        created = self._create_schema()
+        if seed_csv:
+            if not created and self._watermark(seed_csv) is None:
+                # store from before watermarks: it already holds the CSV
+                size = os.path.getsize(seed_csv) if os.path.exists(seed_csv) else 0
+                with self._db:
+                    self._set_watermark(seed_csv, size)
+            self.sync_from_csv(seed_csv)
+
+    def _create_schema(self) -> bool:
+        """Create tables / indexes; True if the predictions table is new."""
+        exists = self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'predictions'"
+        ).fetchone()
+        columns = ", ".join(f'"{c}" {_sql_type(c)}' for c in HISTORY_COLUMNS)
+        with self._db:
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS predictions (id INTEGER PRIMARY KEY AUTOINCREMENT, {columns})"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS predictions_timestamp ON predictions (timestamp)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS predictions_label_timestamp "
+                "ON predictions (prediction_label, timestamp)"
+            )
+            # incremental KPI aggregates, one row per (day, outcome)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS daily_counts ("
+                " day TEXT NOT NULL,"
+                " prediction_raw INTEGER NOT NULL,"
+                " n INTEGER NOT NULL,"
+                " PRIMARY KEY (day, prediction_raw))"
+            )
+            # bytes of each source CSV already imported
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS csv_sync ("
+                " source TEXT PRIMARY KEY,"
+                " byte_offset INTEGER NOT NULL)"
+            )
+        return exists is None
+
+    def _watermark(self, csv_path: str):
+        row = self._db.execute(
+            "SELECT byte_offset FROM csv_sync WHERE source = ?", (os.path.abspath(csv_path),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_watermark(self, csv_path: str, offset: int):
+        self._db.execute(
+            "INSERT INTO csv_sync (source, byte_offset) VALUES (?, ?) "
+            "ON CONFLICT (source) DO UPDATE SET byte_offset = excluded.byte_offset",
+            (os.path.abspath(csv_path), offset),
+        )
+
+    def _insert(self, rows) -> int:
+        """
+        Insert rows inside the caller's transaction; rows without a
+        timestamp or with a non-numeric prediction_raw are skipped.
+        """
+        values, daily, skipped = [], {}, 0
+        for row in rows:
+            try:
+                raw = int(float(row.get("prediction_raw")))
+            except (TypeError, ValueError):
+                raw = None
+            if raw is None or not row.get("timestamp"):
+                skipped += 1
+                continue
+            values.append(tuple(raw if c == "prediction_raw" else row.get(c) for c in HISTORY_COLUMNS))
+            key = (str(row["timestamp"])[:10], raw)
+            daily[key] = daily.get(key, 0) + 1
+        if skipped:
+            self.rows_skipped += skipped
+            logging.warning("Skipped %d malformed prediction history rows", skipped)
+        if not values:
+            return 0
+
+        placeholders = ", ".join("?" for _ in HISTORY_COLUMNS)
+        quoted = ", ".join(f'"{c}"' for c in HISTORY_COLUMNS)
+        self._db.executemany(f"INSERT INTO predictions ({quoted}) VALUES ({placeholders})", values)
+        self._db.executemany(
+            "INSERT INTO daily_counts (day, prediction_raw, n) VALUES (?, ?, ?) "
+            "ON CONFLICT (day, prediction_raw) DO UPDATE SET n = n + excluded.n",
+            [(day, raw, n) for (day, raw), n in daily.items()],
+        )
+        return len(values)
+
+    def insert_many(self, rows: list) -> int:
+        """
+        Insert log entries (dicts with HISTORY_COLUMNS keys) and bump the
+        aggregates. Returns the number inserted (malformed rows are skipped).
+        """
+        if not rows:
+            return 0
+        with self._lock, self._db:
+            return self._insert(rows)
+
+    def sync_from_csv(self, csv_path: str = None) -> int:
+        """
+        Import the complete lines appended to csv_path since the last
+        sync and advance its watermark, in one transaction. Idempotent and
+        safe to call from several processes; returns the rows imported.
+        """
+        csv_path = csv_path or self.csv_path
+        if not os.path.exists(csv_path):
+            return 0
+        imported = 0
+        with self._lock:
+            # IMMEDIATE: one syncing writer at a time, so no line is imported twice
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                offset = self._watermark(csv_path) or 0
+                with open(csv_path, "rb") as f, _FileLock(f):
+                    header = f.readline()
+                    fieldnames = next(csv.reader([header.decode("utf-8")]), None)
+                    if fieldnames:
+                        offset = max(offset, len(header))
+                        f.seek(offset)
+                        while True:
+                            chunk = f.read(SYNC_CHUNK_BYTES)
+                            end = chunk.rfind(b"\n") + 1
+                            if end == 0:
+                                # nothing or only a partly written line left
+                                break
+                            text = io.StringIO(chunk[:end].decode("utf-8"), newline="")
+                            imported += self._insert(csv.DictReader(text, fieldnames=fieldnames))
+                            offset += end
+                            f.seek(offset)
+                self._set_watermark(csv_path, offset)
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+        return imported
+
+    @staticmethod
+    def _where(start: str = None, end: str = None, label: str = None, before: tuple = None):
+        """
+        WHERE clause for an inclusive [start, end] day range, optional
+        label, and optional keyset cursor before = (timestamp, id).
+        """
+        clauses, params = [], []
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if before is not None:
+            # the cursor came from a row in range, so it replaces the end
+            # bound; one upper bound lets the index seek straight to it
+            clauses.append("timestamp <= ? AND (timestamp < ? OR id < ?)")
+            params.extend([before[0], before[0], before[1]])
+        elif end:
+            # timestamps are "YYYY-MM-DD HH:MM"; include the whole end day
+            clauses.append("timestamp < ?")
+            params.append((date.fromisoformat(end) + timedelta(days=1)).isoformat())
+        if label:
+            clauses.append("prediction_label = ?")
+            params.append(label)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params
+
+    def kpis(self, start: str = None, end: str = None) -> dict:
+        """
+        Total / churn / stay counts and churn rate from the per-day
+        aggregates (cost grows with the number of days, not rows).
+        start / end are "YYYY-MM-DD" days, inclusive.
+        """
+        clauses, params = [], []
+        if start:
+            clauses.append("day >= ?")
+            params.append(start)
+        if end:
+            clauses.append("day <= ?")
+            params.append(end)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT prediction_raw, SUM(n) FROM daily_counts{where} GROUP BY prediction_raw",
+                params,
+            ).fetchall()
+        counts = {raw: n for raw, n in rows}
+        total = sum(counts.values())
+        churn = counts.get(1, 0)
+        return {
+            "total": total,
+            "churn": churn,
+            "stay": counts.get(0, 0),
+            "churn_rate": (churn / total * 100) if total else 0.0,
+        }
+
+    def count(self, start: str = None, end: str = None, label: str = None) -> int:
+        """Matching rows, from the per-day aggregates like kpis()."""
+        kpis = self.kpis(start, end)
+        if not label:
+            return kpis["total"]
+        return kpis["churn"] if LABEL_RAW.get(label) == 1 else kpis["stay"]
+
+    def page(
+        self,
+        page_size: int = 50,
+        start: str = None,
+        end: str = None,
+        label: str = None,
+        before: tuple = None,
+    ) -> list:
+        """
+        One page of rows (dicts, with their "id"), newest first: the
+        page_size rows after the cursor before = (timestamp, id) of the
+        previous page's last row, or the newest rows if before is None.
+        """
+        where, params = self._where(start, end, label, before)
+        quoted = ", ".join(f'"{c}"' for c in HISTORY_COLUMNS)
+        with self._lock:
+            cursor = self._db.execute(
+                f"SELECT id, {quoted} FROM predictions{where} "
+                "ORDER BY timestamp DESC, id DESC LIMIT ?",
+                params + [page_size],
+            )
+            return [dict(zip(["id"] + HISTORY_COLUMNS, row)) for row in cursor.fetchall()]
+
+    def day_bounds(self):
+        """(first_day, last_day) in the store, or (None, None) if empty."""
+        with self._lock:
+            return self._db.execute("SELECT MIN(day), MAX(day) FROM daily_counts").fetchone()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """Process-wide store shared by every Streamlit session."""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = HistoryStore()
+    return _shared_store
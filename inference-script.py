@@ -1,54 +1,390 @@
 import os
 import logging
-import json
+import time
 import numpy
 import joblib
+# features.py must be deployed alongside this script
+from features import (
+    ENGINEERED_COLUMNS,
+    FEATURE_COLUMNS,
+    avg_call_duration_array,
+    cost_per_usage_array,
+    engineer_row,
+)
+# and flat_forest.py (fast path / memory-mapped model artifact)
+from flat_forest import FlatForest, is_flat_forest, load_forest
+# and run_metrics.py (per-stage timings, flushed periodically)
+from run_metrics import RunMetrics
+# and wire_format.py (JSON / Arrow IPC request and response bodies)
+from wire_format import (
+    ARROW_CONTENT_TYPE,
+    JSON_CONTENT_TYPE,
+    UnsupportedMediaType,
+    accepts_gzip,
+    arrow_available,
+    decode_arrow_request,
+    decode_content,
+    dumps_json,
+    echo_rows,
+    encode_arrow_response,
+    gzip_body,
+    loads_json,
+    media_type,
+    negotiate,
+)
 
+try:
+    # Azure ML: with @rawhttp, run() gets the HTTP request (body + headers)
+    from azureml.contrib.services.aml_request import rawhttp
+    from azureml.contrib.services.aml_response import AMLResponse
+except ImportError:  # local callers pass the JSON body string
+    def rawhttp(func):
+        return func
+    AMLResponse = None
 
-def init():
+# columns the original loop cast with int(); everything else is float
+INT_COLUMNS = ["AccountWeeks", "ContractRenewal", "DataPlan", "CustServCalls", "DayCalls"]
+INT_COLUMN_MASK = numpy.array([c in INT_COLUMNS for c in FEATURE_COLUMNS])
+
+# batches up to this many rows skip sklearn and use the flat evaluator
+# (0 turns the fast path off)
+FAST_PATH_MAX_ROWS = int(os.environ.get("model_fast_path_max_rows", "256"))
+
+model = None
+fast_model = None
+metrics = RunMetrics()
+
+
+def default_model_path():
+    """
+    The flattened forest (model/random_forest_flat/, see flat_forest.py)
+    if it was deployed, else the pickle.
     """
-    init function 
+    model_dir = os.environ['AZUREML_MODEL_DIR'] + "/model"
+    flat_dir = model_dir + "/random_forest_flat"
+    if is_flat_forest(flat_dir):
+        return flat_dir
+    return model_dir + "/random_forest_best.pkl"
+
+
+def init(model_path=None):
+    """
+    init function
+    Azure calls this with no arguments; local callers (batch scoring,
+    the mock endpoint) can pass the model path directly.
+
+    A flat_forest directory is memory-mapped, so replicas / workers on
+    one host share its pages. For the pickle, model_joblib_mmap=1 passes
+    mmap_mode="r" to joblib.load.
     """
     # load model
-    global model
-    
-    model_path = os.environ['AZUREML_MODEL_DIR'] + "/model/random_forest_best.pkl"
-    model = joblib.load(model_path)
+    global model, fast_model
+
+    if model_path is None:
+        model_path = default_model_path()
+    if is_flat_forest(model_path):
+        model = load_forest(model_path)
+    elif os.environ.get("model_joblib_mmap", "0") == "1":
+        model = joblib.load(model_path, mmap_mode="r")
+    else:
+        model = joblib.load(model_path)
+
+    # same predictions as the pickle (flat_forest.assert_parity), minus
+    # sklearn's per-call overhead
+    if isinstance(model, FlatForest):
+        fast_model = model
+    elif hasattr(model, "estimators_"):
+        fast_model = FlatForest.from_estimator(model)
+    else:
+        fast_model = None
 
     logging.info("Initialization complete")
 
 
+def complete_row(item):
+    """item, with whichever engineered features it lacks derived."""
+    if all(c in item for c in ENGINEERED_COLUMNS):
+        return item
+    return {**engineer_row(item), **item}
+
+
+def decode_rows(data):
+    """
+    Build the float64 feature matrix from a list of row dicts
+    ({"AccountWeeks": ..., ...}) in a single pass. Rows without
+    AvgCallDuration / CostPerUsage get them derived; values a row
+    supplies are kept.
+    """
+    if any(c not in item for item in data for c in ENGINEERED_COLUMNS):
+        data = [complete_row(item) for item in data]
+    n_rows = len(data)
+    n_cols = len(FEATURE_COLUMNS)
+    flat = numpy.fromiter(
+        (float(item[col]) for item in data for col in FEATURE_COLUMNS),
+        dtype=numpy.float64,
+        count=n_rows * n_cols,
+    )
+    return flat.reshape(n_rows, n_cols)
+
+
+def decode_columns(columns, data):
+    """
+    Build the float64 feature matrix from a column-oriented payload:
+    {"columns": ["AccountWeeks", ...], "data": [[...], [...]]}.
+    Columns can come in any order; extra columns are ignored, and
+    AvgCallDuration / CostPerUsage are derived if not sent.
+    """
+    raw_columns = [c for c in FEATURE_COLUMNS if c not in ENGINEERED_COLUMNS]
+    missing = [c for c in raw_columns if c not in columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+
+    matrix = numpy.asarray(data, dtype=numpy.float64)
+    if matrix.size == 0:
+        return numpy.empty((0, len(FEATURE_COLUMNS)), dtype=numpy.float64)
+    if matrix.ndim != 2 or matrix.shape[1] != len(columns):
+        raise ValueError(
+            f"Expected rows of {len(columns)} values, got array of shape {matrix.shape}"
+        )
+
+    if any(c not in columns for c in ENGINEERED_COLUMNS):
+        col = {c: matrix[:, columns.index(c)] for c in raw_columns}
+        derived = {
+            "AvgCallDuration": avg_call_duration_array(col["DayMins"], col["DayCalls"]),
+            "CostPerUsage": cost_per_usage_array(col["MonthlyCharge"], col["DayMins"], col["RoamMins"]),
+        }
+        return numpy.column_stack([
+            col[c] if c in col else derived[c] for c in FEATURE_COLUMNS
+        ])
+
+    order = [columns.index(c) for c in FEATURE_COLUMNS]
+    return matrix[:, order]
+
+
+def decode_features(payload):
+    """
+    Turn a parsed request body into the model's feature matrix.
+    Accepts both the row-dict shape ({"data": [{...}, ...]}) and the
+    column-oriented shape ({"columns": [...], "data": [[...], ...]}).
+    Rejects NaN / null / infinite values: the flat fast path and sklearn
+    would not agree on them.
+    """
+    data = payload["data"]
+    if "columns" in payload:
+        features = decode_columns(list(payload["columns"]), data)
+    else:
+        features = decode_rows(data)
+
+    bad = ~numpy.isfinite(features)
+    if bad.any():
+        rows, cols = numpy.nonzero(bad)
+        raise ValueError(
+            f"Non-finite feature value (NaN, null or infinity) in row {rows[0]}, "
+            f"column {FEATURE_COLUMNS[cols[0]]} ({int(bad.any(axis=1).sum())} rows affected)"
+        )
+
+    # keep the int() truncation the per-row loop used to do
+    features[:, INT_COLUMN_MASK] = numpy.trunc(features[:, INT_COLUMN_MASK])
+    return features
+
+
+def scoring_model(n_rows):
+    """The flat fast path for small batches, the loaded model otherwise."""
+    if fast_model is not None and n_rows <= FAST_PATH_MAX_ROWS:
+        return fast_model
+    return model
+
+
+def churn_probabilities(features):
+    """P(churn) per row, from the forest's predict_proba."""
+    forest = scoring_model(len(features))
+    proba = forest.predict_proba(features)
+    churn_col = list(forest.classes_).index(1)
+    return proba[:, churn_col], forest.classes_[numpy.argmax(proba, axis=1)]
+
+
+def top_k_indices(scores, k):
+    """
+    Indices of the k largest scores, highest first. argpartition keeps
+    this O(n) for large batches; only the k winners get sorted.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return numpy.empty(0, dtype=numpy.int64)
+    top = numpy.argpartition(-scores, k - 1)[:k]
+    return top[numpy.argsort(-scores[top], kind="stable")]
+
+
+def predict_arrays(input_features, want_proba, top_k):
+    """Model outputs as arrays: (outcomes, probabilities or None, ranked indices or None)."""
+    if not want_proba:
+        return scoring_model(len(input_features)).predict(input_features), None, None
+
+    # predict() is argmax(predict_proba()), so one pass gives both
+    probabilities, result = churn_probabilities(input_features)
+    if top_k is None:
+        return result, probabilities, None
+    ranked = top_k_indices(probabilities, int(top_k))
+    return result[ranked], probabilities[ranked], ranked
+
+
+def echo_input(payload, ranked):
+    """
+    The inputFeatures echo as far as the request's "echoInput" option
+    allows: (rows or None, truncated). An Arrow request's float matrix
+    is echoed as row dicts, like the JSON row shape.
+    """
+    data = payload["data"]
+    rows, truncated = echo_rows(data if ranked is None else ranked, payload.get("echoInput", True))
+    if rows is None:
+        return None, False
+    if isinstance(data, numpy.ndarray):
+        matrix = rows if ranked is None else data[rows]
+        columns = list(payload["columns"])
+        return [dict(zip(columns, row)) for row in matrix.tolist()], truncated
+    if ranked is not None:
+        rows = [data[i] for i in rows]
+    return rows, truncated
+
+
+def json_response(payload, outcomes, probabilities, ranked):
+    """The JSON response dict for a parsed request payload."""
+    if ranked is not None:
+        response = {
+            "rankedIndices": ranked.tolist(),
+            "churnProbabilities": probabilities.tolist(),
+            "predictedOutcomes": outcomes.tolist(),
+        }
+    elif probabilities is not None:
+        response = {
+            "predictedOutcomes": outcomes.tolist(),
+            "churnProbabilities": probabilities.tolist(),
+        }
+    else:
+        response = {
+            "predictedOutcomes": outcomes.tolist(),
+        }
+
+    rows, truncated = echo_input(payload, ranked)
+    if rows is not None:
+        response["inputFeatures"] = rows
+        if truncated:
+            response["inputFeaturesTruncated"] = True
+    return response
+
+
+def arrow_response(payload, outcomes, probabilities, ranked):
+    # Arrow responses never echo; the client has the rows
+    return encode_arrow_response(outcomes, probabilities, ranked)
+
+
+def json_bytes_response(payload, outcomes, probabilities, ranked):
+    return dumps_json(json_response(payload, outcomes, probabilities, ranked))
+
+
+RESPONSE_ENCODERS = {
+    JSON_CONTENT_TYPE: json_bytes_response,
+    ARROW_CONTENT_TYPE: arrow_response,
+}
+
+
+def parse_request(body, content_type=JSON_CONTENT_TYPE):
+    """Request body -> payload dict ({"data": ..., "columns"?, options...})."""
+    kind = media_type(content_type)
+    if kind == ARROW_CONTENT_TYPE:
+        return decode_arrow_request(body)
+    if kind != JSON_CONTENT_TYPE:
+        raise UnsupportedMediaType(f"Unsupported Content-Type: {content_type}")
+    return loads_json(body)
+
+
+def score_body(body, content_type, encode):
+    """
+    Parse, decode, predict and encode one request, recording the stage
+    timings and sizes in run_metrics instead of a log line per request.
+    """
+    try:
+        started = time.perf_counter()
+        payload = parse_request(body, content_type)
+        top_k = payload.get("topK")
+        want_proba = bool(payload.get("returnProbabilities")) or top_k is not None
+        parsed = time.perf_counter()
+
+        input_features = decode_features(payload)
+        decoded = time.perf_counter()
+
+        outcomes, probabilities, ranked = predict_arrays(input_features, want_proba, top_k)
+        predicted = time.perf_counter()
+
+        response = encode(payload, outcomes, probabilities, ranked)
+        finished = time.perf_counter()
+    except Exception:
+        metrics.record_error()
+        raise
+
+    metrics.record(
+        len(input_features),
+        (parsed - started, decoded - parsed, predicted - decoded, finished - predicted),
+    )
+    return response
+
+
+def score_request(body, content_type=None, accept=None, content_encoding=None, accept_encoding=None):
+    """
+    HTTP-level entry: raw body + Content-Type / Accept / Content-Encoding /
+    Accept-Encoding headers -> (response bytes, content type, content
+    encoding or None). JSON unless the client accepts Arrow; gzip both
+    ways when asked. Raises UnsupportedMediaType for undecodable bodies.
+    """
+    response_type = negotiate(accept)
+    body = decode_content(body, content_encoding)
+    response = score_body(body, content_type or JSON_CONTENT_TYPE, RESPONSE_ENCODERS[response_type])
+    encoding = None
+    if accepts_gzip(accept_encoding):
+        response, encoding = gzip_body(response)
+    return response, response_type, encoding
+
+
+@rawhttp
 def run(raw_data):
     """
     inference run function
+
+    Optional request keys:
+      "returnProbabilities": true -> also return "churnProbabilities"
+      "topK": K                   -> only return the K highest-risk rows,
+                                     ranked, with their "rankedIndices"
+                                     into the request's data
+      "echoInput": false | N      -> leave out "inputFeatures", or echo
+                                     only the first N rows (then
+                                     "inputFeaturesTruncated" is true)
+
+    Called with the JSON body string locally (mock endpoint, local
+    backend), it returns the response dict. On Azure (@rawhttp) it gets
+    the HTTP request and negotiates JSON / Arrow IPC from its headers;
+    a GET (health probe, or a client checking formats) lists the
+    request content types this endpoint accepts.
     """
-    logging.info("Request Received")
-
-    data = json.loads(raw_data)["data"]
-
-    input_features = []
-    for item in data:
-        single_user_input = [
-           int(item['AccountWeeks']),
-            int(item['ContractRenewal']),
-            int(item['DataPlan']),
-            float(item['DataUsage']),
-            int(item['CustServCalls']),
-            float(item['DayMins']),
-            int(item['DayCalls']),
-            float(item['MonthlyCharge']),
-            float(item['OverageFee']),
-            float(item['RoamMins']),
-            float(item['AvgCallDuration']),
-            float(item['CostPerUsage'])
-        ]
-        input_features.append(single_user_input)
-    input_features = numpy.array(input_features)
-    result = model.predict(input_features)
-
-    logging.info("Request Processed")
-
-    return {
-        "predictedOutcomes": result.tolist(),
-        "inputFeatures": data
-    }
+    if isinstance(raw_data, (str, bytes, bytearray)):
+        return score_body(raw_data, JSON_CONTENT_TYPE, json_response)
+
+    if raw_data.method == "GET":
+        formats = [JSON_CONTENT_TYPE] + ([ARROW_CONTENT_TYPE] if arrow_available() else [])
+        return AMLResponse(dumps_json({"contentTypes": formats}), 200, {"Content-Type": JSON_CONTENT_TYPE})
+    if raw_data.method != "POST":
+        return AMLResponse(f"Method {raw_data.method} not allowed", 405)
+
+    try:
+        body, content_type, content_encoding = score_request(
+            raw_data.get_data(),
+            raw_data.headers.get("Content-Type"),
+            raw_data.headers.get("Accept"),
+            raw_data.headers.get("Content-Encoding"),
+            raw_data.headers.get("Accept-Encoding"),
+        )
+    except UnsupportedMediaType as e:
+        return AMLResponse(str(e), 415)
+    headers = {"Content-Type": content_type}
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    return AMLResponse(body, 200, headers)
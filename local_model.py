@@ -0,0 +1,28 @@
+"""
+Helpers for running inference-script.py in-process (outside Azure).
+"""
+import importlib.util
+import os
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INFERENCE_SCRIPT_PATH = os.path.join(HERE, "inference-script.py")
+
+
+def load_inference_script():
+    """
+    inference-script.py has a dash in its name, so it can't be imported
+    the normal way. Load it as a fresh module from its file path (each
+    call gets its own module, and so its own global model).
+    """
+    spec = importlib.util.spec_from_file_location("inference_script", INFERENCE_SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_local_model(model_path: str):
+    """inference-script module with init() already run on model_path."""
+    inference = load_inference_script()
+    inference.init(model_path)
+    return inference
@@ -0,0 +1,212 @@
+"""
+Request coalescing (micro-batching) in front of the scoring endpoint.
+
+Every Streamlit session scores one customer at a time. Under load that is
+one HTTP round trip per row. CoalescingScorer holds single-row requests for
+a short window (max_wait seconds or max_batch_rows rows, whichever comes
+first), sends them to the endpoint as one "data": [...] body, and hands each
+caller back its own prediction.
+
+Rows that want churnProbabilities ride in separate batches from rows
+that don't. A batch the endpoint rejects is split and retried, so one bad
+row only fails its own caller. Requests that can't be split into rows (topK, the
+column-oriented shape) or that are already batches go out unchanged.
+
+From async code:
+    scorer = CoalescingScorer()
+    outcome = await scorer.predict(row)
+
+From Streamlit (plain threads), pick model_backend=remote_coalesced in
+.env (scoring_backend.py), which puts a ThreadedCoalescingScorer behind
+the Predict page and its prediction cache.
+"""
+import asyncio
+import concurrent.futures
+import threading
+
+from model_call import _endpoint_config, _post_request
+from wire_format import echo_rows
+
+
+COALESCE_MAX_WAIT = 0.005   # seconds to hold the first row of a batch
+COALESCE_MAX_ROWS = 64      # flush as soon as this many rows are waiting
+COALESCE_MAX_IN_FLIGHT = 4  # concurrent batches on the wire
+
+
+class CoalescingScorer:
+    """
+    asyncio scorer that merges concurrent single-row requests into batches.
+    All coroutines must run on the same event loop.
+    """
+
+    def __init__(
+        self,
+        max_wait: float = COALESCE_MAX_WAIT,
+        max_batch_rows: int = COALESCE_MAX_ROWS,
+        max_in_flight: int = COALESCE_MAX_IN_FLIGHT,
+        model_url: str = None,
+        api_key: str = None,
+    ):
+        self.max_wait = max_wait
+        self.max_batch_rows = max_batch_rows
+        self.max_in_flight = max_in_flight
+        self.model_url, self.api_key = _endpoint_config(model_url, api_key)
+
+        self.batches_sent = 0
+        self.rows_sent = 0
+
+        self._queue = None
+        self._collector = None
+        self._in_flight = None
+
+    def _ensure_started(self):
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue()
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+            self._collector = asyncio.get_running_loop().create_task(self._collect())
+
+    async def predict(self, row: dict):
+        """Score one row dict; resolves to its predicted outcome (0 or 1)."""
+        outcome, _ = await self._predict_row(row, False)
+        return outcome
+
+    async def _predict_row(self, row: dict, want_proba: bool):
+        """(outcome, churn probability or None) for one row."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, want_proba, future))
+        return await future
+
+    def coalesces(self, body_dict: dict) -> bool:
+        """Whether score() can split body_dict into rows for other batches."""
+        options = set(body_dict) - {"data", "returnProbabilities", "echoInput"}
+        return not options and len(body_dict["data"]) <= self.max_batch_rows
+
+    async def score(self, body_dict: dict) -> dict:
+        """
+        Same contract as azure_model_rest_api_call, but each row in
+        body_dict["data"] is coalesced with rows from other callers
+        (unless coalesces() says no; then it is posted as it is).
+        """
+        if not self.coalesces(body_dict):
+            return await asyncio.get_running_loop().run_in_executor(
+                None, _post_request, body_dict, self.model_url, self.api_key
+            )
+
+        rows = body_dict["data"]
+        want_proba = bool(body_dict.get("returnProbabilities"))
+        results = await asyncio.gather(*(self._predict_row(row, want_proba) for row in rows))
+        response = {"predictedOutcomes": [outcome for outcome, _ in results]}
+        if want_proba:
+            response["churnProbabilities"] = [probability for _, probability in results]
+        echoed, truncated = echo_rows(rows, body_dict.get("echoInput", True))
+        if echoed is not None:
+            response["inputFeatures"] = echoed
+            if truncated:
+                response["inputFeaturesTruncated"] = True
+        return response
+
+    async def _collect(self):
+        """
+        Pull rows off the queue and cut them into batches. A batch closes
+        when it is full or max_wait has passed since its first row arrived.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_rows:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            for want_proba in (False, True):
+                group = [(row, future) for row, proba, future in batch if proba == want_proba]
+                if group:
+                    await self._in_flight.acquire()
+                    loop.create_task(self._send(group, want_proba))
+
+    async def _send(self, batch, want_proba: bool = False):
+        try:
+            await self._score_rows(batch, want_proba)
+        finally:
+            self._in_flight.release()
+
+    async def _score_rows(self, batch, want_proba: bool):
+        """
+        POST the batch's rows and resolve its futures. If the request
+        fails, the batch is split in half and each half retried, so only
+        the callers whose rows cause the error see it: coalescing must not
+        fail requests that would have succeeded on their own.
+        """
+        rows = [row for row, _ in batch]
+        futures = [future for _, future in batch]
+        body = {"data": rows, "echoInput": False}
+        if want_proba:
+            body["returnProbabilities"] = True
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, _post_request, body, self.model_url, self.api_key
+            )
+            outcomes = result.get("predictedOutcomes", [])
+            if len(outcomes) != len(rows):
+                raise RuntimeError(
+                    f"Endpoint returned {len(outcomes)} predictions for a batch of {len(rows)} rows."
+                )
+        except Exception as e:
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                await self._score_rows(batch[:middle], want_proba)
+                await self._score_rows(batch[middle:], want_proba)
+                return
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        probabilities = result.get("churnProbabilities", [None] * len(rows))
+        self.batches_sent += 1
+        self.rows_sent += len(rows)
+        for future, outcome, probability in zip(futures, outcomes, probabilities):
+            if not future.done():
+                future.set_result((outcome, probability))
+
+    async def aclose(self):
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+
+
+class ThreadedCoalescingScorer:
+    """
+    Runs a CoalescingScorer on its own event loop thread so blocking
+    callers (Streamlit script threads) can share it.
+    """
+
+    def __init__(self, **scorer_options):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self.scorer = CoalescingScorer(**scorer_options)
+
+    def score(self, body_dict: dict, timeout: float = 60) -> dict:
+        future = asyncio.run_coroutine_threadsafe(self.scorer.score(body_dict), self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise RuntimeError(f"No response from the coalescing scorer within {timeout:g}s.")
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.scorer.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
@@ -0,0 +1,157 @@
+"""
+Local stand-in for the Azure ML scoring endpoint.
+
+Speaks the same request/response shape as inference-script.py (including
+the JSON / Arrow IPC content negotiation) so the client code in
+model_call.py can be exercised without Azure:
+
+    with MockScoringServer() as server:
+        score_batch(df, model_url=server.url, api_key=server.api_key)
+
+If model_path is given the real random forest is loaded through
+inference-script.py's init()/run(); otherwise a simple rule
+(3+ support calls or no contract renewal -> churn) stands in for it.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy
+
+from local_model import load_inference_script
+
+
+class RuleModel:
+    """Tiny sklearn-like stand-in so the mock works without a pickle."""
+
+    def __init__(self, feature_columns):
+        self.calls_idx = feature_columns.index("CustServCalls")
+        self.renewal_idx = feature_columns.index("ContractRenewal")
+
+    classes_ = numpy.array([0, 1])
+
+    def predict_proba(self, features):
+        # more support calls -> higher risk; no renewal pushes it over 0.5
+        risk = numpy.clip(features[:, self.calls_idx] / 6.0, 0, 0.99)
+        risk = numpy.where(features[:, self.renewal_idx] == 0, numpy.maximum(risk, 0.75), risk)
+        return numpy.column_stack([1 - risk, risk])
+
+    def predict(self, features):
+        return numpy.argmax(self.predict_proba(features), axis=1)
+
+
+class MockScoringServer:
+    """
+    Threaded HTTP server on 127.0.0.1 answering POSTs with the inference
+    script's run(). Use as a context manager or call start()/stop().
+    """
+
+    def __init__(
+        self,
+        api_key: str = "test-key",
+        model_path: str = None,
+        latency: float = 0.0,
+        fail_statuses=(),
+    ):
+        self.api_key = api_key
+        self.latency = latency
+        # statuses (e.g. 429, 503) to answer with, in order, before serving
+        # real predictions; lets the client retry path be exercised
+        self.fail_statuses = list(fail_statuses)
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+        self.inference = load_inference_script()
+        if model_path:
+            self.inference.init(model_path)
+        else:
+            self.inference.model = RuleModel(self.inference.FEATURE_COLUMNS)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/score"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body go out in separate writes; without this
+            # keep-alive clients hit the 40ms Nagle / delayed-ACK stall
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                # keep test / benchmark output quiet
+                pass
+
+            def _reply(self, status: int, body: bytes, content_type: str = "application/json",
+                       content_encoding: str = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                if content_encoding:
+                    self.send_header("Content-Encoding", content_encoding)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+
+                if self.headers.get("Authorization") != f"Bearer {server.api_key}":
+                    self._reply(401, b"invalid key", "text/plain")
+                    return
+
+                with server._lock:
+                    server.request_count += 1
+                    fail_status = server.fail_statuses.pop(0) if server.fail_statuses else None
+
+                if fail_status is not None:
+                    self.send_response(fail_status)
+                    self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                if server.latency:
+                    threading.Event().wait(server.latency)
+
+                # same negotiation as run() does on Azure with @rawhttp
+                try:
+                    body, content_type, content_encoding = server.inference.score_request(
+                        raw,
+                        self.headers.get("Content-Type"),
+                        self.headers.get("Accept"),
+                        self.headers.get("Content-Encoding"),
+                        self.headers.get("Accept-Encoding"),
+                    )
+                except server.inference.UnsupportedMediaType as e:
+                    self._reply(415, str(e).encode("utf-8"), "text/plain")
+                    return
+                except Exception as e:
+                    self._reply(500, str(e).encode("utf-8"), "text/plain")
+                    return
+                self._reply(200, body, content_type, content_encoding)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
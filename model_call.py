@@ -1,49 +1,129 @@
 import os
 import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
+from features import FEATURE_COLUMNS, add_engineered_features
+from stage_timing import span
+from wire_format import (
+    ARROW_CONTENT_TYPE,
+    JSON_CONTENT_TYPE,
+    WIRE_FORMATS,
+    arrow_available,
+    decode_arrow_response,
+    dumps_json,
+    echo_rows,
+    encode_arrow_request,
+    gzip_body,
+    loads_json,
+    media_type,
+)
 
 # Load environment variables from .env
 load_dotenv()
 
-def azure_model_rest_api_call(body_dict: dict):
+# Defaults for score_batch chunking
+BATCH_MAX_ROWS = 1000
+BATCH_MAX_BYTES = 1_000_000
+BATCH_MAX_WORKERS = 4
+
+# Connection pool settings, overridable from .env
+HTTP_POOL_SIZE = int(os.getenv("model_http_pool_size", "16"))
+HTTP_MAX_RETRIES = int(os.getenv("model_http_max_retries", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("model_http_backoff_factor", "0.5"))
+HTTP_RETRY_STATUSES = (429, 503)
+
+# Request body encoding: json, or arrow (columnar Arrow IPC, needs pyarrow;
+# falls back to JSON for endpoints that answer it with 415)
+MODEL_WIRE_FORMAT = os.getenv("model_wire_format", "json")
+ARROW_ACCEPT = f"{ARROW_CONTENT_TYPE}, {JSON_CONTENT_TYPE};q=0.5"
+
+# gzip request bodies (1 KB and up). Off by default: endpoints deployed
+# before gzip support can't read them. gzip responses are always accepted
+# (requests sends Accept-Encoding: gzip and decompresses).
+MODEL_REQUEST_GZIP = os.getenv("model_request_gzip", "0") == "1"
+
+# One pooled session per process, shared by every Streamlit session
+_session = None
+_session_lock = threading.Lock()
+
+# endpoints that answered an Arrow body with 415 Unsupported Media Type;
+# they get JSON from then on. Any other error is reported as it is.
+_json_only_urls = set()
+
+
+class _ArrowRejected(RuntimeError):
+    """The endpoint can't decode Arrow request bodies."""
+
+
+def _build_session(
+    pool_size: int = HTTP_POOL_SIZE,
+    max_retries: int = HTTP_MAX_RETRIES,
+    backoff_factor: float = HTTP_BACKOFF_FACTOR,
+) -> requests.Session:
     """
-    Call the Azure ML online endpoint using credentials from .env.
+    Session with a keep-alive connection pool and a retry adapter that
+    backs off on 429/503 (honouring Retry-After). Scoring is read-only,
+    so retrying the POST is safe.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=["POST"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
 
-    .env must contain:
-      model_url=https://endpoint-rfmodel22.eastus2.inference.ml.azure.com/score
-      model_api_key=YOUR_KEY
 
-    body_dict must look like:
-    {
-        "data": [
-            {
-                "AccountWeeks": ...,
-                "ContractRenewal": ...,
-                "DataPlan": ...,
-                "DataUsage": ...,
-                "CustServCalls": ...,
-                "DayMins": ...,
-                "DayCalls": ...,
-                "MonthlyCharge": ...,
-                "OverageFee": ...,
-                "RoamMins": ...,
-                "AvgCallDuration": ...,
-                "CostPerUsage": ...
-            }
-        ]
-    }
+def get_session() -> requests.Session:
+    """
+    Process-wide pooled session, created on first use.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
 
-    Returns whatever the endpoint returns.
-    Expected successful shape:
-    {
-        "predictedOutcomes": [0 or 1],
-        "inputFeatures": [ { ...same features... } ]
-    }
+
+def reset_session(**pool_options):
     """
+    Close the shared session and rebuild it, e.g. with a different
+    pool_size / max_retries / backoff_factor.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = _build_session(**pool_options) if pool_options else None
+
 
-    model_url = os.getenv("model_url")
-    api_key = os.getenv("model_api_key")
+def _endpoint_config(model_url: str = None, api_key: str = None):
+    """
+    Resolve the endpoint url and key, falling back to .env.
+    """
+    model_url = model_url or os.getenv("model_url")
+    api_key = api_key or os.getenv("model_api_key")
 
     if not model_url or not api_key:
         raise RuntimeError(
@@ -53,20 +133,42 @@ def azure_model_rest_api_call(body_dict: dict):
             "model_url=https://endpoint-rfmodel22.eastus2.inference.ml.azure.com/score\n"
             "model_api_key=Af3wfHarZHDlvgZoYzDZjcZ23b4FNwWMFRAZML4bzd"
         )
+    return model_url, api_key
 
+
+def _post_body(
+    body,
+    model_url: str,
+    api_key: str,
+    content_type: str = JSON_CONTENT_TYPE,
+    accept: str = JSON_CONTENT_TYPE,
+) -> dict:
+    """
+    POST an already-serialized body (JSON by default) and turn HTTP/network
+    problems into RuntimeErrors the pages can show. Decodes a JSON or
+    Arrow response, whichever the endpoint sent.
+    """
     headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
+        "Content-Type": content_type,
+        "Accept": accept,
         "Authorization": f"Bearer {api_key}",
     }
+    if MODEL_REQUEST_GZIP:
+        with span("model_call.compress"):
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            body, encoding = gzip_body(body)
+        if encoding:
+            headers["Content-Encoding"] = encoding
 
     try:
-        resp = requests.post(
-            model_url,
-            headers=headers,
-            data=json.dumps(body_dict),
-            timeout=30,
-        )
+        with span("model_call.http_post"):
+            resp = get_session().post(
+                model_url,
+                headers=headers,
+                data=body,
+                timeout=30,
+            )
     except requests.exceptions.RequestException as e:
         # covers DNS issues, network issues, timeout, etc.
         raise RuntimeError(
@@ -82,6 +184,9 @@ def azure_model_rest_api_call(body_dict: dict):
             "for this exact endpoint."
         )
 
+    if content_type != JSON_CONTENT_TYPE and resp.status_code == 415:
+        raise _ArrowRejected(resp.text)
+
     if resp.status_code >= 400:
         raise RuntimeError(
             f"Endpoint returned HTTP {resp.status_code}.\n\n"
@@ -93,8 +198,254 @@ def azure_model_rest_api_call(body_dict: dict):
 
     # Parse successful JSON
     try:
-        return resp.json()
+        with span("model_call.parse_response"):
+            if media_type(resp.headers.get("Content-Type")) == ARROW_CONTENT_TYPE:
+                return decode_arrow_response(resp.content)
+            return loads_json(resp.content)
     except ValueError:
         raise RuntimeError(
             f"Endpoint returned non-JSON response:\n{resp.text}"
         )
+
+
+def azure_model_rest_api_call(body_dict: dict):
+    """
+    Call the Azure ML online endpoint using credentials from .env.
+
+    .env must contain:
+      model_url=https://endpoint-rfmodel22.eastus2.inference.ml.azure.com/score
+      model_api_key=YOUR_KEY
+
+    and may set model_http_pool_size / model_http_max_retries /
+    model_http_backoff_factor to tune the shared connection pool,
+    model_wire_format=arrow to send columnar Arrow IPC instead of JSON, and
+    model_request_gzip=1 to gzip request bodies.
+
+    body_dict must look like:
+    {
+        "data": [
+            {
+                "AccountWeeks": ...,
+                "ContractRenewal": ...,
+                "DataPlan": ...,
+                "DataUsage": ...,
+                "CustServCalls": ...,
+                "DayMins": ...,
+                "DayCalls": ...,
+                "MonthlyCharge": ...,
+                "OverageFee": ...,
+                "RoamMins": ...,
+                "AvgCallDuration": ...,
+                "CostPerUsage": ...
+            }
+        ]
+    }
+
+    and may add "echoInput": false (or a row count) to leave the input
+    echo out of the response.
+
+    Returns whatever the endpoint returns.
+    Expected successful shape:
+    {
+        "predictedOutcomes": [0 or 1],
+        "inputFeatures": [ { ...same features... } ]
+    }
+    """
+
+    model_url, api_key = _endpoint_config()
+    return _post_request(body_dict, model_url, api_key)
+
+
+def _post_request(body_dict: dict, model_url: str, api_key: str, wire_format: str = None) -> dict:
+    """
+    Encode body_dict in wire_format (default: model_wire_format from .env),
+    POST it and return the response dict. Arrow responses don't echo the
+    input, so inputFeatures is filled in from body_dict like the endpoint
+    would (honouring "echoInput").
+    """
+    wire_format = wire_format or MODEL_WIRE_FORMAT
+    if wire_format not in WIRE_FORMATS:
+        raise RuntimeError(
+            f"Unknown model_wire_format {wire_format!r} in .env; expected one of {sorted(WIRE_FORMATS)}."
+        )
+
+    if wire_format == "arrow" and arrow_available() and model_url not in _json_only_urls:
+        with span("model_call.serialize"):
+            body = encode_arrow_request(body_dict, FEATURE_COLUMNS)
+        try:
+            result = _post_body(body, model_url, api_key, ARROW_CONTENT_TYPE, ARROW_ACCEPT)
+        except _ArrowRejected:
+            _json_only_urls.add(model_url)
+        else:
+            if "inputFeatures" not in result:
+                data = body_dict["data"]
+                ranked = result.get("rankedIndices")
+                rows, truncated = echo_rows(data if ranked is None else ranked, body_dict.get("echoInput", True))
+                if rows is not None:
+                    result["inputFeatures"] = rows if ranked is None else [data[i] for i in rows]
+                    if truncated:
+                        result["inputFeaturesTruncated"] = True
+            return result
+
+    with span("model_call.serialize"):
+        body = dumps_json(body_dict)
+    return _post_body(body, model_url, api_key)
+
+
+def _chunk_rows(rows: list, max_rows: int, max_bytes: int):
+    """
+    Split row dicts into consecutive chunks holding at most max_rows rows
+    and roughly max_bytes of JSON. Yields (start_index, chunk_rows).
+    A single row bigger than max_bytes still goes out on its own.
+    """
+    start = 0
+    chunk = []
+    chunk_bytes = 0
+    for i, row in enumerate(rows):
+        # +2 for the ", " separator json.dumps puts between rows
+        row_bytes = len(json.dumps(row)) + 2
+        if chunk and (len(chunk) >= max_rows or chunk_bytes + row_bytes > max_bytes):
+            yield start, chunk
+            start = i
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(row)
+        chunk_bytes += row_bytes
+    if chunk:
+        yield start, chunk
+
+
+def _to_request_rows(df) -> list:
+    """
+    Pick the model features out of a DataFrame as JSON-ready row dicts,
+    deriving AvgCallDuration / CostPerUsage the same way the Predict page
+    does when the raw churn extract doesn't carry them.
+    """
+    df = add_engineered_features(df.copy())
+
+    missing = [c for c in FEATURE_COLUMNS if c not in df.columns]
+    if missing:
+        raise RuntimeError(f"DataFrame is missing model features: {missing}")
+
+    # to_dict gives numpy scalars for some dtypes; json.dumps needs plain python
+    return json.loads(df[FEATURE_COLUMNS].to_json(orient="records"))
+
+
+def _score_chunks(rows, options, max_rows, max_bytes, max_workers, model_url, api_key):
+    """
+    Post row chunks (plus any extra request keys in options) concurrently.
+    Yields (start_index, chunk_rows, response) in input order.
+    """
+    chunks = list(_chunk_rows(rows, max_rows, max_bytes))
+
+    def score_chunk(chunk):
+        start, chunk_rows = chunk
+        body = dict(options, data=chunk_rows)
+        return start, chunk_rows, _post_request(body, model_url, api_key)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        yield from pool.map(score_chunk, chunks)
+
+
+def score_batch(
+    df,
+    max_rows: int = BATCH_MAX_ROWS,
+    max_bytes: int = BATCH_MAX_BYTES,
+    max_workers: int = BATCH_MAX_WORKERS,
+    model_url: str = None,
+    api_key: str = None,
+    return_probabilities: bool = False,
+) -> dict:
+    """
+    Score every row of a DataFrame (e.g. data/telecom_churn_v2.csv) against
+    the endpoint.
+
+    Rows are split into chunks of at most max_rows rows / max_bytes of JSON,
+    sent concurrently over a pool of max_workers threads, and put back
+    together in input order.
+
+    Returns:
+    {
+        "predictedOutcomes": [...one per input row, same order...],
+        "churnProbabilities": [...] (only if return_probabilities),
+        "rows": ..., "chunks": ..., "seconds": ..., "rows_per_sec": ...
+    }
+    """
+    model_url, api_key = _endpoint_config(model_url, api_key)
+    rows = _to_request_rows(df)
+    # the rows are already here; don't have the endpoint send them back
+    options = {"echoInput": False}
+    if return_probabilities:
+        options["returnProbabilities"] = True
+
+    predictions = [None] * len(rows)
+    probabilities = [None] * len(rows) if return_probabilities else None
+    n_chunks = 0
+    started = time.perf_counter()
+    for start, chunk_rows, result in _score_chunks(
+        rows, options, max_rows, max_bytes, max_workers, model_url, api_key
+    ):
+        outcomes = result.get("predictedOutcomes", [])
+        if len(outcomes) != len(chunk_rows):
+            raise RuntimeError(
+                f"Endpoint returned {len(outcomes)} predictions for a chunk "
+                f"of {len(chunk_rows)} rows starting at row {start}."
+            )
+        predictions[start:start + len(outcomes)] = outcomes
+        if return_probabilities:
+            probabilities[start:start + len(outcomes)] = result.get("churnProbabilities", [])
+        n_chunks += 1
+    seconds = time.perf_counter() - started
+
+    out = {
+        "predictedOutcomes": predictions,
+        "rows": len(rows),
+        "chunks": n_chunks,
+        "seconds": seconds,
+        "rows_per_sec": len(rows) / seconds if seconds > 0 else 0.0,
+    }
+    if return_probabilities:
+        out["churnProbabilities"] = probabilities
+    return out
+
+
+def top_k_risk(
+    df,
+    k: int,
+    max_rows: int = BATCH_MAX_ROWS,
+    max_bytes: int = BATCH_MAX_BYTES,
+    max_workers: int = BATCH_MAX_WORKERS,
+    model_url: str = None,
+    api_key: str = None,
+):
+    """
+    The k customers in df most likely to churn, highest risk first, for a
+    capacity-limited retention call list.
+
+    Each chunk asks the endpoint for only its own top k ("topK"), so
+    responses stay small; the chunk winners are then merged here.
+    Returns a copy of those rows of df with churnProbability and
+    predictedOutcome columns added.
+    """
+    model_url, api_key = _endpoint_config(model_url, api_key)
+    rows = _to_request_rows(df)
+
+    indices, probabilities, outcomes = [], [], []
+    for start, _, result in _score_chunks(
+        rows, {"topK": int(k), "echoInput": False}, max_rows, max_bytes, max_workers, model_url, api_key
+    ):
+        indices.extend(start + i for i in result.get("rankedIndices", []))
+        probabilities.extend(result.get("churnProbabilities", []))
+        outcomes.extend(result.get("predictedOutcomes", []))
+
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    n = min(int(k), len(probabilities))
+    if n <= 0:
+        return df.iloc[[]].assign(churnProbability=[], predictedOutcome=[])
+    best = np.argpartition(-probabilities, n - 1)[:n]
+    best = best[np.argsort(-probabilities[best], kind="stable")]
+
+    ranked = df.iloc[[indices[i] for i in best]].copy()
+    ranked["churnProbability"] = probabilities[best]
+    ranked["predictedOutcome"] = [outcomes[i] for i in best]
+    return ranked
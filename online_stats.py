@@ -0,0 +1,91 @@
+"""
+Incremental (online) means / covariance / correlation.
+
+CovarianceAccumulator keeps Welford-style running means and the centred
+co-moment matrix M2 = sum((x - mean)(x - mean)^T). Chunks are folded in
+with the pairwise update of Chan et al., so accumulators can be updated
+with new rows, merged across chunks or workers, and saved to JSON. The
+correlation matrix then costs O(features^2) to read, not
+O(rows x features^2), and it avoids the cancellation you get from raw
+sum-of-squares.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+
+class CovarianceAccumulator:
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros((k, k))
+
+    def _combine(self, n_b: int, mean_b: np.ndarray, m2_b: np.ndarray):
+        if n_b == 0:
+            return self
+        n_a = self.n
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (n_b / n)
+        self.m2 = self.m2 + m2_b + np.outer(delta, delta) * (n_a * n_b / n)
+        self.n = n
+        return self
+
+    def update(self, x):
+        """Fold in rows: a 2-D array or a DataFrame holding self.columns."""
+        if isinstance(x, pd.DataFrame):
+            x = x[self.columns].to_numpy(dtype=np.float64)
+        else:
+            x = np.asarray(x, dtype=np.float64)
+        if x.shape[0] == 0:
+            return self
+        mean_b = x.mean(axis=0)
+        centred = x - mean_b
+        return self._combine(x.shape[0], mean_b, centred.T @ centred)
+
+    def merge(self, other: "CovarianceAccumulator"):
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge accumulators over different columns")
+        return self._combine(other.n, other.mean, other.m2)
+
+    def covariance(self, ddof: int = 1) -> pd.DataFrame:
+        denom = self.n - ddof
+        cov = self.m2 / denom if denom > 0 else np.full_like(self.m2, np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def corr(self) -> pd.DataFrame:
+        """Pearson correlation, same as DataFrame.corr() on the rows seen."""
+        std = np.sqrt(np.clip(np.diag(self.m2), 0, None))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = self.m2 / np.outer(std, std)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return pd.DataFrame(np.clip(corr, -1, 1), index=self.columns, columns=self.columns)
+
+    def to_dict(self) -> dict:
+        return {
+            "columns": self.columns,
+            "n": self.n,
+            "mean": self.mean.tolist(),
+            "m2": self.m2.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "CovarianceAccumulator":
+        acc = cls(state["columns"])
+        acc.n = int(state["n"])
+        acc.mean = np.asarray(state["mean"], dtype=np.float64)
+        acc.m2 = np.asarray(state["m2"], dtype=np.float64)
+        return acc
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> "CovarianceAccumulator":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
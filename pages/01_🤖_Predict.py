@@ -1,9 +1,13 @@
 import os
 import streamlit as st
 from typing import Dict
-import pandas as pd
 from datetime import datetime
-from model_call import azure_model_rest_api_call
+from features import avg_call_duration, cost_per_usage
+from history_log import append_prediction, get_history_writer
+from prediction_cache import cached_model_call, get_prediction_cache
+from bulk_scoring import BULK_CHUNK_ROWS, BulkScoreJob
+from scoring_backend import SCORING_BACKEND, get_scoring_backend
+from stage_timing import render_timing_panel, span
 
 # -------------------------------------------------
 # PAGE CONFIG
@@ -75,15 +79,27 @@ class StreamlitApp:
         }
         return request_body
 
-    def render_take_input(self) -> Dict:
+    def render_header(self) -> str:
         """
-        Renders the form in Streamlit to collect inputs from the user.
-        Returns a formatted request body ready for the API call.
+        Title plus the mode switch. Returns "single" or "bulk".
         """
         st.title(self.title)
         st.caption(self.subtitle)
+        mode = st.radio(
+            "Mode",
+            options=["single", "bulk"],
+            format_func={"single": "👤 Single customer", "bulk": "📁 Bulk upload"}.get,
+            horizontal=True,
+            label_visibility="collapsed",
+        )
         st.markdown("---")
+        return mode
 
+    def render_take_input(self) -> Dict:
+        """
+        Renders the form in Streamlit to collect inputs from the user.
+        Returns a formatted request body ready for the API call.
+        """
         st.subheader("📋 Customer Profile")
 
         col1, col2 = st.columns(2)
@@ -180,9 +196,8 @@ class StreamlitApp:
             )
 
             # ====== AUTO / DERIVED FIELDS ======
-            eps = 1e-6
-            auto_avg_call_duration = input_DayMins / (input_DayCalls + eps)
-            auto_cost_per_usage = input_MonthlyCharge / (input_DayMins + input_RoamMins + eps)
+            auto_avg_call_duration = avg_call_duration(input_DayMins, input_DayCalls)
+            auto_cost_per_usage = cost_per_usage(input_MonthlyCharge, input_DayMins, input_RoamMins)
 
             # show them as read-only inputs
             st.text_input(
@@ -221,15 +236,21 @@ class StreamlitApp:
 
     def call_model_and_display(self, formatted_data: Dict):
         """
-        Calls the deployed Azure ML model and displays the result.
-        Also logs the prediction to session_state and to prediction_history.csv
-        so we can show it on the History page.
+        Calls the model (the Azure ML endpoint, or the local in-process
+        backend if model_backend=local in .env) and displays the result.
+        Also queues the prediction for the background history writer, which
+        appends it to prediction_history.csv and catches the SQLite history
+        store up from it, so we can show it on the History page.
         """
         if st.button("🔮 Predict Churn", type="primary"):
             # Call model and handle errors gracefully
             try:
-                with st.spinner("Contacting churn model in Azure..."):
-                    model_output = azure_model_rest_api_call(formatted_data)
+                spinner_text = (
+                    "Scoring with the local churn model..." if SCORING_BACKEND == "local"
+                    else "Contacting churn model in Azure..."
+                )
+                with st.spinner(spinner_text), span("predict.model_call"):
+                    model_output = cached_model_call(formatted_data)
             except RuntimeError as e:
                 st.error(str(e))
                 return
@@ -258,6 +279,12 @@ class StreamlitApp:
             with st.expander("View model inputs sent to API"):
                 st.json(user_inputs_echo)
 
+            cache_stats = get_prediction_cache().stats()
+            st.caption(
+                f"Prediction cache: {cache_stats['hits']} hits / "
+                f"{cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate)"
+            )
+
             # Build log entry
             sent_row = formatted_data["data"][0]
 
@@ -279,22 +306,94 @@ class StreamlitApp:
                 "CostPerUsage": sent_row["CostPerUsage"],
             }
 
-            # Initialize session_state history list if not present
-            if "prediction_history" not in st.session_state:
-                st.session_state["prediction_history"] = []
+            # Append to the CSV log for persistence (background thread, O(1))
+            with span("predict.history_enqueue"):
+                append_prediction(log_entry)
 
-            # Append to in-memory history
-            st.session_state["prediction_history"].append(log_entry)
+            # last_error is from an earlier batch (this one is still queued),
+            # and is cleared by the next successful write
+            writer_error = get_history_writer().last_error
+            if writer_error is not None:
+                st.warning(f"Recent predictions could not be written to the history log: {writer_error}")
+            else:
+                st.success("Prediction queued for the history log ✅")
 
-            # Write to CSV for persistence
-            history_df = pd.DataFrame(st.session_state["prediction_history"])
-            # Make sure the directory exists before saving
-            history_df.to_csv("prediction_history.csv", index=False)
+    def render_bulk_upload(self):
+        """
+        Upload mode: score a CSV / Parquet extract with the
+        telecom_churn_v2.csv columns in chunks (bulk_scoring.py), with a
+        progress bar, a cancel button and a download of the results.
+        Bulk rows are not written to the prediction history.
+        """
+        st.subheader("📁 Score a customer extract")
+        uploaded = st.file_uploader(
+            "CSV or Parquet with the telecom_churn_v2.csv columns",
+            type=["csv", "parquet"],
+        )
 
-            st.success("Prediction logged to history ✅")
+        # a job left "running" means the last run was stopped by Cancel
+        # (Streamlit interrupts the script on any click)
+        job = st.session_state.get("bulk_job")
+        if job is not None and job.status == "running":
+            job.status = "cancelled"
+
+        if uploaded is not None:
+            col1, col2 = st.columns([1, 5])
+            start = col1.button("🔮 Score file", type="primary")
+            col2.button("✋ Cancel", help="Stops after the current chunk; rows scored so far stay downloadable.")
+
+            if start:
+                if job is not None:
+                    job.discard()
+                job = st.session_state["bulk_job"] = BulkScoreJob(uploaded.name)
+                bar = st.progress(0.0, text="Starting...")
+
+                def progress(job, fraction):
+                    bar.progress(
+                        fraction,
+                        text=f"{job.rows:,} rows scored ({job.rows_per_sec:,.0f} rows/s)",
+                    )
+
+                try:
+                    with span("predict.bulk_score"):
+                        job.run(uploaded, get_scoring_backend().score, BULK_CHUNK_ROWS, progress)
+                except RuntimeError as e:
+                    st.error(str(e))
+
+        if job is None or job.rows == 0:
+            return
+        if job.expired:
+            st.info("The scored file from the last run has expired; score the file again to download it.")
+            return
+
+        if job.status == "done":
+            st.success(f"Scored {job.rows:,} customers in {job.seconds:.1f}s ({job.rows_per_sec:,.0f} rows/s).")
+        elif job.status == "cancelled":
+            st.warning(f"Cancelled after {job.rows:,} rows; the download has the rows scored so far.")
+        else:
+            st.warning(f"Stopped after {job.rows:,} rows; the download has the rows scored so far.")
+
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Customers scored", f"{job.rows:,}")
+        m2.metric("Predicted to churn", f"{job.churned:,}")
+        m3.metric("Churn rate", f"{job.churned / job.rows:.1%}")
+
+        with open(job.output_path, "rb") as f:
+            st.download_button(
+                "⬇️ Download scored file",
+                data=f,
+                file_name=job.output_name,
+                mime="application/octet-stream" if job.output_name.endswith(".parquet") else "text/csv",
+            )
 
 # Streamlit entry
 if __name__ == "__main__":
     app = StreamlitApp()
-    formatted_data = app.render_take_input()
-    app.call_model_and_display(formatted_data)
+    mode = app.render_header()
+    if mode == "bulk":
+        app.render_bulk_upload()
+    else:
+        with span("predict.render_take_input"):
+            formatted_data = app.render_take_input()
+        app.call_model_and_display(formatted_data)
+    render_timing_panel()
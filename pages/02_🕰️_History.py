@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
-import os
+from datetime import date
+from history_store import get_history_store
 
 
 st.set_page_config(
@@ -13,44 +14,45 @@ st.set_page_config(
 st.title("📜Prediction History")
 st.write("This page records churn predictions made in this session and across past runs.")
 
-# 1. Load from session_state first
-session_history = st.session_state.get("prediction_history", [])
+# 1. Everything the Predict page logs lands in the indexed history store
+#    (caught up from prediction_history.csv, incl. rows other processes
+#    appended), so we only ever query one page of rows and the
+#    pre-aggregated KPI counts.
+store = get_history_store()
+store.sync_from_csv()
+first_day, last_day = store.day_bounds()
 
-# 2. Try to also load from CSV on disk (persistent history between runs)
-csv_path = "prediction_history.csv"
-file_history = []
-
-if os.path.exists(csv_path):
-    try:
-        file_history = pd.read_csv(csv_path).to_dict(orient="records")
-    except Exception:
-        file_history = []
-
-
-# 3. Merge both sources:
-#    - file_history = what's saved on disk from previous runs
-#    - session_history = what we just did this run
-#    We combine them, newest last, and drop dupes by timestamp + MonthlyCharge as a simple proxy
-combined_history = file_history + session_history
-history_df = pd.DataFrame(combined_history)
-
-if history_df.empty:
+if first_day is None:
     st.info("No predictions have been logged yet. Go to the Predict page, make a prediction, then come back here.")
     st.stop()
 
-# Drop exact duplicates if any
-history_df = history_df.drop_duplicates(
-    subset=["timestamp", "MonthlyCharge", "AccountWeeks", "prediction_raw"],
-    keep="last"
-)
-
-# 4. KPIs summary row
+# 2. Filters
+f1, f2, f3 = st.columns(3)
+with f1:
+    date_range = st.date_input(
+        "Date range",
+        value=(date.fromisoformat(first_day), date.fromisoformat(last_day)),
+    )
+with f2:
+    label_filter = st.selectbox("Prediction", options=["All", "Churn", "Stay"], index=0)
+with f3:
+    page_size = st.selectbox("Rows per page", options=[25, 50, 100, 250], index=1)
+
+# date_input returns a single date while the user is still picking the range
+if isinstance(date_range, (tuple, list)) and len(date_range) == 2:
+    start_day, end_day = (d.isoformat() for d in date_range)
+else:
+    start_day = end_day = None
+label = None if label_filter == "All" else label_filter
+
+# 3. KPIs summary row
 st.markdown("### 📈 Summary")
 
-total_preds = len(history_df)
-churn_preds = (history_df["prediction_raw"] == 1).sum()
-stay_preds = (history_df["prediction_raw"] == 0).sum()
-churn_rate = (churn_preds / total_preds * 100) if total_preds > 0 else 0.0
+kpis = store.kpis(start_day, end_day)
+total_preds = kpis["total"]
+churn_preds = kpis["churn"]
+stay_preds = kpis["stay"]
+churn_rate = kpis["churn_rate"]
 
 col1, col2, col3, col4 = st.columns(4)
 with col1:
@@ -64,7 +66,7 @@ with col4:
 
 st.markdown("---")
 
-# 5. Show the detailed history table
+# 4. Show the detailed history table
 st.markdown("### 🧾 Detailed Log")
 
 # reorder columns for readability
@@ -86,8 +88,48 @@ preferred_cols = [
     "DayCalls",
 ]
 
+total_rows = store.count(start_day, end_day, label)
+n_pages = max((total_rows + page_size - 1) // page_size, 1)
+
+# Keyset paging: session_state keeps the (timestamp, id) cursor each page
+# starts after, so a page costs the same however far back it is.
+# Changing a filter starts again from the newest page.
+filters = (start_day, end_day, label, page_size)
+if st.session_state.get("history_filters") != filters:
+    st.session_state["history_filters"] = filters
+    st.session_state["history_cursors"] = [None]
+cursors = st.session_state["history_cursors"]
+
+rows = store.page(page_size=page_size, start=start_day, end=end_day, label=label, before=cursors[-1])
+page = len(cursors)
+
+
+def older_page(cursor):
+    st.session_state["history_cursors"].append(cursor)
+
+
+def newer_page():
+    st.session_state["history_cursors"].pop()
+
+
+def newest_page():
+    st.session_state["history_cursors"] = [None]
+
+
+nav1, nav2, nav3, _ = st.columns([1, 1, 1, 5])
+nav1.button("⏮️ Newest", disabled=page == 1, on_click=newest_page)
+nav2.button("⬅️ Newer", disabled=page == 1, on_click=newer_page)
+nav3.button(
+    "Older ➡️",
+    disabled=page >= n_pages or len(rows) < page_size,
+    on_click=older_page,
+    args=((rows[-1]["timestamp"], rows[-1]["id"]),) if rows else (None,),
+)
+
+history_df = pd.DataFrame(rows)
 display_cols = [c for c in preferred_cols if c in history_df.columns]
-display_df = history_df[display_cols].sort_values(by="timestamp", ascending=False)
+display_df = history_df[display_cols] if display_cols else history_df
+st.caption(f"Page {page} of {n_pages} · {total_rows} matching predictions (newest first)")
 
 # make it pretty
 st.dataframe(
@@ -0,0 +1,221 @@
+"""
+Result cache in front of the scoring backend (scoring_backend.py).
+
+Analysts re-score the same customer profiles over and over. Results are
+cached under a hash of the canonicalized 12-feature payload, in a bounded
+in-memory LRU with a TTL, and optionally in a SQLite file so they survive
+a Streamlit restart.
+
+Entries are tied to a model version (model_version in .env, plus the
+endpoint url or local model path). When it changes, older entries stop
+being served.
+"""
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from features import FEATURE_COLUMNS
+from scoring_backend import backend_model_call, get_scoring_backend
+from stage_timing import span
+
+
+INT_FEATURES = {"AccountWeeks", "ContractRenewal", "DataPlan", "CustServCalls", "DayCalls"}
+
+CACHE_MAX_ENTRIES = int(os.getenv("prediction_cache_max_entries", "4096"))
+CACHE_TTL_SECONDS = float(os.getenv("prediction_cache_ttl_seconds", "86400"))
+CACHE_DISK_PATH = os.getenv("prediction_cache_path", "prediction_cache.sqlite")
+
+
+def current_model_version() -> str:
+    """Backend's endpoint url / model path + model_version from .env; changes invalidate the cache."""
+    return f"{get_scoring_backend().version}#{os.getenv('model_version', '')}"
+
+
+def canonical_key(body_dict: dict) -> str:
+    """
+    sha256 of the request rows with features in a fixed order and cast to
+    the types the model sees, so 40 / 40.0 / "40" all hash the same.
+    Other request keys (returnProbabilities, topK, echoInput, ...) change
+    the response, so they are part of the key, sorted by name.
+    """
+    rows = []
+    for row in body_dict["data"]:
+        rows.append([
+            int(row[c]) if c in INT_FEATURES else float(row[c])
+            for c in FEATURE_COLUMNS
+        ])
+    options = sorted((k, v) for k, v in body_dict.items() if k != "data")
+    # a plain {"data": ...} request keeps the rows-only key of older cache files
+    keyed = [rows, options] if options else rows
+    canonical = json.dumps(keyed, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU + TTL cache of endpoint responses, with an optional
+    SQLite tier on disk. Results go in and come out as copies, so a caller
+    mutating its response can't change what other sessions are served.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        disk_path: str = None,
+        model_version: str = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.model_version = model_version if model_version is not None else current_model_version()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()  # key -> (stored_at, result)
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path:
+            self._open_disk()
+
+    def _open_disk(self):
+        try:
+            self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                " key TEXT NOT NULL,"
+                " model_version TEXT NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " result TEXT NOT NULL,"
+                " PRIMARY KEY (key, model_version))"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS predictions_stored_at ON predictions (stored_at)"
+            )
+            self._db.commit()
+        except sqlite3.Error:
+            # read-only filesystem etc. -- keep going memory-only
+            self._db = None
+
+    def set_model_version(self, model_version: str):
+        """Switch model version; drops everything cached for the old one."""
+        with self._lock:
+            if model_version == self.model_version:
+                return
+            self.model_version = model_version
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute(
+                    "DELETE FROM predictions WHERE model_version != ?", (model_version,)
+                )
+                self._db.commit()
+
+    def get(self, body_dict: dict):
+        """Copy of the cached response for this payload, or None."""
+        key = canonical_key(body_dict)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(result)
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT stored_at, result FROM predictions WHERE key = ? AND model_version = ?",
+                    (key, self.model_version),
+                ).fetchone()
+                if row is not None and now - row[0] <= self.ttl_seconds:
+                    result = json.loads(row[1])
+                    self._remember(key, row[0], result)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return copy.deepcopy(result)
+
+            self.misses += 1
+            return None
+
+    def put(self, body_dict: dict, result: dict):
+        key = canonical_key(body_dict)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, copy.deepcopy(result))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO predictions (key, model_version, stored_at, result)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, self.model_version, now, json.dumps(result)),
+                )
+                self._db.execute(
+                    "DELETE FROM predictions WHERE stored_at < ?", (now - self.ttl_seconds,)
+                )
+                self._db.commit()
+
+    def _remember(self, key, stored_at, result):
+        self._entries[key] = (stored_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "model_version": self.model_version,
+            }
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_prediction_cache() -> PredictionCache:
+    """Process-wide cache shared by every Streamlit session."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = PredictionCache(disk_path=CACHE_DISK_PATH or None)
+    return _shared_cache
+
+
+def cached_model_call(body_dict: dict, model_call=backend_model_call) -> dict:
+    """
+    The configured scoring backend with the shared cache in front of it.
+    Picks up a changed model_version / backend before each lookup.
+    """
+    cache = get_prediction_cache()
+    cache.set_model_version(current_model_version())
+
+    with span("predict.cache_lookup"):
+        result = cache.get(body_dict)
+    if result is not None:
+        return result
+
+    result = model_call(body_dict)
+    if result.get("predictedOutcomes"):
+        cache.put(body_dict, result)
+    return result
@@ -0,0 +1,131 @@
+"""
+In-memory per-stage metrics for inference-script.py's run().
+
+Logging two lines per request costs real CPU at high QPS and says
+nothing about where the time goes. Instead, run() records each request's
+stage timings here (a few float adds under a lock), and the aggregates
+are logged as one JSON line every inference_metrics_flush_seconds:
+
+    {"event": "run_metrics", "requests": ..., "rows": ..., "rows_per_sec": ...,
+     "stages": {"parse": {"mean_ms": ..., "max_ms": ..., "share": ...}, ...},
+     "batch_sizes": {"1": ..., "2-10": ..., ...}, "errors": ...}
+
+A sample of requests (inference_log_sample_rate, default 1%) is also
+logged individually with its batch size and stage timings.
+
+Ship this file next to inference-script.py when deploying to Azure.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+
+STAGES = ("parse", "features", "predict", "response")
+
+METRICS_FLUSH_SECONDS = float(os.environ.get("inference_metrics_flush_seconds", "60"))
+LOG_SAMPLE_RATE = float(os.environ.get("inference_log_sample_rate", "0.01"))
+
+# upper bounds of the batch-size buckets (rows per request)
+BATCH_SIZE_BOUNDS = (1, 10, 100, 1_000, 10_000, 100_000)
+
+
+def _batch_bucket_labels():
+    labels, lower = [], 1
+    for bound in BATCH_SIZE_BOUNDS:
+        labels.append(str(bound) if bound == lower else f"{lower}-{bound}")
+        lower = bound + 1
+    labels.append(f">{BATCH_SIZE_BOUNDS[-1]}")
+    return labels
+
+
+BATCH_SIZE_LABELS = _batch_bucket_labels()
+
+
+class RunMetrics:
+    """Counters and stage-time sums since the last flush."""
+
+    def __init__(self, flush_seconds: float = METRICS_FLUSH_SECONDS, sample_rate: float = LOG_SAMPLE_RATE):
+        self.flush_seconds = flush_seconds
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._reset(time.monotonic())
+
+    def _reset(self, now):
+        self.window_started = now
+        self.requests = 0
+        self.rows = 0
+        self.errors = 0
+        self.stage_total = [0.0] * len(STAGES)
+        self.stage_max = [0.0] * len(STAGES)
+        self.batch_sizes = [0] * len(BATCH_SIZE_LABELS)
+
+    def record(self, n_rows: int, stage_seconds):
+        """One finished request: rows scored and seconds per STAGES entry."""
+        bucket = 0
+        while bucket < len(BATCH_SIZE_BOUNDS) and n_rows > BATCH_SIZE_BOUNDS[bucket]:
+            bucket += 1
+        with self._lock:
+            self.requests += 1
+            self.rows += n_rows
+            self.batch_sizes[bucket] += 1
+            for i, seconds in enumerate(stage_seconds):
+                self.stage_total[i] += seconds
+                if seconds > self.stage_max[i]:
+                    self.stage_max[i] = seconds
+
+        if self.sample_rate and random.random() < self.sample_rate:
+            logging.info(json.dumps({
+                "event": "run_sample",
+                "rows": n_rows,
+                "stages_ms": {s: round(t * 1000, 3) for s, t in zip(STAGES, stage_seconds)},
+            }))
+        self.maybe_flush()
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+        self.maybe_flush()
+
+    def snapshot(self) -> dict:
+        """Aggregates for the current window (what flush() would log)."""
+        with self._lock:
+            return self._snapshot(time.monotonic())
+
+    def _snapshot(self, now) -> dict:
+        busy = sum(self.stage_total)
+        stages = {}
+        for i, stage in enumerate(STAGES):
+            stages[stage] = {
+                "mean_ms": round(self.stage_total[i] / self.requests * 1000, 3) if self.requests else 0.0,
+                "max_ms": round(self.stage_max[i] * 1000, 3),
+                "share": round(self.stage_total[i] / busy, 4) if busy else 0.0,
+            }
+        return {
+            "event": "run_metrics",
+            "window_seconds": round(now - self.window_started, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+            "rows": self.rows,
+            "busy_seconds": round(busy, 6),
+            "rows_per_sec": round(self.rows / busy, 1) if busy else 0.0,
+            "stages": stages,
+            "batch_sizes": dict(zip(BATCH_SIZE_LABELS, self.batch_sizes)),
+        }
+
+    def maybe_flush(self):
+        if time.monotonic() - self.window_started >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """Log the current window as one JSON line and start a new one."""
+        now = time.monotonic()
+        with self._lock:
+            if self.requests == 0 and self.errors == 0:
+                self.window_started = now
+                return
+            report = self._snapshot(now)
+            self._reset(now)
+        logging.info(json.dumps(report))
@@ -0,0 +1,136 @@
+"""
+Pluggable scoring backends for the Predict page.
+
+    RemoteBackend           POSTs to the Azure ML endpoint (azure_model_rest_api_call)
+    CoalescedRemoteBackend  the same endpoint, with concurrent single-row
+                            requests from all sessions merged into batches
+                            (micro_batch.py)
+    LocalBackend            runs inference-script.py's init() / run() in-process
+                            on a local copy of the model, skipping the network hop
+
+All take and return the same dicts as azure_model_rest_api_call. The
+backend is picked in .env:
+
+    model_backend=remote            (default)
+    model_backend=remote_coalesced
+    model_backend=local
+    model_local_path=model/random_forest_best.pkl   (or a flat_forest dir;
+                                                     default: under AZUREML_MODEL_DIR)
+"""
+import json
+import os
+import threading
+
+from local_model import load_local_model
+from micro_batch import ThreadedCoalescingScorer
+from model_call import _endpoint_config, _post_request
+from stage_timing import span
+
+
+SCORING_BACKEND = os.getenv("model_backend", "remote")
+LOCAL_MODEL_PATH = os.getenv("model_local_path") or None
+
+
+class RemoteBackend:
+    """The Azure ML online endpoint, over the shared pooled session."""
+
+    name = "remote"
+
+    def __init__(self, model_url: str = None, api_key: str = None):
+        self.model_url, self.api_key = _endpoint_config(model_url, api_key)
+
+    @property
+    def version(self) -> str:
+        return self.model_url
+
+    def score(self, body_dict: dict) -> dict:
+        return _post_request(body_dict, self.model_url, self.api_key)
+
+
+class CoalescedRemoteBackend(RemoteBackend):
+    """
+    RemoteBackend behind a ThreadedCoalescingScorer: Predict clicks that
+    arrive within a few milliseconds of each other share one POST.
+    """
+
+    name = "remote_coalesced"
+
+    def __init__(self, model_url: str = None, api_key: str = None, **scorer_options):
+        super().__init__(model_url, api_key)
+        self.scorer = ThreadedCoalescingScorer(model_url=self.model_url, api_key=self.api_key, **scorer_options)
+
+    def score(self, body_dict: dict) -> dict:
+        with span("model_call.coalesced"):
+            return self.scorer.score(body_dict)
+
+
+class LocalBackend:
+    """
+    inference-script.py loaded into this process. run() is called with the
+    same JSON body the endpoint would get, so responses are identical.
+    """
+
+    name = "local"
+
+    def __init__(self, model_path: str = LOCAL_MODEL_PATH):
+        try:
+            self.inference = load_local_model(model_path)
+        except (OSError, KeyError) as e:
+            raise RuntimeError(
+                f"Could not load the local model ({model_path or 'AZUREML_MODEL_DIR'}):\n{e}\n\n"
+                "Set model_local_path in .env to random_forest_best.pkl or a flat_forest "
+                "export directory, or switch back to model_backend=remote."
+            )
+        self.model_path = model_path
+
+    @property
+    def version(self) -> str:
+        return f"local:{os.path.abspath(self.model_path) if self.model_path else 'AZUREML_MODEL_DIR'}"
+
+    def score(self, body_dict: dict) -> dict:
+        try:
+            with span("model_call.local_run"):
+                return self.inference.run(json.dumps(body_dict))
+        except (KeyError, ValueError, TypeError) as e:
+            # what the endpoint would have answered with a 4xx/5xx
+            raise RuntimeError(f"Local model could not score the request:\n{e!r}")
+
+
+BACKENDS = {
+    RemoteBackend.name: RemoteBackend,
+    CoalescedRemoteBackend.name: CoalescedRemoteBackend,
+    LocalBackend.name: LocalBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_scoring_backend():
+    """Process-wide backend selected by model_backend in .env, created on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = make_backend(SCORING_BACKEND)
+    return _backend
+
+
+def make_backend(name: str, **options):
+    if name not in BACKENDS:
+        raise RuntimeError(
+            f"Unknown model_backend {name!r} in .env; expected one of {sorted(BACKENDS)}."
+        )
+    return BACKENDS[name](**options)
+
+
+def set_scoring_backend(backend):
+    """Swap the process-wide backend (e.g. for benchmarks or a local dev session)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def backend_model_call(body_dict: dict) -> dict:
+    """Drop-in for azure_model_rest_api_call that goes through the configured backend."""
+    return get_scoring_backend().score(body_dict)
@@ -0,0 +1,229 @@
+"""
+Per-stage latency timers for the Predict path.
+
+    with span("predict.http_post"):
+        resp = session.post(...)
+
+Each span name gets a latency histogram (Prometheus-style cumulative
+buckets, in seconds) in a process-wide registry shared by every
+Streamlit session. Turned on with predict_timing_enabled=1 in .env;
+when off, span() hands back one shared no-op context manager, so the
+instrumented code pays a function call and nothing else.
+
+While enabled, a daemon thread rewrites predict_timing_path (default
+predict_metrics.prom) in the Prometheus text format every
+predict_timing_export_seconds, for node_exporter's textfile collector or
+a quick `cat`. render_timing_panel() shows the same numbers in the
+Streamlit sidebar.
+"""
+import atexit
+import contextlib
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+TIMING_ENABLED = os.getenv("predict_timing_enabled", "0") == "1"
+TIMING_EXPORT_PATH = os.getenv("predict_timing_path", "predict_metrics.prom")
+TIMING_EXPORT_SECONDS = float(os.getenv("predict_timing_export_seconds", "15"))
+# comma-separated usernames allowed to see the sidebar panel (empty: nobody)
+TIMING_ADMIN_USERS = {u.strip() for u in os.getenv("admin_users", "").split(",") if u.strip()}
+
+# upper bounds in seconds, 0.5 ms .. 10 s
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+METRIC_NAME = "churn_guard_stage_seconds"
+
+
+class LatencyHistogram:
+    """Bucket counts + sum + count for one stage. Not locked; the registry locks."""
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # last one is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        i = 0
+        while i < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets (linear within a bucket), like histogram_quantile()."""
+        if self.count == 0:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.buckets):
+            upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else self.max
+            if n and seen + n >= rank:
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+            lower = upper
+        return self.max
+
+
+class StageTimings:
+    """Histograms keyed by stage name."""
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = LatencyHistogram()
+            hist.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self.started = time.time()
+
+    def summary(self) -> list:
+        """One dict per stage: count, mean / p50 / p95 / p99 / max in ms."""
+        with self._lock:
+            stages = sorted(self._stages.items())
+            rows = []
+            for stage, h in stages:
+                rows.append({
+                    "stage": stage,
+                    "count": h.count,
+                    "mean_ms": h.total / h.count * 1000,
+                    "p50_ms": h.quantile(0.50) * 1000,
+                    "p95_ms": h.quantile(0.95) * 1000,
+                    "p99_ms": h.quantile(0.99) * 1000,
+                    "max_ms": h.max * 1000,
+                })
+        return rows
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (one histogram, stage label)."""
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent per Predict stage.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self._stages.items()):
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS + (float("inf"),), h.buckets):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {h.total!r}')
+                lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str = TIMING_EXPORT_PATH):
+        """Write the text file atomically, so a scraper never sees half of it."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+class _Span:
+    __slots__ = ("timings", "stage", "started")
+
+    def __init__(self, timings: StageTimings, stage: str):
+        self.timings = timings
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+_NO_SPAN = contextlib.nullcontext()
+
+_timings = StageTimings()
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_stage_timings() -> StageTimings:
+    """Process-wide registry shared by every Streamlit session."""
+    return _timings
+
+
+def span(stage: str):
+    """Context manager timing one stage (a shared no-op when timing is off)."""
+    if not TIMING_ENABLED:
+        return _NO_SPAN
+    _ensure_exporter()
+    return _Span(_timings, stage)
+
+
+def _export_loop(stop: threading.Event):
+    while not stop.wait(TIMING_EXPORT_SECONDS):
+        try:
+            _timings.write_prometheus(TIMING_EXPORT_PATH)
+        except OSError:
+            pass  # best effort; the sidebar panel still works
+
+
+def _ensure_exporter():
+    global _exporter
+    if _exporter is not None or not TIMING_EXPORT_PATH:
+        return
+    with _exporter_lock:
+        if _exporter is None:
+            stop = threading.Event()
+            _exporter = threading.Thread(target=_export_loop, args=(stop,), name="stage-timing-export", daemon=True)
+            _exporter.start()
+            atexit.register(stop.set)
+
+
+def render_timing_panel():
+    """
+    Sidebar panel with per-stage latency, for admins (admin_users in .env,
+    matched against the streamlit_authenticator username). No-op when
+    timing is off or no admins are configured; the .prom export still runs.
+    """
+    if not TIMING_ENABLED or not TIMING_ADMIN_USERS:
+        return
+    import pandas as pd
+    import streamlit as st
+
+    if st.session_state.get("username") not in TIMING_ADMIN_USERS:
+        return
+
+    with st.sidebar.expander("⏱️ Stage timings"):
+        rows = _timings.summary()
+        if not rows:
+            st.caption("No timed requests yet.")
+            return
+        st.dataframe(pd.DataFrame(rows).round(3), hide_index=True, use_container_width=True)
+        st.caption(f"Since {time.strftime('%Y-%m-%d %H:%M', time.localtime(_timings.started))}")
+        col1, col2 = st.columns(2)
+        if col1.button("Export .prom", key="stage-timing-export"):
+            try:
+                _timings.write_prometheus(TIMING_EXPORT_PATH)
+                st.success(f"Wrote {TIMING_EXPORT_PATH}")
+            except OSError as e:
+                st.error(f"Could not write {TIMING_EXPORT_PATH}: {e}")
+        if col2.button("Reset", key="stage-timing-reset"):
+            _timings.reset()
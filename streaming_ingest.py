@@ -0,0 +1,256 @@
+"""
+Single-pass, bounded-memory ingestion of large churn extracts.
+
+Production extracts are several GB, too big to pd.read_csv into a
+Streamlit worker. ingest_churn_csv() streams a file with the
+telecom_churn_v*.csv schema in chunks and keeps only accumulators:
+
+- ChurnAggregates (KPIs, groupby tallies, running co-moments for corr)
+- fixed-width StreamingHistograms per churn class for the EDA charts,
+  capped at STREAM_HISTOGRAM_MAX_BINS bins each
+- a per-class bottom-k random sample for the scatter plots
+
+Memory is O(chunk_size + sample_size + bins), whatever the file size.
+The Dashboard switches to this path for files above
+dashboard_streaming_threshold_bytes.
+"""
+import copy
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dashboard_aggregates import ChurnAggregates
+from data_loader import CHURN_DTYPES, add_churn_label, file_fingerprint
+
+
+STREAM_CHUNK_ROWS = 200_000
+STREAM_SAMPLE_ROWS = 5000
+STREAMING_THRESHOLD_BYTES = int(os.getenv("dashboard_streaming_threshold_bytes", str(200 * 1024 * 1024)))
+
+# fine bin width per histogram column; rebinned to the chart's nbins on read
+# (and widened if a column's range needs more than STREAM_HISTOGRAM_MAX_BINS)
+STREAM_HISTOGRAM_MAX_BINS = 4096
+STREAM_HISTOGRAMS = {
+    "DayMins": 1.0,
+    "CustServCalls": 1,
+    "MonthlyCharge": 0.5,
+}
+
+
+class StreamingHistogram:
+    """
+    Per-churn-class counts on fixed-width bins [k * width, (k + 1) * width)
+    that grow to whatever range the data covers, up to max_bins: past that
+    the bin width doubles (adjacent bins merged) until the range fits, so
+    one outlier can't blow up memory. An int bin_width marks a discrete
+    column (one bar per value, until the bins are widened). NaN and
+    infinite values are not counted.
+    """
+
+    def __init__(self, bin_width: float, max_bins: int = STREAM_HISTOGRAM_MAX_BINS):
+        self.base_width = bin_width
+        self.bin_width = bin_width
+        self.max_bins = max_bins
+        self.discrete = isinstance(bin_width, int)
+        self.first_bin = 0
+        self.counts = np.zeros((2, 0), dtype=np.int64)
+
+    @property
+    def last_bin(self) -> int:
+        return self.first_bin + self.counts.shape[1] - 1
+
+    def _span(self, lo: int, hi: int) -> int:
+        """Bins needed to cover what's counted so far plus [lo, hi]."""
+        if self.counts.shape[1]:
+            lo, hi = min(lo, self.first_bin), max(hi, self.last_bin)
+        return hi - lo + 1
+
+    def _coarsen(self):
+        """Double the bin width, merging bins 2j and 2j + 1."""
+        self.bin_width *= 2
+        self.discrete = False
+        if self.counts.shape[1] == 0:
+            self.first_bin = 0
+            return
+        left = self.first_bin % 2
+        right = (self.counts.shape[1] + left) % 2
+        counts = np.pad(self.counts, ((0, 0), (left, right)))
+        self.counts = counts.reshape(2, -1, 2).sum(axis=2)
+        self.first_bin = (self.first_bin - left) // 2
+
+    def update(self, values: np.ndarray, churn: np.ndarray):
+        keep = np.isfinite(values)
+        values, churn = values[keep], churn[keep]
+        if len(values) == 0:
+            return self
+        # floor(v / 2w) == floor(v / w) // 2, so bins follow each doubling
+        bins = np.floor(values / self.bin_width).astype(np.int64)
+        while self._span(int(bins.min()), int(bins.max())) > self.max_bins:
+            self._coarsen()
+            bins //= 2
+        lo, hi = int(bins.min()), int(bins.max())
+        if self.counts.shape[1] == 0:
+            self.first_bin = lo
+            self.counts = np.zeros((2, hi - lo + 1), dtype=np.int64)
+        else:
+            self._grow(lo, hi)
+        offset = bins - self.first_bin
+        size = self.counts.shape[1]
+        for value in (0, 1):
+            self.counts[value] += np.bincount(offset[churn == value], minlength=size)
+        return self
+
+    def _grow(self, lo: int, hi: int):
+        left = max(self.first_bin - lo, 0)
+        right = max(hi - self.last_bin, 0)
+        if left or right:
+            self.counts = np.pad(self.counts, ((0, 0), (left, right)))
+            self.first_bin -= left
+
+    def merge(self, other: "StreamingHistogram"):
+        if other.base_width != self.base_width:
+            raise ValueError("Cannot merge histograms with different bin widths")
+        if other.counts.shape[1] == 0:
+            return self
+        other = copy.deepcopy(other)
+        while other.bin_width < self.bin_width:
+            other._coarsen()
+        while self.bin_width < other.bin_width:
+            self._coarsen()
+        while self._span(other.first_bin, other.last_bin) > self.max_bins:
+            self._coarsen()
+            other._coarsen()
+        if self.counts.shape[1] == 0:
+            self.first_bin, self.counts = other.first_bin, other.counts
+            return self
+        self._grow(other.first_bin, other.last_bin)
+        start = other.first_bin - self.first_bin
+        self.counts[:, start:start + other.counts.shape[1]] += other.counts
+        return self
+
+    def counts_frame(self, nbins: int = None) -> pd.DataFrame:
+        """
+        Same shape as dashboard_plots.histogram_counts(). nbins=None keeps
+        the fine bins; otherwise adjacent bins are merged down to ~nbins.
+        """
+        counts = self.counts
+        group = 1 if not nbins else max(int(np.ceil(counts.shape[1] / nbins)), 1)
+        pad = (-counts.shape[1]) % group
+        if pad:
+            counts = np.pad(counts, ((0, 0), (0, pad)))
+        counts = counts.reshape(2, -1, group).sum(axis=2)
+
+        width = self.bin_width * group
+        starts = (self.first_bin + np.arange(counts.shape[1]) * group) * self.bin_width
+        centres = starts.astype(np.float64) if self.discrete and group == 1 else starts + width / 2
+        frames = []
+        for label, row in zip(("Stayed", "Churned"), counts):
+            frames.append(pd.DataFrame({
+                "ChurnLabel": label,
+                "bin_start": starts,
+                "bin_end": starts + width,
+                "bin_centre": centres,
+                "Count": row,
+            }))
+        return pd.concat(frames, ignore_index=True)
+
+
+class ClassSample:
+    """
+    Uniform random sample of up to k rows per churn class (bottom-k on
+    random keys), updated chunk by chunk.
+    """
+
+    def __init__(self, k: int = STREAM_SAMPLE_ROWS // 2, seed: int = 0):
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.rows = None
+        self.keys = np.empty(0)
+
+    def update(self, chunk: pd.DataFrame):
+        keys = self.rng.random(len(chunk))
+        rows = chunk if self.rows is None else pd.concat([self.rows, chunk], ignore_index=True)
+        keys = np.concatenate([self.keys, keys])
+
+        churn = rows["Churn"].to_numpy()
+        keep = []
+        for value in (0, 1):
+            idx = np.flatnonzero(churn == value)
+            if len(idx) > self.k:
+                idx = idx[np.argpartition(keys[idx], self.k)[:self.k]]
+            keep.append(idx)
+        keep = np.sort(np.concatenate(keep))
+        self.rows = rows.iloc[keep].reset_index(drop=True)
+        self.keys = keys[keep]
+        return self
+
+
+class ChurnSummary:
+    """Everything the Dashboard views need, built in one streaming pass."""
+
+    def __init__(self, sample_rows: int = STREAM_SAMPLE_ROWS):
+        self.aggregates = ChurnAggregates()
+        self.histograms = {c: StreamingHistogram(w) for c, w in STREAM_HISTOGRAMS.items()}
+        self._sample = ClassSample(k=sample_rows // 2)
+
+    @property
+    def n_rows(self) -> int:
+        return self.aggregates.n
+
+    @property
+    def sample(self) -> pd.DataFrame:
+        """Bounded per-class sample with ChurnLabel, for scatter plots."""
+        if self._sample.rows is None:
+            return add_churn_label(pd.DataFrame({c: pd.Series(dtype=t) for c, t in CHURN_DTYPES.items()}))
+        return add_churn_label(self._sample.rows.copy())
+
+    def update(self, chunk: pd.DataFrame):
+        self.aggregates.update(chunk)
+        churn = chunk["Churn"].to_numpy()
+        for column, histogram in self.histograms.items():
+            histogram.update(chunk[column].to_numpy(dtype=np.float64), churn)
+        self._sample.update(chunk)
+        return self
+
+    def histogram_counts(self, column: str, nbins: int = None) -> pd.DataFrame:
+        return self.histograms[column].counts_frame(nbins)
+
+
+def iter_churn_chunks(path: str, chunk_rows: int = STREAM_CHUNK_ROWS):
+    """Typed DataFrame chunks of a churn CSV."""
+    with pd.read_csv(path, dtype=CHURN_DTYPES, usecols=list(CHURN_DTYPES), chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def ingest_churn_csv(path: str, chunk_rows: int = STREAM_CHUNK_ROWS,
+                     sample_rows: int = STREAM_SAMPLE_ROWS) -> ChurnSummary:
+    """One pass over the file, bounded memory."""
+    summary = ChurnSummary(sample_rows)
+    for chunk in iter_churn_chunks(path, chunk_rows):
+        summary.update(chunk)
+    return summary
+
+
+_cache = {}  # abspath -> (fingerprint, ChurnSummary)
+_cache_lock = threading.Lock()
+
+
+def load_churn_summary(path: str) -> ChurnSummary:
+    """ingest_churn_csv, cached per process until the file changes."""
+    key = os.path.abspath(path)
+    fingerprint = file_fingerprint(path)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        summary = ingest_churn_csv(path)
+        _cache[key] = (fingerprint, summary)
+        return summary
+
+
+def needs_streaming(path: str, threshold_bytes: int = STREAMING_THRESHOLD_BYTES) -> bool:
+    """True if the file is too big to load whole into a worker."""
+    return os.path.getsize(path) > threshold_bytes
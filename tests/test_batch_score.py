@@ -0,0 +1,35 @@
+"""batch_score validates chunks the way the endpoint validates requests."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import batch_score
+from benchmarks import _suite_inference, make_rows
+from features import feature_matrix
+
+
+@pytest.fixture
+def inference(monkeypatch):
+    inference = _suite_inference(None)
+    monkeypatch.setattr(batch_score, "_inference", inference)
+    return inference
+
+
+def test_chunk_scores_like_the_endpoint(inference):
+    chunk = pd.DataFrame(make_rows(50, seed=6))
+    # fractional counts are truncated like in a request
+    chunk["CustServCalls"] = chunk["CustServCalls"] + 0.9
+
+    expected = inference.run('{"data": ' + chunk.to_json(orient="records") + "}")
+    assert batch_score._score_chunk(chunk).tolist() == expected["predictedOutcomes"]
+
+
+@pytest.mark.parametrize("bad", [np.nan, np.inf])
+def test_non_finite_rows_fail_the_chunk_with_its_position(inference, bad):
+    chunk = pd.DataFrame(make_rows(10, seed=7), index=range(100, 110))
+    chunk.loc[104, "DayMins"] = bad
+
+    with pytest.raises(ValueError, match="Non-finite.*input row 100"):
+        batch_score._score_chunk(chunk)
+    # the model itself would have scored it
+    assert len(inference.model.predict(feature_matrix(chunk))) == 10
@@ -0,0 +1,35 @@
+"""Bulk scoring output files don't outlive their job."""
+import gc
+import os
+import time
+
+import bulk_scoring
+from bulk_scoring import BulkScoreJob, sweep_outputs
+
+
+def test_job_file_goes_with_the_job(tmp_path):
+    job = BulkScoreJob("extract.csv", output_dir=str(tmp_path))
+    path = job.output_path
+    assert os.path.dirname(path) == str(tmp_path) and os.path.exists(path)
+    job.discard()
+    assert job.expired and not os.path.exists(path)
+
+    # a session ending drops its job without discard()
+    job = BulkScoreJob("extract.parquet", output_dir=str(tmp_path))
+    path = job.output_path
+    del job
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def test_new_jobs_sweep_out_stale_files(tmp_path):
+    stale = tmp_path / "churn_scored_old.csv"
+    stale.write_text("x\n")
+    old = time.time() - bulk_scoring.BULK_OUTPUT_MAX_AGE_SECONDS - 60
+    os.utime(stale, (old, old))
+    fresh = BulkScoreJob("extract.csv", output_dir=str(tmp_path))
+
+    assert not stale.exists()
+    assert os.path.exists(fresh.output_path)
+    assert sweep_outputs(str(tmp_path)) == 0
+    assert sweep_outputs(str(tmp_path / "missing")) == 0
@@ -0,0 +1,53 @@
+"""load_aggregates must only take the incremental path for a genuine append."""
+import os
+
+import numpy as np
+import pytest
+
+import dashboard_aggregates
+from dashboard_aggregates import ChurnAggregates, load_aggregates
+from data_loader import load_churn_dataset
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "telecom_churn_v2.csv")
+
+
+@pytest.fixture
+def churn_csv(tmp_path):
+    # big enough that the end of the file is outside the first hashed window
+    with open(DATA_PATH, encoding="utf-8") as f:
+        header, *rows = f.read().splitlines(keepends=True)
+    path = tmp_path / "churn.csv"
+    path.write_text(header + "".join(rows * 3), encoding="utf-8")
+    yield path, rows
+    dashboard_aggregates._cache.pop(os.path.abspath(path), None)
+
+
+def assert_matches_full_compute(aggregates, path):
+    expected = ChurnAggregates.from_frame(load_churn_dataset(str(path), use_sidecar=False))
+    assert aggregates.n == expected.n
+    np.testing.assert_allclose(aggregates.corr().to_numpy(), expected.corr().to_numpy())
+    np.testing.assert_array_equal(aggregates.label_counts_, expected.label_counts_)
+
+
+def test_append_is_folded_in(churn_csv):
+    path, rows = churn_csv
+    load_aggregates(str(path))
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(rows[:10])
+
+    assert_matches_full_compute(load_aggregates(str(path)), path)
+
+
+def test_edit_near_the_end_plus_append_is_a_rewrite(churn_csv):
+    path, rows = churn_csv
+    load_aggregates(str(path))
+    assert os.path.getsize(path) > 2 * dashboard_aggregates._EDGE_BYTES
+
+    # flip the Churn label of the last row in place, then append
+    text = path.read_text(encoding="utf-8")
+    head, last = text[:-1].rsplit("\n", 1)
+    fields = last.split(",")
+    fields[0] = "1" if fields[0] == "0" else "0"
+    path.write_text(head + "\n" + ",".join(fields) + "\n" + "".join(rows[:10]), encoding="utf-8")
+
+    assert_matches_full_compute(load_aggregates(str(path)), path)
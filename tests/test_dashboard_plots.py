@@ -0,0 +1,40 @@
+"""The EDA histograms keep px.histogram's look while plotting only pre-binned data."""
+import os
+
+import numpy as np
+import plotly.express as px
+import pytest
+
+from dashboard_plots import box_stats, box_stats_from_counts, churn_histogram, histogram_counts
+from data_loader import add_churn_label, load_churn_dataset
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "telecom_churn_v2.csv")
+
+
+@pytest.fixture(scope="module")
+def df():
+    return add_churn_label(load_churn_dataset(DATA_PATH, use_sidecar=False).copy())
+
+
+def test_box_marginal_and_stacking_match_px_histogram(df):
+    fig = churn_histogram(df, "DayMins", title="Daytime Minutes vs Churn", opacity=0.7, marginal="box")
+    reference = px.histogram(df, x="DayMins", color="ChurnLabel", marginal="box", opacity=0.7, nbins=30)
+
+    assert fig.layout.barmode == reference.layout.barmode
+    assert [t.type for t in fig.data].count("box") == [t.type for t in reference.data].count("box")
+    # no raw column goes to the browser
+    assert all(t.x is None for t in fig.data if t.type == "box")
+    assert all(len(t.x) <= 30 for t in fig.data if t.type == "bar")
+
+
+def test_box_stats_are_plotly_style_quartiles_and_whiskers(df):
+    stats = box_stats(df, "DayMins").set_index("ChurnLabel")
+    for label, group in df.groupby("ChurnLabel", observed=True):
+        x = group["DayMins"].to_numpy(dtype=np.float64)
+        q1, median, q3 = np.quantile(x, [0.25, 0.5, 0.75])
+        assert stats.loc[label, ["q1", "median", "q3"]].tolist() == pytest.approx([q1, median, q3])
+        assert stats.loc[label, "upperfence"] == x[x <= q3 + 1.5 * (q3 - q1)].max()
+
+    # the estimate from fine bins (streaming path) lands close
+    estimated = box_stats_from_counts(histogram_counts(df, "DayMins", 350)).set_index("ChurnLabel")
+    np.testing.assert_allclose(estimated.to_numpy(), stats.loc[estimated.index].to_numpy(), atol=2.0)
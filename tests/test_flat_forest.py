@@ -0,0 +1,82 @@
+"""FlatForest must score exactly like the sklearn forest it was flattened from."""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from features import feature_matrix
+from flat_forest import FlatForest, assert_parity, export_forest, load_forest, parity_rows
+from local_model import load_inference_script
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "telecom_churn_v2.csv")
+
+
+@pytest.fixture(scope="module")
+def forest():
+    df = pd.read_csv(DATA_PATH)
+    model = RandomForestClassifier(n_estimators=25, max_depth=10, random_state=0, n_jobs=1)
+    model.fit(feature_matrix(df), df["Churn"])
+    return model
+
+
+def non_finite_rows(X):
+    rows = X[:4].copy()
+    rows[0, 0] = np.nan
+    rows[1, 5] = np.inf
+    rows[2, 9] = -np.inf
+    rows[3, :] = np.nan
+    return rows
+
+
+def test_parity_on_churn_csv_and_random_rows(forest):
+    assert_parity(forest, FlatForest.from_estimator(forest), parity_rows(DATA_PATH, n_random=2_000))
+
+
+def test_parity_after_export_and_mmap_load(forest, tmp_path):
+    export_forest(forest, str(tmp_path))
+    assert_parity(forest, load_forest(str(tmp_path)), parity_rows(DATA_PATH, n_random=500))
+
+
+def test_non_finite_rows_are_rejected_not_scored(forest):
+    flat = FlatForest.from_estimator(forest)
+    X = parity_rows(DATA_PATH, n_random=0)
+    assert_parity(forest, flat, np.concatenate([X, non_finite_rows(X)]))
+    with pytest.raises(ValueError):
+        flat.predict_proba(non_finite_rows(X))
+
+
+class Spy:
+    """Wraps a model and records whether it was asked to score anything."""
+
+    def __init__(self, model):
+        self.model = model
+        self.called = False
+
+    def __getattr__(self, name):
+        self.called = True
+        return getattr(self.model, name)
+
+
+def test_run_rejects_non_finite_features_on_both_paths(forest):
+    inference = load_inference_script()
+    inference.model = Spy(forest)
+    inference.fast_model = Spy(FlatForest.from_estimator(forest))
+    columns = list(pd.read_csv(DATA_PATH, nrows=0).columns.drop("Churn"))
+    row = pd.read_csv(DATA_PATH, nrows=1)[columns].iloc[0].tolist()
+    nan_row, inf_row = list(row), list(row)
+    nan_row[0] = None
+    inf_row[5] = "inf"
+    # fast path (<= FAST_PATH_MAX_ROWS) and the full model path
+    for n_rows in (2, inference.FAST_PATH_MAX_ROWS + 2):
+        data = [row] * (n_rows - 2) + [nan_row, inf_row]
+        body = json.dumps({"columns": columns, "data": data})
+        assert inference.scoring_model(n_rows) is (inference.fast_model if n_rows == 2 else inference.model)
+        with pytest.raises(ValueError, match="Non-finite"):
+            inference.run(body)
+        with pytest.raises(ValueError, match="Non-finite"):
+            inference.score_request(body.encode(), "application/json")
+    assert not inference.model.called
+    assert not inference.fast_model.called
@@ -0,0 +1,92 @@
+"""HistoryWriter / HistoryStore must not lose predictions to a transient disk or database error."""
+import csv
+import os
+import sqlite3
+import threading
+
+from history_log import HistoryWriter
+from history_store import HistoryStore
+
+
+def entry(i):
+    return {"timestamp": f"2024-01-01 00:{i:02d}", "prediction_raw": i % 2, "prediction_label": "Stay"}
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_failed_batch_is_retried_until_the_disk_recovers(tmp_path):
+    # the directory doesn't exist yet, so the first appends fail
+    path = tmp_path / "later" / "history.csv"
+    writer = HistoryWriter(path=str(path), retry_backoff=0.05, max_retries=10)
+    for i in range(3):
+        writer.append(entry(i))
+    threading.Timer(0.2, os.makedirs, args=(path.parent,)).start()
+    writer.close()
+
+    assert [row["timestamp"] for row in read_rows(path)] == [entry(i)["timestamp"] for i in range(3)]
+    assert writer.rows_written == 3
+    assert writer.rows_dropped == 0
+    assert writer.last_error is None
+
+
+def test_batch_is_dropped_only_after_max_retries(tmp_path):
+    writer = HistoryWriter(path=str(tmp_path / "missing" / "history.csv"), retry_backoff=0.01, max_retries=3)
+    writer.append(entry(0))
+    writer.close()
+
+    assert writer.rows_dropped == 1
+    assert writer.rows_written == 0
+    assert isinstance(writer.last_error, OSError)
+
+
+class FlakyStore(HistoryStore):
+    """Store whose first sync fails, like a locked database."""
+
+    fail_next = False
+
+    def sync_from_csv(self, csv_path=None):
+        if self.fail_next:
+            self.fail_next = False
+            raise sqlite3.OperationalError("database is locked")
+        return super().sync_from_csv(csv_path)
+
+
+def test_store_catches_up_after_a_failed_write(tmp_path):
+    path = str(tmp_path / "history.csv")
+    store = FlakyStore(path=str(tmp_path / "history.sqlite"), seed_csv=path)
+    store.fail_next = True
+    writer = HistoryWriter(path=path, store=store)
+    for i in range(3):
+        writer.append(entry(i))
+    writer.close()
+
+    assert store.count() == 3
+    # syncing again imports nothing twice
+    assert store.sync_from_csv(path) == 0
+    assert store.count() == 3
+
+
+def test_store_skips_malformed_csv_rows(tmp_path):
+    path = tmp_path / "history.csv"
+    path.write_text(
+        "timestamp,prediction_raw,prediction_label\n"
+        "2024-01-01 00:00,1,Churn\n"
+        "2024-01-01 00:01,,Stay\n"
+        "2024-01-01 00:02,oops,Stay\n"
+        ",0,Stay\n"
+        "2024-01-01 00:03,0.0,Stay\n"
+        "2024-01-01 00:04,1,Ch",  # still being written
+        encoding="utf-8",
+    )
+    store = HistoryStore(path=str(tmp_path / "history.sqlite"), seed_csv=str(path))
+
+    assert store.kpis() == {"total": 2, "churn": 1, "stay": 1, "churn_rate": 50.0}
+    assert store.rows_skipped == 3
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("urn\n")
+    assert store.sync_from_csv() == 1
+    assert store.count(label="Churn") == 2
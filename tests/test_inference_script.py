@@ -0,0 +1,33 @@
+"""Request decoding in inference-script.py."""
+import numpy as np
+import pytest
+
+from benchmarks import make_rows
+from features import ENGINEERED_COLUMNS, FEATURE_COLUMNS, engineer_row
+from local_model import load_inference_script
+
+
+@pytest.fixture(scope="module")
+def inference():
+    return load_inference_script()
+
+
+def raw(row):
+    return {k: v for k, v in row.items() if k not in ENGINEERED_COLUMNS}
+
+
+def test_engineered_features_are_derived_per_row(inference):
+    rows = make_rows(4)
+    mixed = [rows[0], raw(rows[1]), dict(raw(rows[2]), AvgCallDuration=9.5), rows[3]]
+    expected = [rows[0], engineer_row(raw(rows[1])), dict(engineer_row(raw(rows[2])), AvgCallDuration=9.5), rows[3]]
+    np.testing.assert_array_equal(
+        inference.decode_features({"data": mixed}),
+        inference.decode_features({"data": expected}),
+    )
+
+
+def test_supplied_engineered_features_are_kept_when_row_0_lacks_them(inference):
+    rows = make_rows(2)
+    features = inference.decode_features({"data": [raw(rows[0]), dict(rows[1], AvgCallDuration=7.0)]})
+    assert features[1, FEATURE_COLUMNS.index("AvgCallDuration")] == 7.0
+    assert features[1, FEATURE_COLUMNS.index("CostPerUsage")] == rows[1]["CostPerUsage"]
@@ -0,0 +1,65 @@
+"""Coalescing must not change which callers get an answer and which get an error."""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks import make_rows
+from micro_batch import ThreadedCoalescingScorer
+from mock_endpoint import MockScoringServer
+from model_call import reset_session
+
+
+@pytest.fixture
+def server():
+    reset_session()
+    with MockScoringServer() as server:
+        yield server
+    reset_session()
+
+
+def score_concurrently(scorer, bodies):
+    def score(body):
+        try:
+            return scorer.score(body)
+        except RuntimeError as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=len(bodies)) as pool:
+        return list(pool.map(score, bodies))
+
+
+def test_one_bad_row_only_fails_its_own_caller(server):
+    rows = make_rows(8)
+    rows[5]["DayMins"] = None
+    scorer = ThreadedCoalescingScorer(model_url=server.url, api_key=server.api_key, max_wait=0.2)
+    try:
+        results = score_concurrently(scorer, [{"data": [row]} for row in rows])
+    finally:
+        scorer.close()
+
+    assert isinstance(results[5], RuntimeError)
+    for i, result in enumerate(results):
+        if i != 5:
+            assert result["predictedOutcomes"] in ([0], [1])
+            assert result["inputFeatures"] == [rows[i]]
+
+
+def test_coalesced_results_match_direct_calls(server):
+    rows = make_rows(16, seed=3)
+    bodies = [{"data": [row], "returnProbabilities": i % 2 == 1} for i, row in enumerate(rows)]
+    scorer = ThreadedCoalescingScorer(model_url=server.url, api_key=server.api_key, max_wait=0.2)
+    try:
+        results = score_concurrently(scorer, bodies)
+        coalesced_requests = server.request_count
+    finally:
+        scorer.close()
+
+    expected = server.inference.run(json.dumps({"data": rows, "returnProbabilities": True}))
+    for i, result in enumerate(results):
+        assert result["predictedOutcomes"] == [expected["predictedOutcomes"][i]]
+        if bodies[i]["returnProbabilities"]:
+            assert result["churnProbabilities"] == [expected["churnProbabilities"][i]]
+        else:
+            assert "churnProbabilities" not in result
+    assert coalesced_requests < len(rows)
@@ -0,0 +1,137 @@
+"""score_batch against the mock endpoint: chunking, ordering, retries and the Arrow / JSON fallback."""
+import json
+
+import pandas as pd
+import pytest
+
+import model_call
+from benchmarks import make_rows
+from mock_endpoint import MockScoringServer
+
+
+@pytest.fixture(autouse=True)
+def fresh_session(monkeypatch):
+    monkeypatch.setattr(model_call, "MODEL_WIRE_FORMAT", "json")
+    model_call.reset_session(backoff_factor=0.0)
+    yield
+    model_call.reset_session()
+
+
+@pytest.fixture
+def server():
+    with MockScoringServer() as server:
+        yield server
+
+
+def direct_scores(server, rows):
+    """The endpoint's answer for all rows in one request, bypassing the client."""
+    result = server.inference.run(json.dumps({"data": rows, "returnProbabilities": True}))
+    return result["predictedOutcomes"], result["churnProbabilities"]
+
+
+def test_chunks_come_back_in_input_order(server):
+    rows = make_rows(103, seed=1)
+    result = model_call.score_batch(
+        pd.DataFrame(rows),
+        max_rows=10,
+        max_workers=4,
+        model_url=server.url,
+        api_key=server.api_key,
+        return_probabilities=True,
+    )
+
+    outcomes, probabilities = direct_scores(server, rows)
+    assert result["rows"] == 103
+    assert result["chunks"] == 11
+    assert server.request_count == 11
+    assert result["predictedOutcomes"] == outcomes
+    assert result["churnProbabilities"] == pytest.approx(probabilities)
+
+
+def test_max_bytes_splits_chunks_too(server):
+    rows = make_rows(20, seed=2)
+    row_bytes = len(json.dumps(rows[0]))
+    result = model_call.score_batch(
+        pd.DataFrame(rows),
+        max_rows=1000,
+        max_bytes=row_bytes * 5,
+        model_url=server.url,
+        api_key=server.api_key,
+    )
+
+    assert result["chunks"] > 1
+    assert result["predictedOutcomes"] == direct_scores(server, rows)[0]
+
+
+def test_429_and_503_are_retried(server):
+    server.fail_statuses = [429, 503]
+    rows = make_rows(5, seed=3)
+    result = model_call.score_batch(pd.DataFrame(rows), model_url=server.url, api_key=server.api_key)
+
+    assert server.request_count == 3
+    assert result["predictedOutcomes"] == direct_scores(server, rows)[0]
+
+
+def test_reset_session_rebuilds_the_pool_with_new_options(server):
+    old = model_call.get_session()
+    model_call.reset_session(max_retries=0)
+    assert model_call.get_session() is not old
+
+    # without retries the 503 reaches the caller
+    server.fail_statuses = [503]
+    with pytest.raises(RuntimeError, match="HTTP 503"):
+        model_call.score_batch(pd.DataFrame(make_rows(3)), model_url=server.url, api_key=server.api_key)
+    assert server.request_count == 1
+
+    # and reset_session() with no options goes back to the defaults on next use
+    model_call.reset_session()
+    assert model_call._session is None
+    server.fail_statuses = [503]
+    model_call.score_batch(pd.DataFrame(make_rows(3)), model_url=server.url, api_key=server.api_key)
+    assert server.request_count == 3
+
+
+def test_arrow_and_json_give_the_same_answers(server, monkeypatch):
+    rows = make_rows(40, seed=4)
+    body = {"data": rows, "returnProbabilities": True}
+    as_json = model_call._post_request(dict(body), server.url, server.api_key, wire_format="json")
+    as_arrow = model_call._post_request(dict(body), server.url, server.api_key, wire_format="arrow")
+
+    assert as_arrow["predictedOutcomes"] == as_json["predictedOutcomes"]
+    assert as_arrow["churnProbabilities"] == pytest.approx(as_json["churnProbabilities"])
+    assert as_arrow["inputFeatures"] == rows
+    assert server.url not in model_call._json_only_urls
+
+    # and through score_batch
+    monkeypatch.setattr(model_call, "MODEL_WIRE_FORMAT", "arrow")
+    result = model_call.score_batch(pd.DataFrame(rows), max_rows=15, model_url=server.url, api_key=server.api_key)
+    assert result["predictedOutcomes"] == as_json["predictedOutcomes"]
+
+
+def test_415_falls_back_to_json_for_good(server, monkeypatch):
+    def no_arrow(body):
+        raise server.inference.UnsupportedMediaType("no Arrow here")
+
+    monkeypatch.setattr(server.inference, "decode_arrow_request", no_arrow)
+    monkeypatch.setattr(model_call, "_json_only_urls", set())
+    rows = make_rows(5, seed=5)
+    for _ in range(2):
+        result = model_call._post_request({"data": rows}, server.url, server.api_key, wire_format="arrow")
+        assert result["predictedOutcomes"] == direct_scores(server, rows)[0]
+
+    assert server.url in model_call._json_only_urls
+    # one rejected Arrow body, then JSON only
+    assert server.request_count == 3
+
+
+def test_other_errors_on_arrow_are_not_a_downgrade(server, monkeypatch):
+    def broken(body):
+        raise RuntimeError("model blew up")
+
+    monkeypatch.setattr(server.inference, "decode_arrow_request", broken)
+    monkeypatch.setattr(model_call, "_json_only_urls", set())
+    with pytest.raises(RuntimeError, match="HTTP 500"):
+        model_call._post_request({"data": make_rows(2)}, server.url, server.api_key, wire_format="arrow")
+
+    assert server.url not in model_call._json_only_urls
+    assert server.request_count == 1
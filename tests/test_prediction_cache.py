@@ -0,0 +1,82 @@
+"""PredictionCache keys, expiry, invalidation and isolation of cached results."""
+import hashlib
+import json
+
+import pytest
+
+import prediction_cache
+from benchmarks import make_rows
+from features import FEATURE_COLUMNS
+from prediction_cache import PredictionCache, canonical_key
+
+RESULT = {"predictedOutcomes": [1], "inputFeatures": [{"AccountWeeks": 40}]}
+
+
+@pytest.fixture
+def row():
+    return make_rows(1, seed=8)[0]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(prediction_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_canonical_key_ignores_representation_not_content(row):
+    as_strings = {c: str(v) for c, v in row.items()}
+    as_floats = {c: float(v) for c, v in row.items()}
+    reordered = dict(reversed(list(row.items())))
+    key = canonical_key({"data": [row]})
+    assert canonical_key({"data": [as_strings]}) == key
+    assert canonical_key({"data": [as_floats]}) == key
+    assert canonical_key({"data": [reordered]}) == key
+
+    # rows-only key of older cache files
+    rows = [[int(row[c]) if c in prediction_cache.INT_FEATURES else float(row[c]) for c in FEATURE_COLUMNS]]
+    assert key == hashlib.sha256(json.dumps(rows, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+    # options are part of the key, in any order
+    a = canonical_key({"data": [row], "returnProbabilities": True, "echoInput": False})
+    b = canonical_key({"echoInput": False, "returnProbabilities": True, "data": [row]})
+    assert a == b != key
+    assert canonical_key({"data": [dict(row, DayMins=row["DayMins"] + 1)]}) != key
+
+
+def test_entries_expire_after_the_ttl(row, clock, tmp_path):
+    cache = PredictionCache(ttl_seconds=60, disk_path=str(tmp_path / "cache.sqlite"), model_version="v1")
+    cache.put({"data": [row]}, RESULT)
+    clock[0] += 59
+    assert cache.get({"data": [row]}) == RESULT
+    clock[0] += 2
+    assert cache.get({"data": [row]}) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_set_model_version_drops_memory_and_disk_entries(row, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = PredictionCache(disk_path=path, model_version="v1")
+    cache.put({"data": [row]}, RESULT)
+    cache.set_model_version("v2")
+    assert cache.get({"data": [row]}) is None
+
+    # nor does a restart on the old version bring them back from disk
+    assert PredictionCache(disk_path=path, model_version="v1").get({"data": [row]}) is None
+
+
+def test_callers_cannot_mutate_cached_results(row, tmp_path):
+    cache = PredictionCache(disk_path=str(tmp_path / "cache.sqlite"), model_version="v1")
+    result = json.loads(json.dumps(RESULT))
+    cache.put({"data": [row]}, result)
+    result["predictedOutcomes"][0] = 0
+
+    served = cache.get({"data": [row]})
+    assert served == RESULT
+    served["inputFeatures"][0]["AccountWeeks"] = -1
+    assert cache.get({"data": [row]}) == RESULT
+
+    # the copy from the disk tier is isolated too
+    restarted = PredictionCache(disk_path=str(tmp_path / "cache.sqlite"), model_version="v1")
+    restarted.get({"data": [row]})["predictedOutcomes"].append(1)
+    assert restarted.get({"data": [row]}) == RESULT
@@ -0,0 +1,43 @@
+"""StreamingHistogram stays bounded and exact on its (possibly widened) bins."""
+import numpy as np
+import pytest
+
+from streaming_ingest import StreamingHistogram
+
+
+def expected_counts(hist, values, churn):
+    """Counts per (class, bin) recomputed from scratch at hist's final width."""
+    values, churn = values[np.isfinite(values)], churn[np.isfinite(values)]
+    offset = np.floor(values / hist.bin_width).astype(np.int64) - hist.first_bin
+    return np.stack([np.bincount(offset[churn == c], minlength=hist.counts.shape[1]) for c in (0, 1)])
+
+
+def test_outliers_widen_bins_instead_of_growing_memory():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.uniform(0, 350, 10_000), [1e9, -5e6, np.inf, -np.inf, np.nan]])
+    churn = rng.integers(0, 2, len(values))
+    hist = StreamingHistogram(1.0, max_bins=1024)
+    for part in np.array_split(np.arange(len(values)), 7):
+        hist.update(values[part], churn[part])
+
+    assert hist.counts.shape[1] <= 1024
+    assert hist.counts.sum() == 10_002
+    assert not hist.discrete
+    np.testing.assert_array_equal(hist.counts, expected_counts(hist, values, churn))
+
+
+@pytest.mark.parametrize("spread", [100, 10_000])
+def test_merge_matches_a_single_pass(spread):
+    rng = np.random.default_rng(1)
+    a, b = rng.normal(0, spread, 5_000), rng.normal(spread, spread * 3, 5_000)
+    ca, cb = rng.integers(0, 2, 5_000), rng.integers(0, 2, 5_000)
+
+    values, churn = np.concatenate([a, b]), np.concatenate([ca, cb])
+
+    merged = StreamingHistogram(1, max_bins=512).update(a, ca)
+    merged.merge(StreamingHistogram(1, max_bins=512).update(b, cb))
+    single = StreamingHistogram(1, max_bins=512).update(values, churn)
+
+    assert merged.bin_width == single.bin_width
+    assert merged.counts.shape[1] <= 512
+    np.testing.assert_array_equal(merged.counts, expected_counts(merged, values, churn))
@@ -0,0 +1,224 @@
+"""
+Request / response encodings shared by the client (model_call.py) and
+inference-script.py.
+
+    application/json                      the original format; encoded with
+                                          orjson when it is installed
+    application/vnd.apache.arrow.stream   columnar Arrow IPC: one typed
+                                          column per feature, request
+                                          options in the schema metadata
+
+Arrow requests carry {"columns": [...], "data": matrix, **options} and
+Arrow responses carry predictedOutcome / churnProbability / rankedIndex
+columns, without the input echo (the client already has the rows).
+
+The client asks for Arrow with "Accept: application/vnd.apache.arrow.stream,
+application/json;q=0.5"; an endpoint without pyarrow answers JSON, and
+answers an Arrow request body with 415 so the client can fall back.
+
+Bodies of either format can be gzip-compressed (Content-Encoding /
+Accept-Encoding), and the "echoInput" request option trims the JSON
+response's inputFeatures echo (see echo_rows).
+
+Ship this file next to inference-script.py when deploying to Azure.
+"""
+import gzip
+import json
+
+import numpy
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+JSON_CONTENT_TYPE = "application/json"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+WIRE_FORMATS = {"json": JSON_CONTENT_TYPE, "arrow": ARROW_CONTENT_TYPE}
+
+GZIP_ENCODING = "gzip"
+# level 1: most of the size win on JSON for a fraction of level 6's CPU
+GZIP_LEVEL = 1
+# below this, gzip's header and CPU aren't worth it
+GZIP_MIN_BYTES = 1024
+
+# Arrow response column -> JSON response key
+ARROW_RESPONSE_KEYS = {
+    "rankedIndex": "rankedIndices",
+    "churnProbability": "churnProbabilities",
+    "predictedOutcome": "predictedOutcomes",
+}
+
+
+class UnsupportedMediaType(ValueError):
+    """Request body in a format this side can't decode (HTTP 415)."""
+
+
+def media_type(header: str) -> str:
+    """'application/json; charset=utf-8' -> 'application/json'."""
+    return (header or JSON_CONTENT_TYPE).split(";", 1)[0].strip().lower()
+
+
+def arrow_available() -> bool:
+    return pyarrow is not None
+
+
+# ---- JSON ----
+def dumps_json(obj) -> bytes:
+    """Compact JSON bytes; orjson (numpy arrays allowed) if installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def loads_json(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+# ---- Arrow IPC ----
+def _write_ipc(names, arrays, metadata=None) -> bytes:
+    batch = pyarrow.RecordBatch.from_arrays(arrays, names=names)
+    if metadata:
+        batch = batch.replace_schema_metadata(metadata)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def _read_ipc(body):
+    return pyarrow.ipc.open_stream(pyarrow.py_buffer(body)).read_all()
+
+
+def encode_arrow_request(body_dict: dict, feature_columns) -> bytes:
+    """
+    Arrow IPC for a request in either JSON shape: {"data": [{...}, ...]}
+    or {"columns": [...], "data": [[...], ...]}. Other keys (topK,
+    returnProbabilities, ...) travel as JSON in the schema metadata.
+    """
+    data = body_dict["data"]
+    options = {k: v for k, v in body_dict.items() if k not in ("data", "columns")}
+    if "columns" in body_dict:
+        columns = list(body_dict["columns"])
+        matrix = numpy.asarray(data, dtype=numpy.float64).reshape(-1, len(columns))
+        arrays = [pyarrow.array(matrix[:, i]) for i in range(len(columns))]
+    else:
+        columns = [c for c in feature_columns if not data or c in data[0]]
+        arrays = [pyarrow.array([row[c] for row in data], type=pyarrow.float64()) for c in columns]
+    return _write_ipc(columns, arrays, {b"options": json.dumps(options).encode("utf-8")})
+
+
+def decode_arrow_request(body) -> dict:
+    """Inverse of encode_arrow_request: {"columns", "data": float64 matrix, **options}."""
+    if pyarrow is None:
+        raise UnsupportedMediaType(f"{ARROW_CONTENT_TYPE} needs pyarrow on the endpoint")
+    table = _read_ipc(body)
+    metadata = table.schema.metadata or {}
+    payload = json.loads(metadata.get(b"options", b"{}"))
+    columns = table.column_names
+    if table.num_rows:
+        matrix = numpy.column_stack([
+            table.column(c).to_numpy().astype(numpy.float64, copy=False) for c in columns
+        ])
+    else:
+        matrix = numpy.empty((0, len(columns)), dtype=numpy.float64)
+    payload.update(columns=columns, data=matrix)
+    return payload
+
+
+def encode_arrow_response(outcomes, probabilities=None, ranked=None) -> bytes:
+    names, arrays = [], []
+    for name, values in (("rankedIndex", ranked), ("churnProbability", probabilities), ("predictedOutcome", outcomes)):
+        if values is not None:
+            names.append(name)
+            arrays.append(pyarrow.array(numpy.asarray(values)))
+    return _write_ipc(names, arrays)
+
+
+def decode_arrow_response(body) -> dict:
+    """Arrow response -> the JSON response keys, as lists."""
+    table = _read_ipc(body)
+    return {
+        ARROW_RESPONSE_KEYS[name]: table.column(name).to_pylist()
+        for name in table.column_names
+        if name in ARROW_RESPONSE_KEYS
+    }
+
+
+# ---- input echo ----
+def echo_rows(rows, echo=True):
+    """
+    The inputFeatures echo for a request's "echoInput" option:
+    true (default) -> all rows, false / 0 -> none (None),
+    N -> the first N rows. Returns (rows or None, truncated).
+    """
+    if echo is True:
+        return rows, False
+    if not echo:
+        return None, False
+    limit = int(echo)
+    return rows[:limit], len(rows) > limit
+
+
+# ---- gzip ----
+def decode_content(body, content_encoding: str = None):
+    """Undo a request's Content-Encoding (identity or gzip)."""
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == GZIP_ENCODING:
+        return gzip.decompress(body)
+    if encoding == "identity":
+        return body
+    raise UnsupportedMediaType(f"Unsupported Content-Encoding: {content_encoding}")
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    for part in (accept_encoding or "").split(","):
+        fields = part.split(";")
+        if fields[0].strip().lower() not in (GZIP_ENCODING, "*"):
+            continue
+        q = [p.strip()[2:] for p in fields[1:] if p.strip().startswith("q=")]
+        return not q or q[0] not in ("0", "0.0", "0.00", "0.000")
+    return False
+
+
+def gzip_body(body: bytes, min_bytes: int = GZIP_MIN_BYTES):
+    """(body, "gzip") if body is big enough to be worth compressing, else (body, None)."""
+    if len(body) < min_bytes:
+        return body, None
+    return gzip.compress(body, compresslevel=GZIP_LEVEL), GZIP_ENCODING
+
+
+# ---- negotiation ----
+def negotiate(accept: str) -> str:
+    """
+    Response content type for an Accept header: Arrow if the client lists
+    it (ahead of JSON, or JSON not at all) and pyarrow is here, else JSON.
+    """
+    if not accept or pyarrow is None:
+        return JSON_CONTENT_TYPE
+    ranked = []
+    for i, part in enumerate(accept.split(",")):
+        fields = part.split(";")
+        quality = 1.0
+        for param in fields[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranked.append((-quality, i, media_type(fields[0])))
+    for _, _, media in sorted(ranked):
+        if media == ARROW_CONTENT_TYPE:
+            return ARROW_CONTENT_TYPE
+        if media in (JSON_CONTENT_TYPE, "*/*", "application/*"):
+            return JSON_CONTENT_TYPE
+    return JSON_CONTENT_TYPE
@@ -1,11 +1,13 @@
 # import os
 import yaml
 import streamlit as st
-import pandas as pd
-import numpy as np
 import plotly.express as px
 import streamlit_authenticator as stauth
 from yaml.loader import SafeLoader
+from data_loader import CHURN_DATA_PATH, file_fingerprint, load_churn_dataset
+from dashboard_aggregates import load_aggregates
+from dashboard_plots import box_stats_from_counts, churn_histogram, churn_scatter
+from streaming_ingest import load_churn_summary, needs_streaming
 
 # PAGE CONFIG
 st.set_page_config(
@@ -43,14 +45,34 @@ name = st.session_state.get("name", None)
 username = st.session_state.get("username", None)
 
 # LOAD DATA (adjust path if needed)
+# Cached per process and typed; also carries the ChurnLabel column.
+# Shared between sessions, so don't modify df in place.
 def load_data():
-    data_path = './data/telecom_churn_v2.csv'
-    return pd.read_csv(data_path)
+    return load_churn_dataset(CHURN_DATA_PATH)
+
+if needs_streaming(CHURN_DATA_PATH):
+    # Extract too big for memory: one chunked pass into accumulators.
+    # df is then only a bounded per-class sample (for the scatter plots).
+    summary = load_churn_summary(CHURN_DATA_PATH)
+    df = summary.sample
+    agg = summary.aggregates
+    n_customers = summary.n_rows
+else:
+    summary = None
+    df = load_data()
+    # KPIs / groupbys / correlations, computed once per dataset version
+    agg = load_aggregates(CHURN_DATA_PATH)
+    n_customers = len(df)
+
+
+def streamed_counts(column, nbins=None):
+    """Pre-binned histogram counts from the streaming summary, if in use."""
+    return summary.histogram_counts(column, nbins) if summary is not None else None
 
-df = load_data()
 
-# Churn is 0/1, we can map that to labels for plotting
-df["ChurnLabel"] = df["Churn"].map({0: "Stayed", 1: "Churned"})
+def streamed_box(column):
+    """Box-plot stats estimated from the streaming summary's fine bins, if in use."""
+    return box_stats_from_counts(summary.histogram_counts(column)) if summary is not None else None
 
 
 if authentication_status is True:
@@ -84,17 +106,17 @@ if authentication_status is True:
             unsafe_allow_html=True
         )
 
-    def churn_rate(df):
-        return (df["Churn"].mean()) * 100  
+    def churn_rate(agg):
+        return agg.churn_rate()
 
-    def avg_tenure(df):
-        return df["AccountWeeks"].mean()
+    def avg_tenure(agg):
+        return agg.mean("AccountWeeks")
 
-    def avg_monthly_charge(df):
-        return df["MonthlyCharge"].mean()
+    def avg_monthly_charge(agg):
+        return agg.mean("MonthlyCharge")
 
-    def avg_custserv_calls(df):
-        return df["CustServCalls"].mean()
+    def avg_custserv_calls(agg):
+        return agg.mean("CustServCalls")
 
     # -------------------------------------------------
     # KPI VIEW
@@ -107,25 +129,25 @@ if authentication_status is True:
         with c1:
             kpi_card(
                 "Overall Churn Rate",
-                f"{churn_rate(df):.1f}%",
+                f"{churn_rate(agg):.1f}%",
                 "Percent of customers who left"
             )
         with c2:
             kpi_card(
                 "Avg Tenure",
-                f"{avg_tenure(df):.1f} weeks",
+                f"{avg_tenure(agg):.1f} weeks",
                 "How long they typically stay"
             )
         with c3:
             kpi_card(
                 "Avg Monthly Charge",
-                f"${avg_monthly_charge(df):.2f}",
+                f"${avg_monthly_charge(agg):.2f}",
                 "Typical bill per user"
             )
         with c4:
             kpi_card(
                 "Avg Support Calls",
-                f"{avg_custserv_calls(df):.2f}",
+                f"{avg_custserv_calls(agg):.2f}",
                 "Service pain signal"
             )
 
@@ -136,8 +158,7 @@ if authentication_status is True:
 
         with r1c1:
             st.markdown("#### Who is leaving?")
-            churn_counts = df["ChurnLabel"].value_counts().reset_index()
-            churn_counts.columns = ["Status", "Count"]
+            churn_counts = agg.label_counts()
 
             fig_pie = px.pie(
                 churn_counts,
@@ -155,12 +176,7 @@ if authentication_status is True:
         with r1c2:
             st.markdown("#### Pain point: Support calls")
             # Average # of customer service calls by churn status
-            support_by_churn = (
-                df.groupby("ChurnLabel")["CustServCalls"]
-                .mean()
-                .reset_index()
-                .rename(columns={"CustServCalls": "AvgCustServCalls"})
-            )
+            support_by_churn = agg.custserv_by_label()
 
             fig_support = px.bar(
                 support_by_churn,
@@ -188,24 +204,20 @@ if authentication_status is True:
 
         with r2c1:
             st.markdown("#### Are high-bill customers leaving?")
-            fig_bill = px.scatter(
+            # samples / bins automatically on large customer bases
+            fig_bill, bill_rows_caption = churn_scatter(
                 df,
                 x="MonthlyCharge",
                 y="AccountWeeks",
-                color="ChurnLabel",
-                opacity=0.7,
-                # trendline="ols",
                 title="Monthly Charge vs Tenure (colored by Churn)",
                 labels={
                     "MonthlyCharge": "Monthly Charge ($)",
                     "AccountWeeks": "Tenure (weeks)"
                 },
-                color_discrete_map={
-                    "Stayed": "#60a5fa",
-                    "Churned": "#f87171"
-                }
+                total_rows=n_customers,
             )
             st.plotly_chart(fig_bill, use_container_width=True)
+            st.caption(bill_rows_caption)
 
             st.caption(
                 "Churners tend to have lower tenure. "
@@ -214,23 +226,19 @@ if authentication_status is True:
 
         with r2c2:
             st.markdown("#### Roaming cost pressure")
-            fig_roam = px.scatter(
+            fig_roam, roam_rows_caption = churn_scatter(
                 df,
                 x="RoamMins",
                 y="OverageFee",
-                color="ChurnLabel",
-                opacity=0.7,
                 title="Roaming Minutes vs Overage Fees",
                 labels={
                     "RoamMins": "Roaming Minutes",
                     "OverageFee": "Overage Fees ($)"
                 },
-                color_discrete_map={
-                    "Stayed": "#60a5fa",
-                    "Churned": "#f87171"
-                }
+                total_rows=n_customers,
             )
             st.plotly_chart(fig_roam, use_container_width=True)
+            st.caption(roam_rows_caption)
 
             st.caption(
                 "Customers who pay more in overage/roaming look more likely to leave. "
@@ -264,40 +272,46 @@ if authentication_status is True:
         st.header("Deep Dive / EDA")
 
         # 1. Distribution of key numeric fields with churn overlay
+        #    (binned server-side and cached per dataset version)
         st.markdown("#### Usage and cost distributions")
+        data_version = file_fingerprint(CHURN_DATA_PATH)
         c1, c2, c3 = st.columns(3)
 
         with c1:
-            fig_mins = px.histogram(
+            fig_mins = churn_histogram(
                 df,
-                x="DayMins",
-                color="ChurnLabel",
-                marginal="box",
-                opacity=0.7,
+                "DayMins",
                 nbins=30,
-                title="Daytime Minutes vs Churn"
+                opacity=0.7,
+                title="Daytime Minutes vs Churn",
+                version=data_version,
+                counts=streamed_counts("DayMins", 30),
+                marginal="box",
+                box=streamed_box("DayMins"),
             )
             st.plotly_chart(fig_mins, use_container_width=True)
 
         with c2:
-            fig_calls = px.histogram(
+            fig_calls = churn_histogram(
                 df,
-                x="CustServCalls",
-                color="ChurnLabel",
+                "CustServCalls",
+                discrete=True,
                 barmode="group",
-                nbins=10,
-                title="Customer Service Calls Distribution"
+                title="Customer Service Calls Distribution",
+                version=data_version,
+                counts=streamed_counts("CustServCalls"),
             )
             st.plotly_chart(fig_calls, use_container_width=True)
 
         with c3:
-            fig_charge = px.histogram(
+            fig_charge = churn_histogram(
                 df,
-                x="MonthlyCharge",
-                color="ChurnLabel",
+                "MonthlyCharge",
                 nbins=30,
                 opacity=0.7,
-                title="Monthly Charge Distribution"
+                title="Monthly Charge Distribution",
+                version=data_version,
+                counts=streamed_counts("MonthlyCharge", 30),
             )
             st.plotly_chart(fig_charge, use_container_width=True)
 
@@ -310,13 +324,7 @@ if authentication_status is True:
         # 2. Churn rate by whether they have a data plan
         st.markdown("#### Does having a data plan help retention?")
         if "DataPlan" in df.columns:
-            churn_by_dataplan = (
-                df.groupby("DataPlan")["Churn"]
-                .mean()
-                .reset_index()
-            )
-            churn_by_dataplan["DataPlanLabel"] = churn_by_dataplan["DataPlan"].map({0: "No Data Plan", 1: "Has Data Plan"})
-            churn_by_dataplan["ChurnRatePct"] = churn_by_dataplan["Churn"] * 100
+            churn_by_dataplan = agg.churn_by_dataplan()
 
             fig_data_plan = px.bar(
                 churn_by_dataplan,
@@ -345,8 +353,7 @@ if authentication_status is True:
         # 3. Correlation heatmap of numeric features
         st.markdown("#### Numeric Relationships (Correlation)")
 
-        numeric_cols = df.select_dtypes(include=[np.number])
-        corr = numeric_cols.corr().round(2)
+        corr = agg.corr().round(2)
 
         fig_corr = px.imshow(
             corr,